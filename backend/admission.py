@@ -0,0 +1,151 @@
+"""Admission control for the routes that start background work: per-client rate limits and overload shedding.
+
+Every route class has a token bucket per client, refilled at `rate` requests per second up to `burst`; a client
+whose bucket is empty gets 429 with the seconds until its next token in Retry-After. Independently of who asks,
+a route class sheds requests with 503 while `max_in_flight` of them are being handled, or while the work they
+leave behind (`backlog`, e.g. queued jobs) has reached `max_backlog`, so a burst cannot pile up work faster
+than it is done. A route class is a FastAPI dependency of its routes:
+
+    team_creation_admission = RouteClass('team_creation', rate=0.2, burst=5, max_backlog=64,
+                                         backlog=lambda: job_queue.running)
+
+    @router.post("/teams/create", dependencies=[Depends(team_creation_admission)])
+
+All of it runs on the event loop and is per server worker. With ADMISSION_ENABLED off every request is admitted."""
+import logging
+import math
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Optional
+
+from fastapi import HTTPException, Request
+
+from agent_dashboard.backend import metrics, settings
+
+log = logging.getLogger(__name__)
+
+enabled = settings.ADMISSION_ENABLED
+
+requests_rejected = metrics.counter('admission_rejected_total',
+                                    'requests refused by admission control',
+                                    ('route_class', 'reason'))
+
+
+class TokenBucket:
+    """`burst` tokens, refilled at `rate` per second"""
+
+    __slots__ = ('tokens', 'updated')
+
+    def __init__(self, burst: float, now: float):
+        self.tokens = burst
+        self.updated = now
+
+    def take(self, rate: float, burst: float, now: float) -> float:
+        """take a token; returns 0 if there was one, else the seconds until there will be"""
+        self.tokens = min(burst, self.tokens + (now - self.updated) * rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0
+        return (1 - self.tokens) / rate if rate > 0 else math.inf
+
+
+def client_id(request: Request) -> str:
+    if settings.ADMISSION_CLIENT_HEADER:
+        forwarded = request.headers.get(settings.ADMISSION_CLIENT_HEADER)
+        if forwarded:
+            return forwarded.split(',')[0].strip()
+    return request.client.host if request.client else 'unknown'
+
+
+class RouteClass:
+    """admission of one class of routes; 0 for `rate`, `max_in_flight` or `max_backlog` leaves that check out"""
+
+    def __init__(self,
+                 name: str,
+                 rate: float,
+                 burst: int,
+                 max_in_flight: int = 0,
+                 max_backlog: int = 0,
+                 backlog: Optional[Callable[[], int]] = None,
+                 max_clients: int = settings.ADMISSION_MAX_CLIENTS):
+        self.name = name
+        self.rate = rate
+        self.burst = burst
+        self.max_in_flight = max_in_flight
+        self.max_backlog = max_backlog
+        self.backlog = backlog
+        self.max_clients = max_clients
+
+        self.in_flight = 0
+        # least recently seen first, so the oldest is dropped once more than max_clients are tracked
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        route_classes[name] = self
+
+    def queue_depth(self) -> int:
+        return self.backlog() if self.backlog else 0
+
+    def _reject(self, status_code: int, reason: str, retry_after: float,
+                detail: str):
+        requests_rejected.inc(route_class=self.name, reason=reason)
+        raise HTTPException(
+            status_code=status_code,
+            detail=detail,
+            headers={"Retry-After": str(max(1, math.ceil(retry_after)))})
+
+    def admit(self, client: str):
+        """count a request of `client` in, or raise the HTTPException refusing it"""
+        if self.max_in_flight and self.in_flight >= self.max_in_flight:
+            self._reject(503, 'in_flight', settings.ADMISSION_OVERLOAD_RETRY_AFTER,
+                         f'Too many {self.name} requests in progress, retry later')
+        if self.max_backlog and self.queue_depth() >= self.max_backlog:
+            self._reject(503, 'backlog', settings.ADMISSION_OVERLOAD_RETRY_AFTER,
+                         f'Too much {self.name} work queued, retry later')
+
+        if self.rate > 0:
+            now = time.monotonic()
+            bucket = self._buckets.get(client)
+            if bucket is None:
+                bucket = self._buckets[client] = TokenBucket(self.burst, now)
+                if len(self._buckets) > self.max_clients:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(client)
+            if wait := bucket.take(self.rate, self.burst, now):
+                self._reject(429, 'rate_limited', wait,
+                             f'Too many {self.name} requests, retry later')
+
+        self.in_flight += 1
+
+    def release(self):
+        self.in_flight -= 1
+
+    async def __call__(self, request: Request):
+        if not enabled:
+            yield
+            return
+        self.admit(client_id(request))
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "in_flight": self.in_flight,
+            "queue_depth": self.queue_depth(),
+            "clients": len(self._buckets),
+        }
+
+
+route_classes: Dict[str, RouteClass] = {}
+
+for _stat, _help in (('in_flight', 'requests of a route class being handled'),
+                     ('queue_depth', 'work queued behind a route class, e.g. pending jobs'),
+                     ('clients', 'clients with a rate limit bucket')):
+    metrics.gauge(f'admission_{_stat}',
+                  _help, ('route_class', ),
+                  function=lambda stat=_stat: {
+                      name: route_class.stats()[stat]
+                      for name, route_class in route_classes.items()
+                  })
@@ -0,0 +1,116 @@
+"""Tools and agent definitions resolved once, so creating a conversation does not repeat the lookups.
+
+The tool registry is filled from `get_all_exported_tools` at startup (by the background preload with
+LAZY_IMPORTS). An agent template is a team's agent definitions with their tool names already resolved;
+templates are cached by the definitions themselves, so every conversation created from the same stored team
+(`{team_id}_agents.json`) shares one and building its agents only means constructing them and handing over
+the tools."""
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, Optional, Sequence, Tuple
+
+from agent_dashboard.backend import metrics, settings
+from agent_dashboard.backend.lazy import after_preload, lazy_import
+from agent_dashboard.backend.storage import LRUCache
+
+log = logging.getLogger(__name__)
+
+# imports every tool module
+base_tool = lazy_import('src.agents.tools.base_tool')
+
+
+def _tool_name(tool: Any) -> Optional[str]:
+    name = getattr(tool, 'name', None) or getattr(tool, '__name__', None)
+    return name if isinstance(name, str) else None
+
+
+class ToolRegistry:
+    """name -> tool object, for every exported tool.
+
+    Names are only taken from `get_all_exported_tools` when `get_tool_by_name` agrees on them; any other name is
+    looked up once and remembered if found. Unknown names, which come straight from client requests, are looked
+    up every time rather than remembered, so they cannot grow the registry."""
+
+    def __init__(self):
+        self._tools: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+        self.warmed = False
+
+    def warm(self) -> int:
+        """resolve every exported tool up front; returns how many were registered"""
+        tools = {}
+        for tool in base_tool.get_all_exported_tools():
+            name = _tool_name(tool)
+            if name and base_tool.get_tool_by_name(name) is tool:
+                tools[name] = tool
+        with self._lock:
+            self._tools.update(tools)
+            self.warmed = True
+        log.info(f'registered {len(tools)} tools')
+        return len(tools)
+
+    def get(self, name: str) -> Optional[Any]:
+        try:
+            return self._tools[name]
+        except KeyError:
+            pass
+        tool = base_tool.get_tool_by_name(name)
+        if tool is not None:
+            with self._lock:
+                self._tools[name] = tool
+        return tool
+
+    def names(self) -> Tuple[str, ...]:
+        with self._lock:
+            return tuple(self._tools)
+
+
+@dataclass(frozen=True)
+class AgentTemplate:
+    name: str
+    prompt: str
+    agent_type: str
+    tools: Tuple[Any, ...]
+
+
+class AgentTemplates:
+    """compiled agent templates, keyed by the (name, prompt, tools, agent_type) of the agent definitions"""
+
+    def __init__(self,
+                 registry: ToolRegistry,
+                 max_entries: int = settings.AGENT_TEMPLATE_CACHE_SIZE):
+        self.registry = registry
+        self.cache = LRUCache(max_entries=max_entries, max_bytes=max_entries)
+
+    def get(self, create_agent_requests: Sequence[Any]) -> Tuple[AgentTemplate, ...]:
+        key = tuple((request.name, request.prompt, tuple(request.tools),
+                     request.agent_type or "LLMAgent")
+                    for request in create_agent_requests)
+        templates = self.cache.get(key)
+        if templates is None:
+            templates = tuple(self._compile(*definition) for definition in key)
+            self.cache.put(key, templates, 1)
+        return templates
+
+    def _compile(self, name: str, prompt: str, tool_names: Iterable[str],
+                 agent_type: str) -> AgentTemplate:
+        tools = []
+        for tool_name in tool_names:
+            if (tool := self.registry.get(tool_name)) is not None:
+                tools.append(tool)
+            else:
+                log.warning(f'agent {name} asks for unknown tool {tool_name}')
+        return AgentTemplate(name, prompt, agent_type, tuple(tools))
+
+
+tool_registry = ToolRegistry()
+agent_templates = AgentTemplates(tool_registry)
+after_preload(tool_registry.warm)
+
+metrics.counter('agent_template_cache_hits_total',
+                'conversations whose agents came from a cached template',
+                function=lambda: agent_templates.cache.hits)
+metrics.counter('agent_template_cache_misses_total',
+                'agent templates compiled because none was cached',
+                function=lambda: agent_templates.cache.misses)
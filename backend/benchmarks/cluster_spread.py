@@ -0,0 +1,111 @@
+"""Start the backend with several workers and show live conversations spread across them.
+
+Creates conversations over HTTP (each lands on whichever worker accepts the request), then opens a
+websocket to every one of them - most on a worker that does not own the conversation - and checks that
+the agent's reply still arrives through cross-worker forwarding.
+
+    python -m agent_dashboard.backend.benchmarks.cluster_spread --workers 4 --conversations 32
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from typing import List
+
+import websockets
+
+
+def _request(url: str, body: dict = None) -> dict:
+    data = None if body is None else json.dumps(body).encode()
+    request = urllib.request.Request(
+        url, data=data, headers={'Content-Type': 'application/json'})
+    with urllib.request.urlopen(request) as response:
+        return json.loads(response.read())
+
+
+def _wait_until_up(url: str, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            _request(url)
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise TimeoutError(f'{url} did not come up')
+
+
+async def _converse(ws_url: str, recipient: str) -> float:
+    started = time.perf_counter()
+    async with websockets.connect(ws_url) as websocket:
+        await websocket.send(
+            json.dumps({
+                "message": "hello",
+                "recipient": recipient
+            }))
+        await asyncio.wait_for(websocket.recv(), 60)
+    return time.perf_counter() - started
+
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--conversations', type=int, default=32)
+    parser.add_argument('--port', type=int, default=11351)
+    parser.add_argument('--app', default='agent_dashboard.backend.server:app')
+    parser.add_argument('--agent', default='Assistant')
+    args = parser.parse_args(argv)
+
+    base_url = f'http://127.0.0.1:{args.port}'
+    env = dict(os.environ,
+               WEB_CONCURRENCY=str(args.workers),
+               AGENT_DASHBOARD_DATA_DIR=os.environ.get(
+                   'AGENT_DASHBOARD_DATA_DIR', tempfile.mkdtemp()))
+    server = subprocess.Popen([
+        sys.executable, '-m', 'uvicorn', args.app, '--port',
+        str(args.port), '--workers',
+        str(args.workers)
+    ],
+                              env=env)
+    try:
+        _wait_until_up(f'{base_url}/')
+        # give every worker time to register before conversations are created
+        time.sleep(1)
+
+        for i in range(args.conversations):
+            _request(
+                f'{base_url}/c2/create', {
+                    "create_conversation_request": {
+                        "name": f"spread-{i}",
+                        "conversation_id": f"spread-{i}"
+                    },
+                    "create_new_agent_requests": [{
+                        "name": args.agent,
+                        "tools": []
+                    }],
+                })
+
+        cluster = _request(f'{base_url}/cluster')
+        print('conversations per worker:')
+        for worker_id, count in sorted(cluster['workers'].items()):
+            print(f'  {worker_id}: {count}')
+
+        async def converse_all():
+            return await asyncio.gather(*(_converse(
+                f'ws://127.0.0.1:{args.port}/c2/spread-{i}', args.agent)
+                                          for i in range(args.conversations)))
+
+        latencies = sorted(asyncio.run(converse_all()))
+        print(f'{len(latencies)} conversations answered, '
+              f'p50 {latencies[len(latencies) // 2]:.2f}s, max {latencies[-1]:.2f}s')
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""Aggregate agent-turn throughput with N conversations running at once.
+
+Every turn is a fake LLM call with a fixed latency, so with turns off the event loop the
+throughput should scale with the number of conversations until CONVERSATION_WORKERS is reached.
+
+    python -m agent_dashboard.backend.benchmarks.conversation_throughput --latency 0.05 --turns 20
+"""
+import argparse
+import asyncio
+import time
+from typing import Dict, List
+
+from agent_dashboard.backend.routes.conversation_routes import WebSocketConversation
+
+
+class FakeLatencyConversation(WebSocketConversation):
+    """a conversation whose every turn is a blocking sleep standing in for an LLM round trip"""
+
+    def __init__(self, conversation_id: str, turns: int, latency: float):
+        super().__init__(name=conversation_id, conversation_id=conversation_id)
+        self.remaining_turns = turns
+        self.latency = latency
+        self.done = asyncio.Event()
+
+    def prepare_new_message(self, message):
+        self.unprocessed_message = message
+
+    def advance(self):
+        time.sleep(self.latency)
+        self.remaining_turns -= 1
+        if self.remaining_turns <= 0:
+            self.unprocessed_message = None
+
+    async def _run_inbox(self):
+        await super()._run_inbox()
+        self.done.set()
+
+
+async def run(conversations: int, turns: int, latency: float) -> Dict:
+    fakes = [
+        FakeLatencyConversation(f'bench-{i}', turns, latency)
+        for i in range(conversations)
+    ]
+
+    started = time.perf_counter()
+    for fake in fakes:
+        fake._start(first_message='go')
+    await asyncio.gather(*(fake.done.wait() for fake in fakes))
+    elapsed = time.perf_counter() - started
+
+    return {
+        "conversations": conversations,
+        "turns": conversations * turns,
+        "seconds": elapsed,
+        "turns_per_second": conversations * turns / elapsed,
+    }
+
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--latency', type=float, default=0.05)
+    parser.add_argument('--turns', type=int, default=20)
+    parser.add_argument('--conversations',
+                        type=int,
+                        nargs='+',
+                        default=[1, 2, 4, 8, 16])
+    args = parser.parse_args(argv)
+
+    for conversations in args.conversations:
+        result = asyncio.run(run(conversations, args.turns, args.latency))
+        print(f"{result['conversations']:>4} conversations: "
+              f"{result['turns_per_second']:8.1f} turns/s "
+              f"({result['turns']} turns in {result['seconds']:.2f}s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""Offline stand-ins for the LLM-backed parts of the backend, so benchmarks run without network access or API keys.
+
+`install` swaps them into the route modules: agents become FakeLLMAgents, conversations answer every
+message after a fixed latency instead of calling the model, and team creation returns a canned team."""
+import asyncio
+import time
+from types import SimpleNamespace
+from typing import Dict, Tuple
+
+from agent_dashboard.backend.routes import conversation_routes, team_routes
+from src.conversations import ConversationMessage
+from src.conversations.participants import HumanParticipant, Participant
+
+
+class FakeLLMAgent(Participant):
+    """an agent that is never asked anything - FakeAgentConversation answers in its name"""
+
+    def __init__(self, name: str, prompt: str = ""):
+        super().__init__(name=name)
+        self.prompt = prompt
+        self.tools = []
+
+    def register_tool(self, tool):
+        self.tools.append(tool)
+
+
+class FakeAgentConversation(conversation_routes.WebSocketConversation):
+    """a conversation whose every turn is a blocking sleep standing in for an LLM round trip, followed by a reply frame"""
+
+    latency = 0.05
+
+    def advance(self):
+        message = self.unprocessed_message
+        self.unprocessed_message = None
+        self.message_history.append(message)
+
+        time.sleep(self.latency)
+        human = next(p for p in self.participants
+                     if isinstance(p, HumanParticipant))
+        reply = ConversationMessage(sender=message.recipient,
+                                    recipient=human,
+                                    content=f'reply to {message.content}')
+        asyncio.run_coroutine_threadsafe(
+            conversation_routes.WebSocketConversationManager.send_message(
+                self.conversation_id,
+                conversation_routes.NewMessageForHuman(reply).to_dict()),
+            self._loop).result()
+
+
+class _FakeAgentDefinition:
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def to_dict(self) -> Dict:
+        return {"name": self.name, "prompt": f"You are {self.name}.", "tools": []}
+
+
+# how often the team creation pipeline actually ran, to tell cached and coalesced creations from real ones
+team_creation_calls = 0
+
+
+def fake_create_team(task: str, latency: float = 0.05) -> Tuple[Dict, str]:
+    global team_creation_calls
+    team_creation_calls += 1
+    time.sleep(latency)
+    agents = {
+        name: _FakeAgentDefinition(name)
+        for name in ("Planner", "Engineer", "Reviewer")
+    }
+    return agents, f"Planner -> Engineer -> Reviewer for: {task}"
+
+
+def install(turn_latency: float = 0.05, team_creation_latency: float = 0.05):
+    FakeAgentConversation.latency = turn_latency
+    conversation_routes.WebSocketConversation = FakeAgentConversation
+    conversation_routes.LLMAgent = FakeLLMAgent
+    team_routes.team_creation = SimpleNamespace(
+        create_team=lambda task: fake_create_team(task, team_creation_latency))
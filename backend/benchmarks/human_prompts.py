@@ -0,0 +1,127 @@
+"""Thousands of questions to the human outstanding at once, answered, timed out and cancelled.
+
+Every conversation asks `--questions` questions concurrently through the same PendingRequests the websocket
+routes use. A simulated client answers most of them after a random delay by sending the answer frame through
+WebSocketConversationManager.handle_incoming_data, leaves some unanswered so they time out, and some
+conversations lose their last viewer halfway so their questions are cancelled. Checks that every answer reached
+the question it was meant for, that no conversation ever had more than its limit of questions out, and that
+nothing is left behind; exits non-zero otherwise.
+
+    python -m agent_dashboard.backend.benchmarks.human_prompts --conversations 1000 --questions 8
+"""
+import argparse
+import asyncio
+import logging
+import random
+import sys
+import time
+from typing import Dict, List
+
+from agent_dashboard.backend.realtime import RequestCancelled
+from agent_dashboard.backend.routes.conversation_routes import WebSocketConversationManager
+
+
+async def run(conversations: int, questions: int, limit: int,
+              timeout: float, max_delay: float, unanswered: float,
+              disconnected: float) -> Dict:
+    pending = WebSocketConversationManager.pending_requests
+    pending.max_per_conversation = limit
+    loop = asyncio.get_running_loop()
+    outcomes = {"answered": 0, "timeout": 0, "cancelled": 0, "misrouted": 0}
+    most_outstanding = 0
+    latencies: List[float] = []
+
+    async def ask(conversation_id: str, question: int):
+        expected = f'{conversation_id}/{question}'
+
+        async def send(request_id: str):
+            nonlocal most_outstanding
+            most_outstanding = max(most_outstanding,
+                                   pending.outstanding(conversation_id))
+            if random.random() < unanswered:
+                return
+            loop.call_later(
+                random.uniform(0, max_delay), lambda: asyncio.ensure_future(
+                    WebSocketConversationManager.handle_incoming_data({
+                        "conversation_id": conversation_id,
+                        "request_id": request_id,
+                        "participant_name": "Assistant",
+                        "message": expected,
+                    })))
+
+        started = time.perf_counter()
+        try:
+            answer = await pending.ask(conversation_id, send, timeout)
+        except TimeoutError:
+            outcomes["timeout"] += 1
+            return
+        except RequestCancelled:
+            outcomes["cancelled"] += 1
+            return
+        latencies.append(time.perf_counter() - started)
+        outcomes["answered" if answer["message"] == expected else "misrouted"] += 1
+
+    async def viewer_leaves(conversation_id: str):
+        await asyncio.sleep(random.uniform(0, max_delay))
+        pending.cancel_conversation(conversation_id, reason='benchmark')
+
+    tasks = []
+    for i in range(conversations):
+        conversation_id = f'bench-{i}'
+        tasks.extend(ask(conversation_id, question) for question in range(questions))
+        if random.random() < disconnected:
+            tasks.append(viewer_leaves(conversation_id))
+
+    started = time.perf_counter()
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        **outcomes,
+        "questions": conversations * questions,
+        "seconds": elapsed,
+        "most_outstanding_per_conversation": most_outstanding,
+        "left_behind": len(pending) + len(pending._in_flight) + len(pending._waiting),
+        "p50_ms": latencies[len(latencies) // 2] * 1000 if latencies else 0,
+        "p99_ms": latencies[int(len(latencies) * 0.99)] * 1000 if latencies else 0,
+    }
+
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--conversations', type=int, default=1000)
+    parser.add_argument('--questions', type=int, default=8,
+                        help='questions each conversation asks at once')
+    parser.add_argument('--limit', type=int, default=4,
+                        help='questions of one conversation allowed out at once')
+    parser.add_argument('--timeout', type=float, default=2.0)
+    parser.add_argument('--max-delay', type=float, default=0.2,
+                        help='longest the simulated client takes to answer')
+    parser.add_argument('--unanswered', type=float, default=0.02)
+    parser.add_argument('--disconnected', type=float, default=0.05,
+                        help='share of conversations whose viewer leaves halfway')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    random.seed(args.seed)
+    # late answers to questions that timed out or were cancelled are expected here
+    logging.getLogger('agent_dashboard').setLevel(logging.ERROR)
+    result = asyncio.run(
+        run(args.conversations, args.questions, args.limit, args.timeout,
+            args.max_delay, args.unanswered, args.disconnected))
+    print(f"{result['questions']} questions in {result['seconds']:.2f}s: "
+          f"{result['answered']} answered (p50 {result['p50_ms']:.1f}ms, p99 {result['p99_ms']:.1f}ms), "
+          f"{result['timeout']} timed out, {result['cancelled']} cancelled, "
+          f"{result['misrouted']} misrouted; at most {result['most_outstanding_per_conversation']} "
+          f"out per conversation, {result['left_behind']} left behind")
+
+    failed = (result['misrouted'] or result['left_behind']
+              or result['most_outstanding_per_conversation'] > args.limit
+              or result['answered'] + result['timeout'] + result['cancelled'] != result['questions'])
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""Cold start of the backend: what importing it costs, and how long a fresh server takes to answer GET /.
+
+    python -m agent_dashboard.backend.benchmarks.startup imports             # slowest imports, lazy and eager
+    python -m agent_dashboard.backend.benchmarks.startup serve --runs 5      # time to first GET / of a new server
+
+Both compare LAZY_IMPORTS=1 against LAZY_IMPORTS=0 by running each in a fresh interpreter. `imports` reads
+`python -X importtime`; `serve` starts uvicorn and polls GET / until it answers. `--json` prints the results
+as JSON instead, to keep next to the suite's results.
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+from typing import Dict, List
+
+MODES = {"lazy": {"LAZY_IMPORTS": "1"}, "eager": {"LAZY_IMPORTS": "0"}}
+
+
+def _environment(mode: str) -> Dict[str, str]:
+    return {**os.environ, **MODES[mode]}
+
+
+def import_times(module: str, mode: str) -> List[Dict]:
+    """every module imported by `import module`, with its own and its cumulative import time in ms"""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            capture_output=True,
+                            text=True,
+                            env=_environment(mode))
+    if result.returncode:
+        raise RuntimeError(f'importing {module} failed:\n{result.stderr[-2000:]}')
+
+    imports = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        own, cumulative, name = line[len('import time:'):].split('|')
+        imports.append({
+            "module": name.strip(),
+            "self_ms": int(own) / 1000,
+            "cumulative_ms": int(cumulative) / 1000,
+        })
+    return imports
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def time_to_ready(app: str, mode: str, timeout: float = 60) -> float:
+    """seconds from starting a server process until its GET / answers 200"""
+    port = _free_port()
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', app, '--port', str(port), '--log-level', 'warning'],
+        env=_environment(mode))
+    try:
+        while time.perf_counter() - started < timeout:
+            if process.poll() is not None:
+                raise RuntimeError(f'server exited with {process.returncode}')
+            try:
+                with urllib.request.urlopen(f'http://127.0.0.1:{port}/', timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - started
+            except OSError:
+                time.sleep(0.01)
+        raise TimeoutError(f'{app} did not answer GET / within {timeout}s')
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    imports_parser = commands.add_parser('imports', help='import-time report')
+    imports_parser.add_argument('--module', default='agent_dashboard.backend.server')
+    imports_parser.add_argument('--top', type=int, default=25)
+    imports_parser.add_argument('--json', action='store_true')
+
+    serve_parser = commands.add_parser('serve', help='time to first GET /')
+    serve_parser.add_argument('--app', default='agent_dashboard.backend.server:app')
+    serve_parser.add_argument('--runs', type=int, default=5)
+    serve_parser.add_argument('--json', action='store_true')
+    args = parser.parse_args(argv)
+
+    results = {}
+    for mode in MODES:
+        if args.command == 'imports':
+            imports = import_times(args.module, mode)
+            total = next((entry["cumulative_ms"] for entry in imports
+                          if entry["module"] == args.module), 0)
+            results[mode] = {
+                "total_ms": total,
+                "modules": len(imports),
+                "slowest": sorted(imports, key=lambda entry: -entry["self_ms"])[:args.top],
+            }
+        else:
+            runs = [time_to_ready(args.app, mode) for _ in range(args.runs)]
+            results[mode] = {
+                "median_ms": statistics.median(runs) * 1000,
+                "min_ms": min(runs) * 1000,
+                "max_ms": max(runs) * 1000,
+            }
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    for mode, result in results.items():
+        if args.command == 'imports':
+            print(f'{mode}: importing {args.module} took {result["total_ms"]:.0f}ms '
+                  f'over {result["modules"]} modules; slowest on their own:')
+            for entry in result["slowest"]:
+                print(f'  {entry["self_ms"]:8.1f}ms  {entry["cumulative_ms"]:8.1f}ms cumulative  {entry["module"]}')
+        else:
+            print(f'{mode}: first GET / answered after {result["median_ms"]:.0f}ms '
+                  f'(median of {args.runs}, {result["min_ms"]:.0f}-{result["max_ms"]:.0f}ms)')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""On-disk size, write throughput and load latency of a conversation history in each storage format.
+
+Compares the legacy JSON array file (rewritten in full on every save) against the message log with
+plain, gzip and zstd sealed segments. Messages are the stored agent conversations under
+routes/data/agents, repeated with fresh ids until the history is long enough.
+
+    python -m agent_dashboard.backend.benchmarks.storage_formats --messages 5000 --batch 10
+"""
+import argparse
+import json
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+from agent_dashboard.backend.storage import MessageLog
+from agent_dashboard.backend.storage.codecs import get_codec
+from agent_dashboard.backend.storage.message_log import _segment_cache
+
+SAMPLES_DIR = Path(__file__).parent.parent / 'routes' / 'data' / 'agents'
+
+
+def sample_messages(count: int) -> List[dict]:
+    templates = []
+    for path in sorted(SAMPLES_DIR.glob('*_messages.json')):
+        with open(path, 'r') as f:
+            templates.extend(json.load(f))
+    if not templates:
+        templates = [{"role": "assistant", "content": "lorem ipsum " * 50}]
+
+    return [{
+        **templates[i % len(templates)], "id": f'msg_{i:08d}'
+    } for i in range(count)]
+
+
+def _directory_size(directory: Path) -> int:
+    return sum(path.stat().st_size for path in directory.iterdir())
+
+
+def run_legacy(messages: List[dict], batch: int) -> Dict:
+    directory = Path(tempfile.mkdtemp())
+    path = directory / 'bench_messages.json'
+
+    started = time.perf_counter()
+    for start in range(0, len(messages), batch):
+        stored = []
+        if path.exists():
+            with open(path, 'r') as f:
+                stored = json.load(f)
+        stored.extend(messages[start:start + batch])
+        with open(path, 'w') as f:
+            json.dump(stored, f)
+    write_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    with open(path, 'r') as f:
+        loaded = json.load(f)
+    load_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    with open(path, 'r') as f:
+        loaded = json.load(f)[-50:]
+    page_seconds = time.perf_counter() - started
+
+    assert len(loaded) == min(50, len(messages))
+    return {
+        "format": "json array",
+        "bytes": _directory_size(directory),
+        "messages_per_second": len(messages) / write_seconds,
+        "load_ms": load_seconds * 1000,
+        "page_ms": page_seconds * 1000,
+    }
+
+
+def run_log(messages: List[dict], batch: int, codec: str,
+            segment_max_bytes: int) -> Dict:
+    directory = Path(tempfile.mkdtemp())
+    message_log = MessageLog(directory,
+                             'bench_messages',
+                             segment_max_bytes=segment_max_bytes,
+                             codec=codec)
+
+    started = time.perf_counter()
+    for start in range(0, len(messages), batch):
+        message_log.append_many(messages[start:start + batch])
+    message_log.sync()
+    write_seconds = time.perf_counter() - started
+
+    # cold reads - nothing decompressed yet
+    _segment_cache.clear()
+    started = time.perf_counter()
+    loaded = message_log.read_all()
+    load_seconds = time.perf_counter() - started
+    assert len(loaded) == len(messages)
+
+    # the page a client asks for when it opens a conversation
+    _segment_cache.clear()
+    count = message_log.count
+    started = time.perf_counter()
+    message_log.read(count - 50, count)
+    page_seconds = time.perf_counter() - started
+
+    message_log.close()
+    return {
+        # the codec the log actually sealed with, which is not the one asked for when it fell back
+        "format": f"log ({message_log.codec.name if message_log.codec else 'none'})",
+        "bytes": _directory_size(directory),
+        "messages_per_second": len(messages) / write_seconds,
+        "load_ms": load_seconds * 1000,
+        "page_ms": page_seconds * 1000,
+    }
+
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--messages', type=int, default=5000)
+    parser.add_argument('--batch',
+                        type=int,
+                        default=10,
+                        help='messages stored per save')
+    parser.add_argument('--segment-max-bytes', type=int, default=1024 * 1024)
+    parser.add_argument('--codecs',
+                        nargs='+',
+                        default=['none', 'gzip', 'zstd'])
+    parser.add_argument('--skip-legacy', action='store_true')
+    args = parser.parse_args(argv)
+
+    messages = sample_messages(args.messages)
+    results = []
+    if not args.skip_legacy:
+        results.append(run_legacy(messages, args.batch))
+    for codec in args.codecs:
+        in_use = get_codec(codec)
+        if codec not in ('', 'none') and in_use.name != codec:
+            print(f'skipping {codec}: not available here, the log would seal with {in_use.name}')
+            continue
+        results.append(
+            run_log(messages, args.batch, codec, args.segment_max_bytes))
+
+    print(f'{args.messages} messages, {args.batch} per save')
+    for result in results:
+        print(f"{result['format']:>12}: {result['bytes'] / 1024 / 1024:8.2f} MB "
+              f"{result['messages_per_second']:10.0f} msgs/s written "
+              f"{result['load_ms']:8.1f} ms full load "
+              f"{result['page_ms']:6.1f} ms last page")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,737 @@
+"""Load tests for the team and conversation routes, with results that can be compared across commits.
+
+Runs the backend in-process on a local port, with the LLM replaced by the fakes in benchmarks/fakes.py, and drives it
+over real HTTP and websocket connections:
+
+  websocket_sessions    N concurrent /c2/{id} sessions exchanging messages with a fake agent
+  message_history       store, full load and page load of conversations with growing histories
+  team_catalog          team listing and lookup with large catalogs, team creation through the job queue, and
+                        creations repeating a few tasks to measure the creation cache and coalescing
+  conversation_creation POST /c2/create for a team of several agents with tools, repeated like reopening a stored team
+  message_ingest        messages stored one request each against the same messages sent through the batch route
+  loop_responsiveness   websocket ping latency while large messages are being stored and loaded
+  admission             a burst of team creations from many clients against the admission limits: how much is
+                        admitted, rate limited (429) and shed (503), and how deep the job queue gets
+
+Every scenario reports throughput, latency percentiles and the process' memory. Results are written as JSON:
+
+    python -m agent_dashboard.backend.benchmarks.suite run --output before.json
+    python -m agent_dashboard.backend.benchmarks.suite run --output after.json
+    python -m agent_dashboard.backend.benchmarks.suite compare before.json after.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+try:
+    import resource
+except ImportError:  # windows
+    resource = None
+
+SCENARIOS = ('websocket_sessions', 'message_history', 'team_catalog',
+             'conversation_creation', 'message_ingest', 'loop_responsiveness',
+             'admission')
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    """p50/p99/mean/max of latencies in seconds, reported in milliseconds"""
+    if not samples:
+        return {}
+    ordered = sorted(samples)
+
+    def rank(p: float) -> float:
+        return ordered[min(len(ordered) - 1, int(p * len(ordered)))] * 1000
+
+    return {
+        "p50_ms": rank(0.50),
+        "p99_ms": rank(0.99),
+        "mean_ms": sum(ordered) / len(ordered) * 1000,
+        "max_ms": ordered[-1] * 1000,
+    }
+
+
+def memory() -> Dict[str, float]:
+    usage = {}
+    if resource:
+        # kilobytes on linux, bytes on macos
+        divisor = 1024 * 1024 if sys.platform == 'darwin' else 1024
+        usage["max_rss_mb"] = resource.getrusage(
+            resource.RUSAGE_SELF).ru_maxrss / divisor
+    try:
+        with open('/proc/self/statm') as f:
+            usage["rss_mb"] = int(f.read().split()[1]) * os.sysconf(
+                'SC_PAGE_SIZE') / 1024 / 1024
+    except (OSError, ValueError, AttributeError):
+        pass
+    return usage
+
+
+async def _timed(samples: List[float], call: Callable):
+    started = time.perf_counter()
+    result = await call()
+    samples.append(time.perf_counter() - started)
+    return result
+
+
+class BackendServer:
+    """the backend routers on uvicorn, in a thread with its own event loop"""
+
+    def __init__(self, port: int):
+        import uvicorn
+        from fastapi import FastAPI
+
+        from agent_dashboard.backend import metrics
+        from agent_dashboard.backend.routes import conversation_routes, team_routes
+        from agent_dashboard.backend.serialization import FastJSONResponse
+
+        app = FastAPI(default_response_class=FastJSONResponse)
+        if metrics.enabled:
+            app.add_middleware(metrics.MetricsMiddleware)
+        app.include_router(conversation_routes.router)
+        app.include_router(team_routes.router)
+
+        self.base_url = f'http://127.0.0.1:{port}'
+        self.ws_url = f'ws://127.0.0.1:{port}'
+        self._server = uvicorn.Server(
+            uvicorn.Config(app,
+                           host='127.0.0.1',
+                           port=port,
+                           log_level='warning'))
+        self._thread = threading.Thread(target=self._server.run, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        while not self._server.started:
+            time.sleep(0.01)
+        return self
+
+    def __exit__(self, *exc_info):
+        self._server.should_exit = True
+        self._thread.join()
+
+
+async def websocket_sessions(server: BackendServer, sessions: int,
+                             turns: int) -> Dict:
+    import httpx
+    import websockets
+
+    create_samples: List[float] = []
+    turn_samples: List[float] = []
+
+    async with httpx.AsyncClient(base_url=server.base_url,
+                                 timeout=60) as client:
+
+        async def session(i: int):
+            conversation_id = f'bench-session-{i}'
+            await _timed(
+                create_samples, lambda: client.post(
+                    '/c2/create',
+                    json={
+                        "create_conversation_request": {
+                            "name": conversation_id,
+                            "conversation_id": conversation_id
+                        },
+                        "create_new_agent_requests": [{
+                            "name": "Assistant",
+                            "tools": []
+                        }],
+                    }))
+            async with websockets.connect(
+                    f'{server.ws_url}/c2/{conversation_id}') as websocket:
+                for turn in range(turns):
+                    started = time.perf_counter()
+                    await websocket.send(
+                        json.dumps({
+                            "message": f"turn {turn}",
+                            "recipient": "Assistant"
+                        }))
+                    await asyncio.wait_for(websocket.recv(), 60)
+                    turn_samples.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(session(i) for i in range(sessions)))
+        elapsed = time.perf_counter() - started
+
+    return {
+        "sessions": sessions,
+        "turns": len(turn_samples),
+        "turns_per_s": len(turn_samples) / elapsed,
+        "turn_latency": percentiles(turn_samples),
+        "create_latency": percentiles(create_samples),
+        "memory": memory(),
+    }
+
+
+async def message_history(server: BackendServer, history_sizes: List[int],
+                          requests: int) -> Dict:
+    import httpx
+
+    from agent_dashboard.backend.benchmarks.storage_formats import sample_messages
+    from agent_dashboard.backend.routes import team_routes
+
+    results = {}
+    async with httpx.AsyncClient(base_url=server.base_url,
+                                 timeout=120) as client:
+        for size in history_sizes:
+            team_id = f'bench-history-{size}'
+            message_log = team_routes._conversation_message_log(team_id)
+            messages = sample_messages(size)
+            for start in range(0, size, 1000):
+                message_log.append_many(messages[start:start + 1000])
+
+            store_samples: List[float] = []
+            started = time.perf_counter()
+            for message in sample_messages(requests):
+                await _timed(
+                    store_samples, lambda: client.post(
+                        f'/teams/{team_id}/messages/store', json=message))
+            stores_per_s = requests / (time.perf_counter() - started)
+
+            load_samples: List[float] = []
+            loaded_bytes = 0
+            for _ in range(requests):
+                response = await _timed(
+                    load_samples,
+                    lambda: client.get(f'/teams/{team_id}/messages/load'))
+                loaded_bytes += len(response.content)
+
+            page_samples: List[float] = []
+            for _ in range(requests):
+                before = random.randint(50, size)
+                await _timed(
+                    page_samples, lambda: client.get(
+                        f'/teams/{team_id}/messages/load',
+                        params={
+                            "before": str(before),
+                            "limit": 50
+                        }))
+
+            results[str(size)] = {
+                "stores_per_s": stores_per_s,
+                "store_latency": percentiles(store_samples),
+                "full_load_latency": percentiles(load_samples),
+                "full_load_mb_per_s":
+                loaded_bytes / 1024 / 1024 / sum(load_samples),
+                "page_latency": percentiles(page_samples),
+            }
+    results["memory"] = memory()
+    return results
+
+
+async def team_catalog(server: BackendServer, catalog_sizes: List[int],
+                       requests: int, creations: int) -> Dict:
+    import httpx
+
+    from agent_dashboard.backend.routes import team_routes
+    from agent_dashboard.backend.storage import open_team_catalog
+
+    catalog = open_team_catalog(team_routes.team_data_dir)
+    results = {}
+    async with httpx.AsyncClient(base_url=server.base_url,
+                                 timeout=60) as client:
+        for size in catalog_sizes:
+            existing = catalog.count()
+            for i in range(existing, size):
+                catalog.add(f'bench-team-{i:08d}', created_at=i + 1)
+            # a few real teams to look up by id
+            sample_ids = [f'bench-team-{i:08d}' for i in range(0, size, max(1, size // 20))]
+            for team_id in sample_ids:
+                catalog.agents_path(team_id).write_text(
+                    json.dumps([{"name": "Planner", "prompt": "", "tools": []}]))
+
+            page_samples: List[float] = []
+            for _ in range(requests):
+                await _timed(
+                    page_samples, lambda: client.get(
+                        '/teams',
+                        params={
+                            "offset": random.randint(0, max(0, size - 50)),
+                            "limit": 50,
+                            "order": "desc"
+                        }))
+
+            lookup_samples: List[float] = []
+            for _ in range(requests):
+                team_id = random.choice(sample_ids)
+                await _timed(lookup_samples,
+                             lambda: client.get(f'/teams/{team_id}'))
+
+            full_samples: List[float] = []
+            for _ in range(max(1, requests // 10)):
+                await _timed(full_samples, lambda: client.get('/teams'))
+
+            results[str(size)] = {
+                "page_latency": percentiles(page_samples),
+                "lookup_latency": percentiles(lookup_samples),
+                "full_listing_latency": percentiles(full_samples),
+            }
+
+        async def create_team(task: str) -> None:
+            job = (await client.post('/teams/create',
+                                     json={"task": task})).json()
+            while True:
+                status = (await client.get(f'/tasks/{job["task_id"]}')).json()
+                if status["status"] in ("completed", "failed"):
+                    return
+                await asyncio.sleep(0.01)
+
+        # every task distinct, so none of them is answered from the creation cache
+        run_id = time.time_ns()
+        creation_samples: List[float] = []
+        started = time.perf_counter()
+        await asyncio.gather(*(_timed(creation_samples,
+                                      lambda i=i: create_team(f'benchmark {run_id} {i}'))
+                               for i in range(creations)))
+        results["creation"] = {
+            "teams": creations,
+            "teams_per_s": creations / (time.perf_counter() - started),
+            "latency": percentiles(creation_samples),
+        }
+
+        # the same few tasks written differently, all at once and then again: only the first of each should
+        # reach the pipeline, the concurrent ones joining it and the later ones answered from the cache
+        from agent_dashboard.backend.benchmarks import fakes
+        distinct = max(1, creations // 10)
+        spellings = ('Plan a release of {}', 'plan a release of  {}.', 'PLAN A RELEASE OF {}!')
+        tasks = [spellings[i % len(spellings)].format(f'{run_id} {i % distinct}')
+                 for i in range(creations)]
+        calls = fakes.team_creation_calls
+        duplicate_samples: List[float] = []
+        started = time.perf_counter()
+        for _ in range(2):
+            await asyncio.gather(*(_timed(duplicate_samples,
+                                          lambda task=task: create_team(task))
+                                   for task in tasks))
+        results["repeated_creation"] = {
+            "requests": 2 * creations,
+            "distinct_tasks": distinct,
+            "pipeline_runs": fakes.team_creation_calls - calls,
+            "requests_per_s": 2 * creations / (time.perf_counter() - started),
+            "latency": percentiles(duplicate_samples),
+        }
+    results["memory"] = memory()
+    return results
+
+
+async def conversation_creation(server: BackendServer, conversations: int,
+                                concurrency: int) -> Dict:
+    import httpx
+
+    from agent_dashboard.backend.agent_templates import agent_templates, tool_registry
+
+    if not tool_registry.warmed:
+        tool_registry.warm()
+    tools = list(tool_registry.names())[:5]
+    agents = [{
+        "name": name,
+        "prompt": f"You are the {name} of a software team.",
+        "tools": tools
+    } for name in ("Planner", "Engineer", "Reviewer", "Tester", "Writer")]
+    misses = agent_templates.cache.misses
+
+    samples: List[float] = []
+    semaphore = asyncio.Semaphore(concurrency)
+    async with httpx.AsyncClient(base_url=server.base_url,
+                                 timeout=60) as client:
+
+        async def create(i: int):
+            async with semaphore:
+                await _timed(
+                    samples, lambda: client.post(
+                        '/c2/create',
+                        json={
+                            "create_conversation_request": {
+                                "name": f"bench-create-{i}",
+                                "conversation_id": f"bench-create-{i}"
+                            },
+                            "create_new_agent_requests": agents,
+                        }))
+
+        started = time.perf_counter()
+        await asyncio.gather(*(create(i) for i in range(conversations)))
+        elapsed = time.perf_counter() - started
+
+    return {
+        "conversations": conversations,
+        "agents": len(agents),
+        "tools_per_agent": len(tools),
+        "conversations_per_s": conversations / elapsed,
+        "latency": percentiles(samples),
+        "templates_compiled": agent_templates.cache.misses - misses,
+        "memory": memory(),
+    }
+
+
+async def message_ingest(server: BackendServer, messages: int,
+                         batch_size: int) -> Dict:
+    import httpx
+
+    from agent_dashboard.backend.benchmarks.storage_formats import sample_messages
+
+    sample = sample_messages(messages)
+    results = {"messages": messages, "batch_size": batch_size}
+    async with httpx.AsyncClient(base_url=server.base_url,
+                                 timeout=120) as client:
+        samples: List[float] = []
+        started = time.perf_counter()
+        for message in sample:
+            await _timed(
+                samples, lambda: client.post(
+                    '/teams/bench-ingest-single/messages/store',
+                    json=message))
+        results["single"] = {
+            "messages_per_s": messages / (time.perf_counter() - started),
+            "request_latency": percentiles(samples),
+        }
+
+        for format in ("json", "ndjson"):
+            samples = []
+            started = time.perf_counter()
+            for start in range(0, messages, batch_size):
+                entries = [{
+                    "seq": seq,
+                    "message": message
+                } for seq, message in enumerate(
+                    sample[start:start + batch_size], start=start)]
+                if format == "ndjson":
+                    body = '\n'.join(json.dumps(entry) for entry in entries)
+                    headers = {"content-type": "application/x-ndjson"}
+                else:
+                    body = json.dumps(entries)
+                    headers = {"content-type": "application/json"}
+                await _timed(
+                    samples, lambda: client.post(
+                        f'/teams/bench-ingest-{format}/messages/batch',
+                        content=body,
+                        headers=headers))
+            results[f"batch_{format}"] = {
+                "messages_per_s": messages / (time.perf_counter() - started),
+                "request_latency": percentiles(samples),
+            }
+    results["batch_speedup"] = (results["batch_json"]["messages_per_s"] /
+                                results["single"]["messages_per_s"])
+    results["memory"] = memory()
+    return results
+
+
+async def loop_responsiveness(server: BackendServer, message_mb: float,
+                              saves: int) -> Dict:
+    """websocket ping round trips measure how long the server's event loop takes to get to a frame"""
+    import httpx
+    import websockets
+
+    async with httpx.AsyncClient(base_url=server.base_url,
+                                 timeout=120) as client:
+        await client.post('/c2/create',
+                          json={
+                              "create_conversation_request": {
+                                  "name": "bench-pings",
+                                  "conversation_id": "bench-pings"
+                              },
+                              "create_new_agent_requests": [{
+                                  "name": "Assistant",
+                                  "tools": []
+                              }],
+                          })
+        async with websockets.connect(
+                f'{server.ws_url}/c2/bench-pings') as websocket:
+
+            async def ping(samples: List[float], stop: asyncio.Event):
+                while not stop.is_set():
+                    started = time.perf_counter()
+                    await (await websocket.ping())
+                    samples.append(time.perf_counter() - started)
+                    await asyncio.sleep(0.005)
+
+            idle_samples: List[float] = []
+            stop = asyncio.Event()
+            pinger = asyncio.create_task(ping(idle_samples, stop))
+            await asyncio.sleep(1)
+            stop.set()
+            await pinger
+
+            message = {"role": "assistant", "content": "x" * int(message_mb * 1024 * 1024)}
+            busy_samples: List[float] = []
+            stop = asyncio.Event()
+            pinger = asyncio.create_task(ping(busy_samples, stop))
+            for _ in range(saves):
+                await client.post('/teams/bench-pings/messages/store',
+                                  json=message)
+                await client.get('/teams/bench-pings/messages/load')
+            stop.set()
+            await pinger
+
+    return {
+        "message_mb": message_mb,
+        "idle_ping": percentiles(idle_samples),
+        "ping_during_large_saves": percentiles(busy_samples),
+        "memory": memory(),
+    }
+
+
+async def admission(server: BackendServer, clients: int,
+                    requests_per_client: int) -> Dict:
+    """the other scenarios run with admission control off; this one turns it on with the configured limits"""
+    import httpx
+
+    from agent_dashboard.backend import admission as admission_control
+    from agent_dashboard.backend import settings
+    from agent_dashboard.backend.routes import team_routes
+
+    route_class = team_routes.team_creation_admission
+    enabled, header = admission_control.enabled, settings.ADMISSION_CLIENT_HEADER
+    admission_control.enabled, settings.ADMISSION_CLIENT_HEADER = True, 'X-Forwarded-For'
+
+    samples: Dict[int, List[float]] = {}
+    retry_after: List[float] = []
+    peak_pending = 0
+    stop = asyncio.Event()
+
+    async def watch_queue():
+        nonlocal peak_pending
+        while not stop.is_set():
+            peak_pending = max(peak_pending, team_routes.job_queue.running)
+            await asyncio.sleep(0.005)
+
+    run_id = time.time_ns()
+    try:
+        async with httpx.AsyncClient(base_url=server.base_url,
+                                     timeout=60) as client:
+
+            async def create_team(client_index: int, i: int):
+                started = time.perf_counter()
+                response = await client.post(
+                    '/teams/create',
+                    json={"task": f"admission {run_id} {client_index} {i}"},
+                    headers={"X-Forwarded-For": f"10.0.{client_index // 256}.{client_index % 256}"})
+                samples.setdefault(response.status_code, []).append(time.perf_counter() - started)
+                if response.status_code in (429, 503):
+                    retry_after.append(float(response.headers["Retry-After"]))
+
+            watcher = asyncio.create_task(watch_queue())
+            started = time.perf_counter()
+            await asyncio.gather(*(create_team(c, i) for c in range(clients)
+                                   for i in range(requests_per_client)))
+            burst_s = time.perf_counter() - started
+            while team_routes.job_queue.running:
+                await asyncio.sleep(0.01)
+            drained_s = time.perf_counter() - started
+            stop.set()
+            await watcher
+    finally:
+        admission_control.enabled, settings.ADMISSION_CLIENT_HEADER = enabled, header
+        route_class._buckets.clear()
+
+    admitted = [sample for status, values in samples.items() if status < 400
+                for sample in values]
+    return {
+        "requests": clients * requests_per_client,
+        "clients": clients,
+        "admitted": len(admitted),
+        "rate_limited": len(samples.get(429, ())),
+        "overloaded": len(samples.get(503, ())),
+        "other_errors": sum(len(values) for status, values in samples.items()
+                            if status >= 400 and status not in (429, 503)),
+        "max_pending_jobs": route_class.max_backlog,
+        "peak_pending_jobs": peak_pending,
+        "max_retry_after": max(retry_after, default=0),
+        "requests_per_s": clients * requests_per_client / burst_s,
+        "admitted_latency": percentiles(admitted),
+        "rejected_latency": percentiles(samples.get(429, []) + samples.get(503, [])),
+        "drain_ms": drained_s * 1000,
+        "memory": memory(),
+    }
+
+
+async def run(args) -> Dict:
+    from agent_dashboard.backend.benchmarks import fakes
+    fakes.install(turn_latency=args.turn_latency,
+                  team_creation_latency=args.team_creation_latency)
+
+    results = {}
+    with BackendServer(args.port) as server:
+        for scenario in args.scenarios:
+            started = time.perf_counter()
+            if scenario == 'websocket_sessions':
+                result = await websocket_sessions(server, args.sessions,
+                                                  args.turns)
+            elif scenario == 'message_history':
+                result = await message_history(server, args.history_sizes,
+                                               args.requests)
+            elif scenario == 'team_catalog':
+                result = await team_catalog(server, args.catalog_sizes,
+                                            args.requests, args.creations)
+            elif scenario == 'conversation_creation':
+                result = await conversation_creation(server, args.conversations,
+                                                     args.concurrency)
+            elif scenario == 'message_ingest':
+                result = await message_ingest(server, args.ingest_messages,
+                                              args.batch_size)
+            elif scenario == 'loop_responsiveness':
+                result = await loop_responsiveness(server, args.message_mb,
+                                                   args.saves)
+            else:
+                result = await admission(server, args.clients,
+                                         args.requests_per_client)
+            print(f'{scenario}: done in {time.perf_counter() - started:.1f}s',
+                  file=sys.stderr)
+            results[scenario] = result
+    return results
+
+
+def _commit() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'],
+                              capture_output=True,
+                              text=True,
+                              cwd=os.path.dirname(__file__)).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def flatten(results: Dict, prefix: str = '') -> Dict[str, float]:
+    """`scenario.key.subkey` -> number, for every number in a result document"""
+    flat = {}
+    for key, value in results.items():
+        name = f'{prefix}{key}'
+        if isinstance(value, dict):
+            flat.update(flatten(value, f'{name}.'))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = value
+    return flat
+
+
+def compare(before: Dict, after: Dict, threshold: float) -> int:
+    """print every metric of both runs side by side; returns the number of regressions beyond `threshold`"""
+    old = flatten(before["scenarios"])
+    new = flatten(after["scenarios"])
+    regressions = 0
+    print(f'{"metric":<60} {before["meta"].get("commit") or "before":>12} '
+          f'{after["meta"].get("commit") or "after":>12} {"change":>8}')
+    for name in sorted(old.keys() & new.keys()):
+        if old[name] == 0:
+            continue
+        change = (new[name] - old[name]) / old[name]
+        # throughputs should go up, latencies and memory down; anything else is a setting echoed back
+        if '_per_s' in name or name.endswith('_speedup'):
+            regressed = change < -threshold
+        elif name.endswith(('_ms', '_mb')):
+            regressed = change > threshold
+        else:
+            regressed = False
+        regressions += regressed
+        print(f'{name:<60} {old[name]:12.2f} {new[name]:12.2f} '
+              f'{change:+8.1%}{"  REGRESSION" if regressed else ""}')
+    return regressions
+
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help='run the benchmarks')
+    run_parser.add_argument('--scenarios',
+                            nargs='+',
+                            choices=SCENARIOS,
+                            default=list(SCENARIOS))
+    run_parser.add_argument('--output', help='write the results here as JSON')
+    run_parser.add_argument('--port', type=int, default=11451)
+    run_parser.add_argument('--seed', type=int, default=0)
+    run_parser.add_argument('--turn-latency', type=float, default=0.05)
+    run_parser.add_argument('--team-creation-latency', type=float, default=0.05)
+    run_parser.add_argument('--sessions', type=int, default=50)
+    run_parser.add_argument('--turns', type=int, default=10)
+    run_parser.add_argument('--history-sizes',
+                            type=int,
+                            nargs='+',
+                            default=[100, 1000, 10000])
+    run_parser.add_argument('--catalog-sizes',
+                            type=int,
+                            nargs='+',
+                            default=[1000, 10000])
+    run_parser.add_argument('--requests', type=int, default=50)
+    run_parser.add_argument('--creations', type=int, default=20)
+    run_parser.add_argument('--conversations', type=int, default=200)
+    run_parser.add_argument('--concurrency', type=int, default=8)
+    run_parser.add_argument('--ingest-messages', type=int, default=5000)
+    run_parser.add_argument('--batch-size', type=int, default=500)
+    run_parser.add_argument('--message-mb', type=float, default=8)
+    run_parser.add_argument('--saves', type=int, default=5)
+    run_parser.add_argument('--clients', type=int, default=20)
+    run_parser.add_argument('--requests-per-client', type=int, default=20)
+    run_parser.add_argument('--quick',
+                            action='store_true',
+                            help='small sizes, to check the suite itself works')
+
+    compare_parser = commands.add_parser(
+        'compare', help='compare two result files, exiting non-zero on regressions')
+    compare_parser.add_argument('before')
+    compare_parser.add_argument('after')
+    compare_parser.add_argument('--threshold',
+                                type=float,
+                                default=0.2,
+                                help='relative change that counts as a regression')
+    args = parser.parse_args(argv)
+
+    if args.command == 'compare':
+        with open(args.before) as f:
+            before = json.load(f)
+        with open(args.after) as f:
+            after = json.load(f)
+        regressions = compare(before, after, args.threshold)
+        print(f'{regressions} regressions')
+        sys.exit(1 if regressions else 0)
+
+    if args.quick:
+        args.sessions, args.turns, args.requests, args.creations = 5, 3, 5, 3
+        args.history_sizes, args.catalog_sizes = [100, 1000], [200]
+        args.conversations = 20
+        args.ingest_messages, args.batch_size = 500, 100
+        args.message_mb, args.saves = 1, 2
+        args.clients, args.requests_per_client = 5, 10
+
+    random.seed(args.seed)
+    output_path = os.path.abspath(args.output) if args.output else None
+    # a throwaway data directory, set before any backend module reads its settings; the working directory
+    # moves there too since conversations create their workspaces relative to it
+    data_dir = tempfile.mkdtemp(prefix='agent-dashboard-bench-')
+    os.environ['AGENT_DASHBOARD_DATA_DIR'] = data_dir
+    # jobs have to run in this process to see the fake team creation
+    os.environ['JOB_EXECUTOR'] = 'thread'
+    # one client sending everything would be rate limited; the admission scenario turns it back on
+    os.environ['ADMISSION_ENABLED'] = '0'
+    os.chdir(data_dir)
+
+    document = {
+        "meta": {
+            "commit": _commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "started_at": time.time(),
+            "args": {
+                key: value
+                for key, value in vars(args).items() if key != 'command'
+            },
+        },
+        "scenarios": asyncio.run(run(args)),
+    }
+
+    output = json.dumps(document, indent=2)
+    if output_path:
+        with open(output_path, 'w') as f:
+            f.write(output)
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
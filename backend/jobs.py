@@ -0,0 +1,357 @@
+import asyncio
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from enum import Enum
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Set
+
+from agent_dashboard.backend import metrics, settings
+from agent_dashboard.backend.storage import run_in_storage_thread
+from pydantic import BaseModel
+
+log = logging.getLogger(__name__)
+
+job_seconds = metrics.histogram('job_duration_seconds',
+                                'time a background job took to run',
+                                ('kind', 'status'))
+
+
+# how often a job queued `after` another checks whether that one has finished
+_FOLLOW_POLL_INTERVAL = 0.1
+
+
+class TaskStatus(Enum):
+    PENDING = "pending"
+    PROCESSING = "processing"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+
+class Task(BaseModel):
+    id: str
+    status: TaskStatus
+    result: Optional[Dict] = None
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL,
+    result TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    worker_id TEXT,
+    heartbeat REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at);
+"""
+
+# columns added after the table was first created
+_COLUMNS = {"worker_id": "TEXT", "heartbeat": "REAL"}
+
+
+class JobStore:
+    """SQLite table of jobs and their state, so queued and finished jobs survive a restart.
+
+    Unfinished jobs belong to the worker that queued or claimed them, which keeps their heartbeat fresh; only
+    jobs whose heartbeat went stale are taken over by another worker, so a job is never run twice while its
+    worker is alive."""
+
+    def __init__(self,
+                 path: Path,
+                 worker_id: Optional[str] = None,
+                 heartbeat_timeout: float = settings.JOB_HEARTBEAT_TIMEOUT):
+        self.path = Path(path)
+        self.worker_id = worker_id or f'{socket.gethostname()}-{os.getpid()}'
+        self.heartbeat_timeout = heartbeat_timeout
+        self._lock = threading.Lock()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._connection = sqlite3.connect(self.path,
+                                           check_same_thread=False,
+                                           isolation_level=None)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.executescript(_SCHEMA)
+        columns = {row[1] for row in self._connection.execute('PRAGMA table_info(jobs)')}
+        for column, column_type in _COLUMNS.items():
+            if column not in columns:
+                self._connection.execute(
+                    f'ALTER TABLE jobs ADD COLUMN {column} {column_type}')
+
+    def add(self, job_id: str, kind: str, payload: Dict):
+        now = time.time()
+        with self._lock:
+            self._connection.execute(
+                'INSERT INTO jobs (job_id, kind, payload, status, created_at, updated_at, worker_id, heartbeat) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                (job_id, kind, json.dumps(payload), TaskStatus.PENDING.value,
+                 now, now, self.worker_id, now))
+
+    def update(self,
+               job_id: str,
+               status: TaskStatus,
+               result: Optional[Dict] = None):
+        with self._lock:
+            self._connection.execute(
+                'UPDATE jobs SET status = ?, result = ?, updated_at = ? WHERE job_id = ?',
+                (status.value, None if result is None else json.dumps(result),
+                 time.time(), job_id))
+
+    def claim(self, job_id: str) -> bool:
+        """move a pending job to processing, owned by this worker; False if someone else (another worker) already did"""
+        now = time.time()
+        with self._lock:
+            cursor = self._connection.execute(
+                'UPDATE jobs SET status = ?, updated_at = ?, worker_id = ?, heartbeat = ? '
+                'WHERE job_id = ? AND status = ?',
+                (TaskStatus.PROCESSING.value, now, self.worker_id, now, job_id,
+                 TaskStatus.PENDING.value))
+        return cursor.rowcount == 1
+
+    def heartbeat(self):
+        """keep this worker's unfinished jobs from being taken over"""
+        with self._lock:
+            self._connection.execute(
+                'UPDATE jobs SET heartbeat = ? WHERE worker_id = ? AND status IN (?, ?)',
+                (time.time(), self.worker_id, TaskStatus.PENDING.value,
+                 TaskStatus.PROCESSING.value))
+
+    def find_unfinished(self, kind: str, key: str) -> Optional[str]:
+        """id of a pending or processing `kind` job whose payload has this `key`, from any worker"""
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT job_id FROM jobs WHERE status IN (?, ?) AND kind = ? "
+                "AND json_extract(payload, '$.key') = ? ORDER BY created_at LIMIT 1",
+                (TaskStatus.PENDING.value, TaskStatus.PROCESSING.value, kind,
+                 key)).fetchone()
+        return row[0] if row else None
+
+    def release_unfinished(self, keep: Iterable[str] = ()):
+        """hand this worker's unfinished jobs to whichever worker takes them over first, e.g. when shutting down.
+
+        Jobs in `keep` stay with this worker, and are only taken over once their heartbeat goes stale"""
+        keep = list(keep)
+        with self._lock:
+            self._connection.execute(
+                'UPDATE jobs SET status = ?, heartbeat = NULL WHERE worker_id = ? AND status IN (?, ?) '
+                f'AND job_id NOT IN ({", ".join("?" * len(keep))})',
+                (TaskStatus.PENDING.value, self.worker_id,
+                 TaskStatus.PENDING.value, TaskStatus.PROCESSING.value, *keep))
+
+    def requeue_unfinished(self) -> List[tuple]:
+        """take over the unfinished jobs of dead workers (whose heartbeat is stale), putting them back to pending,
+        and return (job_id, kind, payload) of each, oldest first. Jobs of live workers are left to them"""
+        now = time.time()
+        with self._lock:
+            self._connection.execute('BEGIN IMMEDIATE')
+            try:
+                rows = self._connection.execute(
+                    'SELECT job_id, kind, payload FROM jobs WHERE status IN (?, ?) '
+                    'AND (heartbeat IS NULL OR heartbeat < ?) ORDER BY created_at',
+                    (TaskStatus.PENDING.value, TaskStatus.PROCESSING.value,
+                     now - self.heartbeat_timeout)).fetchall()
+                self._connection.executemany(
+                    'UPDATE jobs SET status = ?, worker_id = ?, heartbeat = ? WHERE job_id = ?',
+                    [(TaskStatus.PENDING.value, self.worker_id, now, row[0])
+                     for row in rows])
+                self._connection.execute('COMMIT')
+            except BaseException:
+                self._connection.execute('ROLLBACK')
+                raise
+        return [(job_id, kind, json.loads(payload))
+                for job_id, kind, payload in rows]
+
+    def get(self, job_id: str) -> Optional[Task]:
+        with self._lock:
+            row = self._connection.execute(
+                'SELECT job_id, status, result FROM jobs WHERE job_id = ?',
+                (job_id, )).fetchone()
+        if not row:
+            return None
+        return Task(id=row[0],
+                    status=TaskStatus(row[1]),
+                    result=json.loads(row[2]) if row[2] else None)
+
+
+class JobQueue:
+    """Runs blocking job handlers on a thread or process pool, at most `max_concurrency` at a time.
+
+    Handlers are plain module-level functions taking the job payload as keyword arguments and returning
+    a json-serialisable result, so they can be shipped to a process pool. Job state lives in the JobStore;
+    jobs still queued or running when their worker stopped are run again by whichever worker takes them
+    over, at start or while heartbeating (at-least-once)."""
+
+    def __init__(self,
+                 store: JobStore,
+                 handlers: Dict[str, Callable[..., Dict]],
+                 executor: str = settings.JOB_EXECUTOR,
+                 max_concurrency: int = settings.JOB_MAX_CONCURRENCY):
+        self.store = store
+        self.handlers = handlers
+        self.executor_kind = executor
+        self.max_concurrency = max_concurrency
+
+        self._executor: Optional[Executor] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._running: Set[asyncio.Task] = set()
+        # the jobs whose handler is running in the pool, by the task awaiting it
+        self._executing: Dict[asyncio.Task, str] = {}
+        self._heartbeat_task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        if self.executor_kind == 'process':
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_concurrency)
+        else:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_concurrency, thread_name_prefix='jobs')
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        await self._take_over()
+        self._heartbeat_task = asyncio.create_task(self._heartbeat())
+
+    async def _take_over(self):
+        for job_id, kind, payload in await run_in_storage_thread(
+                self.store.requeue_unfinished):
+            log.info(f'resuming {kind} job {job_id}')
+            self._schedule(job_id, kind, payload)
+
+    async def _heartbeat(self, interval: float = settings.JOB_HEARTBEAT_INTERVAL):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await run_in_storage_thread(self.store.heartbeat)
+                await self._take_over()
+            except Exception:
+                log.exception('heartbeating jobs failed')
+
+    async def stop(self, timeout: float = settings.JOB_STOP_TIMEOUT):
+        """hand queued jobs over, after giving the running ones `timeout` seconds to finish.
+
+        Cancelling a job does not stop its handler in the pool, so a running job released straight away would be
+        run again by whoever takes it over. Those still running after `timeout` are kept instead, and only taken
+        over once their heartbeat goes stale."""
+        if self._heartbeat_task:
+            self._heartbeat_task.cancel()
+            self._heartbeat_task = None
+        for job in list(self._running):
+            if job not in self._executing:
+                job.cancel()
+        executing = dict(self._executing)
+        still_running = []
+        if executing:
+            # a job is done once its result is recorded, not just when its handler returns
+            _, pending = await asyncio.wait(list(executing), timeout=timeout)
+            still_running = [executing[job] for job in pending]
+        for job in list(self._running):
+            job.cancel()
+        if still_running:
+            log.warning(f'{len(still_running)} jobs still running at shutdown are left to be taken over')
+        await run_in_storage_thread(self.store.release_unfinished,
+                                    still_running)
+        if self._executor:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    async def submit(self,
+                     job_id: str,
+                     kind: str,
+                     payload: Dict,
+                     after: Optional[str] = None):
+        """queue a job; with `after`, it only starts once that job (of any worker) has finished, without holding
+        a slot while it waits. After a restart it runs straight away, so its handler must not rely on the order"""
+        if kind not in self.handlers:
+            raise ValueError(f'no handler for job kind {kind}')
+        await run_in_storage_thread(self.store.add, job_id, kind, payload)
+        self._schedule(job_id, kind, payload, after)
+
+    async def add_completed(self, job_id: str, kind: str, payload: Dict,
+                            result: Dict):
+        """record a job whose result is already known, e.g. from a cache, without running it"""
+
+        def add():
+            self.store.add(job_id, kind, payload)
+            self.store.update(job_id, TaskStatus.COMPLETED, result)
+
+        await run_in_storage_thread(add)
+
+    async def get(self, job_id: str) -> Optional[Task]:
+        return await run_in_storage_thread(self.store.get, job_id)
+
+    @property
+    def running(self) -> int:
+        """jobs that are queued or executing in this process"""
+        return len(self._running)
+
+    @property
+    def queued(self) -> int:
+        """jobs waiting for one of the `max_concurrency` slots"""
+        return max(0, len(self._running) - self.max_concurrency)
+
+    def _schedule(self,
+                  job_id: str,
+                  kind: str,
+                  payload: Dict,
+                  after: Optional[str] = None):
+        job = asyncio.create_task(self._run(job_id, kind, payload, after))
+        self._running.add(job)
+        job.add_done_callback(self._running.discard)
+
+    async def _wait_for(self, job_id: str):
+        while True:
+            job = await run_in_storage_thread(self.store.get, job_id)
+            if job is None or job.status in (TaskStatus.COMPLETED,
+                                             TaskStatus.FAILED):
+                return
+            await asyncio.sleep(_FOLLOW_POLL_INTERVAL)
+
+    async def _run(self,
+                   job_id: str,
+                   kind: str,
+                   payload: Dict,
+                   after: Optional[str] = None):
+        if after:
+            await self._wait_for(after)
+        async with self._semaphore:
+            # a job taken over from a worker that was only slow may still be scheduled there too; only one gets to run it
+            if not await run_in_storage_thread(self.store.claim, job_id):
+                return
+            started = time.perf_counter()
+            job = asyncio.current_task()
+            self._executing[job] = job_id
+            try:
+                result = await asyncio.get_running_loop().run_in_executor(
+                    self._executor, _call_handler, self.handlers[kind],
+                    payload)
+            except asyncio.CancelledError:
+                # only cancelled by stop() when its handler outlived the timeout; taken over once its heartbeat goes
+                # stale, so the job is run again
+                raise
+            except Exception as e:
+                log.exception(f'{kind} job {job_id} failed')
+                job_seconds.observe(time.perf_counter() - started,
+                                    kind=kind,
+                                    status=TaskStatus.FAILED.value)
+                await run_in_storage_thread(self.store.update, job_id,
+                                            TaskStatus.FAILED,
+                                            {"error": str(e)})
+                return
+            finally:
+                self._executing.pop(job, None)
+            job_seconds.observe(time.perf_counter() - started,
+                                kind=kind,
+                                status=TaskStatus.COMPLETED.value)
+            await run_in_storage_thread(self.store.update, job_id,
+                                        TaskStatus.COMPLETED, result)
+
+
+def _call_handler(handler: Callable[..., Dict], payload: Dict) -> Dict:
+    return handler(**payload)
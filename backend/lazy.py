@@ -0,0 +1,92 @@
+"""Deferred imports of the heavy agent and tool modules, and a hook that loads them in the background.
+
+With LAZY_IMPORTS on, `lazy_import` hands back a stand-in that imports the real module on first attribute
+access, so the server starts accepting requests without paying for modules only some routes use. With
+PRELOAD_MODULES also on, `start_preload` imports all of them on a thread shortly after startup, once the
+server already answers health checks, so the first request needing one does not pay for it either.
+With LAZY_IMPORTS off, modules are imported where `lazy_import` is called, as a plain import would."""
+import asyncio
+import importlib
+import logging
+import threading
+import time
+from types import ModuleType
+from typing import Callable, Dict, List
+
+from agent_dashboard.backend import settings
+
+log = logging.getLogger(__name__)
+
+_modules: Dict[str, "LazyModule"] = {}
+_after_preload: List[Callable[[], object]] = []
+_preload_task = None
+
+
+class LazyModule:
+    """stands in for a module until an attribute of it is needed"""
+
+    def __init__(self, name: str):
+        self._name = name
+        self._module = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._module is not None
+
+    def load(self) -> ModuleType:
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    started = time.perf_counter()
+                    self._module = importlib.import_module(self._name)
+                    log.info(f'imported {self._name} in {time.perf_counter() - started:.3f}s')
+        return self._module
+
+    def __getattr__(self, attribute: str):
+        return getattr(self.load(), attribute)
+
+    def __repr__(self) -> str:
+        return f'<lazy module {self._name}{"" if self.loaded else " (not loaded)"}>'
+
+
+def lazy_import(name: str):
+    """the module `name`, imported now or on first use depending on LAZY_IMPORTS"""
+    if not settings.LAZY_IMPORTS:
+        return importlib.import_module(name)
+    return _modules.setdefault(name, LazyModule(name))
+
+
+def after_preload(function: Callable[[], object]):
+    """run `function` on the preload thread once the deferred modules are imported, e.g. to warm a cache built from them"""
+    _after_preload.append(function)
+
+
+def preload():
+    """import every deferred module now, then run the after_preload hooks"""
+    started = time.perf_counter()
+    for module in list(_modules.values()):
+        try:
+            module.load()
+        except Exception:
+            log.exception(f'preloading {module._name} failed')
+    for function in _after_preload:
+        try:
+            function()
+        except Exception:
+            log.exception(f'{function} after preloading failed')
+    log.info(f'preloaded {len(_modules)} modules in {time.perf_counter() - started:.2f}s')
+
+
+async def start_preload(delay: float = settings.PRELOAD_DELAY):
+    """preload on a thread after `delay` seconds; returns at once, so it can be called from a startup handler"""
+    global _preload_task
+    if _preload_task is not None or not settings.LAZY_IMPORTS:
+        return
+
+    async def run():
+        # startup handlers finish before the server starts listening; the delay lets it get there first
+        await asyncio.sleep(delay)
+        await asyncio.get_running_loop().run_in_executor(None, preload)
+
+    _preload_task = asyncio.create_task(run())
@@ -0,0 +1,237 @@
+"""Counters, gauges and latency histograms, exposed in the Prometheus text format on /metrics.
+
+Everything is kept in process memory, so with several server workers each one reports its own numbers
+(scrape them through their own ports, or sum them up). With METRICS_ENABLED off, observations and
+histogram `time()` spans return immediately and the HTTP middleware is not installed."""
+import bisect
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from agent_dashboard.backend import settings
+
+enabled = settings.METRICS_ENABLED
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5,
+                   5.0, 10.0, 30.0, 60.0, 300.0)
+
+_null_span = nullcontext()
+
+
+class Metric:
+    type = ''
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(label, '')) for label in self.labels)
+
+    def _format_labels(self, key: Tuple[str, ...],
+                       extra: Optional[Tuple[str, str]] = None) -> str:
+        pairs = list(zip(self.labels, key))
+        if extra:
+            pairs.append(extra)
+        if not pairs:
+            return ''
+        escaped = (value.replace('\\', r'\\').replace('"', r'\"').replace(
+            '\n', r'\n') for _, value in pairs)
+        return '{' + ','.join(f'{label}="{value}"'
+                              for (label, _), value in zip(pairs, escaped)) + '}'
+
+    def samples(self) -> Iterator[str]:
+        raise NotImplementedError()
+
+    def render(self) -> str:
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} {self.type}']
+        lines.extend(self.samples())
+        return '\n'.join(lines)
+
+
+class _Value(Metric):
+    """a number per label set, or numbers read from `function` at scrape time, which costs nothing until someone scrapes.
+
+    Without labels `function` returns the number; with labels it returns a dict from label values (a tuple, or a
+    string for a single label) to numbers."""
+
+    def __init__(self,
+                 name: str,
+                 help: str,
+                 labels: Sequence[str] = (),
+                 function: Optional[Callable[[], float]] = None):
+        super().__init__(name, help, labels)
+        self.function = function
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def samples(self) -> Iterator[str]:
+        if self.function:
+            if not self.labels:
+                yield f'{self.name} {self.function()}'
+                return
+            for key, value in self.function().items():
+                key = key if isinstance(key, tuple) else (key, )
+                yield f'{self.name}{self._format_labels(key)} {value}'
+            return
+        with self._lock:
+            values = list(self._values.items())
+        for key, value in values:
+            yield f'{self.name}{self._format_labels(key)} {value}'
+
+
+class Counter(_Value):
+    type = 'counter'
+
+    def inc(self, amount: float = 1, **labels):
+        if not enabled:
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Value):
+    type = 'gauge'
+
+    def set(self, value: float, **labels):
+        if not enabled:
+            return
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(Metric):
+    type = 'histogram'
+
+    def __init__(self,
+                 name: str,
+                 help: str,
+                 labels: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+        # per label set: observations falling in each bucket (not cumulative), then sum
+        self._series: Dict[Tuple[str, ...], List] = {}
+
+    def observe(self, value: float, **labels):
+        if not enabled:
+            return
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def time(self, **labels):
+        """span that observes how long its block took"""
+        if not enabled:
+            return _null_span
+        return self._span(labels)
+
+    @contextmanager
+    def _span(self, labels: Dict[str, str]):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def samples(self) -> Iterator[str]:
+        with self._lock:
+            series = [(key, list(counts), total)
+                      for key, (counts, total) in self._series.items()]
+        for key, counts, total in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'), ), counts):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                yield f'{self.name}_bucket{self._format_labels(key, ("le", le))} {cumulative}'
+            yield f'{self.name}_sum{self._format_labels(key)} {total}'
+            yield f'{self.name}_count{self._format_labels(key)} {cumulative}'
+
+
+_registry: Dict[str, Metric] = {}
+_registry_lock = threading.Lock()
+
+
+def _register(metric: Metric) -> Metric:
+    with _registry_lock:
+        # modules may be imported more than once (reloads, several routers); the first registration wins
+        return _registry.setdefault(metric.name, metric)
+
+
+def counter(name: str,
+            help: str,
+            labels: Sequence[str] = (),
+            function: Optional[Callable[[], float]] = None) -> Counter:
+    return _register(Counter(name, help, labels, function))
+
+
+def gauge(name: str,
+          help: str,
+          labels: Sequence[str] = (),
+          function: Optional[Callable[[], float]] = None) -> Gauge:
+    return _register(Gauge(name, help, labels, function))
+
+
+def histogram(name: str,
+              help: str,
+              labels: Sequence[str] = (),
+              buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+    return _register(Histogram(name, help, labels, buckets))
+
+
+def render() -> str:
+    """every registered metric in the Prometheus text exposition format"""
+    with _registry_lock:
+        metrics = list(_registry.values())
+    return '\n'.join(metric.render() for metric in metrics) + '\n'
+
+
+http_request_seconds = histogram('http_request_duration_seconds',
+                                 'time to handle an HTTP request',
+                                 ('method', 'route', 'status'))
+storage_call_seconds = histogram(
+    'storage_call_duration_seconds',
+    'time spent in a blocking persistence call on the storage pool',
+    ('operation', ))
+
+
+class MetricsMiddleware:
+    """ASGI middleware timing every HTTP request by method, route template and status code.
+
+    The route template (`/teams/{team_id}`) rather than the path is the label, so a label set exists per route
+    and not per team. Requests no route matched are counted under "unmatched"."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get('route')
+            http_request_seconds.observe(
+                time.perf_counter() - started,
+                method=scope['method'],
+                route=getattr(route, 'path', 'unmatched'),
+                status=status)
@@ -0,0 +1,9 @@
+from agent_dashboard.backend.realtime.forwarding import ConversationInboxes
+from agent_dashboard.backend.realtime.hub import (
+    ConversationHub,
+    ConversationStream,
+    SlowConsumerPolicy,
+    Subscriber,
+)
+from agent_dashboard.backend.realtime.pending import PendingRequests, RequestCancelled
+from agent_dashboard.backend.realtime.registry import ConversationRegistry
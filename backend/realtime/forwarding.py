@@ -0,0 +1,110 @@
+import logging
+import os
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List, Tuple
+
+from agent_dashboard.backend import settings
+from agent_dashboard.backend.storage import (
+    MessageLog,
+    open_message_log,
+    run_in_storage_thread,
+)
+
+log = logging.getLogger(__name__)
+
+
+class ConversationInboxes:
+    """Carries what websocket clients send to a conversation over to the worker that owns it.
+
+    Each conversation has an inbox log in the shared data directory; any worker can append to it and
+    the owner polls the inboxes of the conversations it holds. Together with the frame logs the hub
+    follows, this stands in for a message broker between workers on one host.
+
+    A sender also appends a byte to the conversation's file in a notification directory. The owner
+    stats only the files of the conversations it consumes, each poll in one storage call, and empties a
+    file before reading its inbox, so the files stay a few bytes and idle inboxes are never opened."""
+
+    def __init__(self, data_dir: Path = settings.DATA_DIR):
+        self.data_dir = Path(data_dir)
+        self.notifications_dir = self.data_dir / 'inboxes'
+        # conversation id -> how far into its inbox this worker has consumed
+        self.positions: Dict[str, int] = {}
+
+    async def send(self, conversation_id: str, data: dict):
+
+        def send():
+            self._open(conversation_id).append(data)
+            self.notifications_dir.mkdir(parents=True, exist_ok=True)
+            with open(self._notification(conversation_id), 'ab') as notification:
+                notification.write(b'\n')
+
+        await run_in_storage_thread(send)
+
+    async def consume(self, conversation_id: str):
+        """start taking in messages for a conversation this worker now owns; earlier ones are ignored"""
+
+        def consume():
+            # emptied first, so a message sent in between notifies again and is read by the next poll
+            self._clear(conversation_id)
+            return self._open(conversation_id).count
+
+        self.positions[conversation_id] = await run_in_storage_thread(consume)
+
+    async def stop_consuming(self, conversation_id: str):
+        if self.positions.pop(conversation_id, None) is not None:
+            await run_in_storage_thread(self._remove, conversation_id)
+
+    async def poll(self, handler: Callable[[dict], Awaitable[None]]):
+        """hand every new inbox message of the consumed conversations to `handler`"""
+        if not self.positions:
+            return
+        for conversation_id, count, messages in await run_in_storage_thread(
+                self._read_notified, dict(self.positions)):
+            if conversation_id not in self.positions:
+                continue
+            self.positions[conversation_id] = count
+            for message in messages:
+                try:
+                    await handler(message)
+                except Exception:
+                    log.exception(
+                        f'forwarded message for {conversation_id} failed')
+
+    def _read_notified(self, positions: Dict[str, int]) -> List[Tuple[str, int, List[dict]]]:
+        """(conversation id, inbox count, new messages) of each consumed conversation with a notification"""
+        new_messages = []
+        for conversation_id, position in positions.items():
+            try:
+                if os.stat(self._notification(conversation_id)).st_size == 0:
+                    continue
+            except FileNotFoundError:
+                continue
+
+            # emptied before the inbox is read: a message appended later notifies again, one appended
+            # earlier is read now
+            self._clear(conversation_id)
+            inbox = self._open(conversation_id)
+            count = inbox.count
+            if count > position:
+                new_messages.append((conversation_id, count, inbox.read(position, count)))
+        return new_messages
+
+    def _notification(self, conversation_id: str) -> Path:
+        return self.notifications_dir / conversation_id
+
+    def _clear(self, conversation_id: str):
+        try:
+            os.truncate(self._notification(conversation_id), 0)
+        except FileNotFoundError:
+            pass
+
+    def _remove(self, conversation_id: str):
+        try:
+            os.remove(self._notification(conversation_id))
+        except FileNotFoundError:
+            pass
+
+    def _open(self, conversation_id: str) -> MessageLog:
+        return open_message_log(self.data_dir / conversation_id / 'streams',
+                                f'{conversation_id}_inbox',
+                                shared=True)
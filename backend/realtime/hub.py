@@ -0,0 +1,317 @@
+import asyncio
+import logging
+from collections import deque
+from enum import Enum
+from pathlib import Path
+from typing import Deque, Dict, List, Optional, Set, Tuple
+
+from agent_dashboard.backend import serialization, settings
+from agent_dashboard.backend.storage import (
+    MessageLog,
+    open_message_log,
+    run_in_storage_thread,
+)
+from fastapi import WebSocket
+
+log = logging.getLogger(__name__)
+
+
+class SlowConsumerPolicy(Enum):
+    DROP_OLDEST = "drop_oldest"
+    DISCONNECT = "disconnect"
+
+
+class ConversationStream:
+    """The numbered sequence of frames published to one conversation.
+
+    Every frame gets the next `seq`, is kept in a ring buffer of the most recent frames and is appended to a
+    frame log on disk in the background, so any range of it can be replayed to a websocket that reconnects."""
+
+    def __init__(self, conversation_id: str, message_log: MessageLog,
+                 ring_size: int):
+        self.conversation_id = conversation_id
+        self.message_log = message_log
+        self.next_seq = message_log.count
+
+        self._ring: Deque[Tuple[int, str]] = deque(maxlen=ring_size)
+        self._unpersisted: List[bytes] = []
+        self._persister: Optional[asyncio.Task] = None
+        # set while this worker is only following a conversation that another worker owns and writes
+        self._follower: Optional[asyncio.Task] = None
+
+    def append(self, message: dict) -> str:
+        """number and serialise a message, returning the frame to send"""
+        seq = self.next_seq
+        self.next_seq += 1
+
+        frame = serialization.dumps_str({**message, "seq": seq})
+        self._ring.append((seq, frame))
+        self._unpersisted.append(frame.encode() + b'\n')
+        if self._persister is None or self._persister.done():
+            self._persister = asyncio.create_task(self._persist())
+        return frame
+
+    def follow(self, frame: str):
+        """take in a frame another worker already numbered and persisted"""
+        self._ring.append((self.next_seq, frame))
+        self.next_seq += 1
+
+    async def flush(self):
+        """wait until every frame appended so far is in the frame log"""
+        while self._persister and not self._persister.done():
+            await asyncio.shield(self._persister)
+
+    async def read(self, start: int, stop: int) -> List[str]:
+        """frames with seq in [start, stop), from memory when the ring buffer still holds them"""
+        if self._ring and start >= self._ring[0][0]:
+            oldest = self._ring[0][0]
+            return [
+                frame for _, frame in list(self._ring)[start - oldest:stop -
+                                                       oldest]
+            ]
+
+        await self.flush()
+        lines = await run_in_storage_thread(self.message_log.read_lines,
+                                            start, stop)
+        return [line.decode().rstrip('\n') for line in lines]
+
+    async def _persist(self):
+        while self._unpersisted:
+            batch, self._unpersisted = self._unpersisted, []
+            try:
+                await run_in_storage_thread(self.message_log.append_encoded,
+                                            batch)
+            except Exception:
+                log.exception(
+                    f'could not persist frames of {self.conversation_id}')
+
+
+class Subscriber:
+    """one websocket watching a conversation, with its own bounded outbound buffer and writer task"""
+
+    def __init__(self,
+                 conversation_id: str,
+                 websocket: WebSocket,
+                 max_queue: int,
+                 policy: SlowConsumerPolicy,
+                 stream: ConversationStream,
+                 replay_from: Optional[int] = None):
+        self.conversation_id = conversation_id
+        self.websocket = websocket
+        self.max_queue = max_queue
+        self.policy = policy
+        self.stream = stream
+
+        # while catching up on missed frames the subscriber takes nothing live; the replay
+        # reads on until it reaches the head of the stream and only then switches over
+        self.replay_from = replay_from
+        self.live = replay_from is None
+
+        self.dropped = 0
+        self.closed = False
+        self._frames: Deque[str] = deque()
+        self._ready = asyncio.Event()
+        self._writer: Optional[asyncio.Task] = None
+
+    def start(self):
+        self._writer = asyncio.create_task(self._write())
+
+    def offer(self, frame: str) -> bool:
+        """buffer a frame without waiting; returns False if the subscriber was dropped for being too slow"""
+        if self.closed:
+            return False
+        if not self.live:
+            return True
+        if len(self._frames) >= self.max_queue:
+            if self.policy is SlowConsumerPolicy.DISCONNECT:
+                log.warning(
+                    f'disconnecting slow subscriber of {self.conversation_id}')
+                self.close(code=1013)
+                return False
+            self._frames.popleft()
+            self.dropped += 1
+        self._frames.append(frame)
+        self._ready.set()
+        return True
+
+    @property
+    def queued(self) -> int:
+        return len(self._frames)
+
+    def close(self, code: Optional[int] = None):
+        if self.closed:
+            return
+        self.closed = True
+        if self._writer:
+            self._writer.cancel()
+        if code is not None:
+            asyncio.create_task(self._close_socket(code))
+
+    async def _write(self):
+        try:
+            if not self.live:
+                await self._replay()
+            while True:
+                await self._ready.wait()
+                while self._frames:
+                    await self.websocket.send_text(self._frames.popleft())
+                self._ready.clear()
+        except asyncio.CancelledError:
+            pass
+        except Exception:
+            log.info(f'subscriber of {self.conversation_id} went away')
+            self.closed = True
+
+    async def _replay(self, batch: int = 256):
+        position = max(self.replay_from, 0)
+        while True:
+            head = self.stream.next_seq
+            if position >= head:
+                # no await between reading the head and going live, so no frame falls in between
+                self.live = True
+                return
+            frames = await self.stream.read(position,
+                                            min(head, position + batch))
+            if not frames:
+                log.warning(
+                    f'frames {position}-{head} of {self.conversation_id} are gone, resuming live'
+                )
+                position = head
+                continue
+            for frame in frames:
+                await self.websocket.send_text(frame)
+            position += len(frames)
+
+    async def _close_socket(self, code: int):
+        try:
+            await self.websocket.close(code=code)
+        except Exception:
+            pass
+
+
+class ConversationHub:
+    """Fans conversation messages out to every websocket subscribed to the conversation.
+
+    A message is serialised once per publish and then only buffered per subscriber, so publishing never
+    waits on a socket and one slow browser cannot hold up the agent loop or the other viewers.
+    Frames carry a per-conversation `seq`; a client reconnecting with the last seq it saw is sent
+    the frames it missed before it rejoins the live stream."""
+
+    def __init__(self,
+                 max_queue: int = settings.HUB_SUBSCRIBER_QUEUE_SIZE,
+                 policy: str = settings.HUB_SLOW_CONSUMER_POLICY,
+                 ring_size: int = settings.HUB_REPLAY_BUFFER_SIZE,
+                 data_dir: Path = settings.DATA_DIR):
+        self.max_queue = max_queue
+        self.policy = SlowConsumerPolicy(policy)
+        self.ring_size = ring_size
+        self.data_dir = Path(data_dir)
+
+        self.subscribers: Dict[str, Set[Subscriber]] = {}
+        self.streams: Dict[str, ConversationStream] = {}
+
+    async def open_stream(self, conversation_id: str) -> ConversationStream:
+        stream = self.streams.get(conversation_id)
+        if stream is None:
+            message_log = await run_in_storage_thread(
+                self._open_frame_log, conversation_id)
+            # another caller may have opened it while we were waiting on the disk
+            stream = self.streams.setdefault(
+                conversation_id,
+                ConversationStream(conversation_id, message_log,
+                                   self.ring_size))
+        return stream
+
+    def close_stream(self, conversation_id: str):
+        self.streams.pop(conversation_id, None)
+
+    async def flush_and_close_stream(self, conversation_id: str):
+        stream = self.streams.pop(conversation_id, None)
+        if stream:
+            await stream.flush()
+
+    async def subscribe(self,
+                        conversation_id: str,
+                        websocket: WebSocket,
+                        last_seen: Optional[int] = None,
+                        remote: bool = False) -> Subscriber:
+        """subscribe a websocket; `remote` when the conversation is owned by another worker and only its frames are followed here"""
+        stream = await self.open_stream(conversation_id)
+        replay_from = None
+        if last_seen is not None and last_seen + 1 < stream.next_seq:
+            replay_from = last_seen + 1
+
+        subscriber = Subscriber(conversation_id, websocket, self.max_queue,
+                                self.policy, stream, replay_from)
+        self.subscribers.setdefault(conversation_id, set()).add(subscriber)
+        subscriber.start()
+        if remote:
+            await self.mirror(conversation_id)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        subscriber.close()
+        subscribers = self.subscribers.get(subscriber.conversation_id)
+        if subscribers is not None:
+            subscribers.discard(subscriber)
+            if not subscribers:
+                del self.subscribers[subscriber.conversation_id]
+
+    def has_subscribers(self, conversation_id: str) -> bool:
+        return bool(self.subscribers.get(conversation_id))
+
+    def publish(self, conversation_id: str, message: dict) -> int:
+        """record `message` in the conversation's stream and send it to every live subscriber; returns how many it was buffered for"""
+        stream = self.streams.get(conversation_id)
+        if stream is None:
+            # only reached if nothing opened the stream first, e.g. publishing to a conversation nobody ever connected to
+            stream = self.streams.setdefault(
+                conversation_id,
+                ConversationStream(conversation_id,
+                                   self._open_frame_log(conversation_id),
+                                   self.ring_size))
+        return self._fan_out(conversation_id, stream.append(message))
+
+    async def mirror(self, conversation_id: str):
+        """follow the frame log of a conversation owned by another worker, fanning its frames out to our subscribers"""
+        stream = await self.open_stream(conversation_id)
+        if stream._follower is None or stream._follower.done():
+            stream._follower = asyncio.create_task(self._follow(stream))
+
+    async def _follow(self, stream: ConversationStream):
+        conversation_id = stream.conversation_id
+        while self.has_subscribers(conversation_id):
+            count = await run_in_storage_thread(
+                lambda: stream.message_log.count)
+            if count > stream.next_seq:
+                lines = await run_in_storage_thread(
+                    stream.message_log.read_lines, stream.next_seq, count)
+                for line in lines:
+                    frame = line.decode().rstrip('\n')
+                    stream.follow(frame)
+                    self._fan_out(conversation_id, frame)
+            await asyncio.sleep(settings.CLUSTER_POLL_INTERVAL)
+
+        if self.streams.get(conversation_id) is stream:
+            self.close_stream(conversation_id)
+
+    def _fan_out(self, conversation_id: str, frame: str) -> int:
+        delivered = 0
+        for subscriber in list(self.subscribers.get(conversation_id, ())):
+            if subscriber.offer(frame):
+                delivered += 1
+            elif subscriber.closed:
+                self.unsubscribe(subscriber)
+        return delivered
+
+    def connection_count(self) -> int:
+        return sum(len(s) for s in self.subscribers.values())
+
+    def queued_frames(self) -> int:
+        return sum(subscriber.queued
+                   for subscribers in self.subscribers.values()
+                   for subscriber in subscribers)
+
+    def _open_frame_log(self, conversation_id: str) -> MessageLog:
+        return open_message_log(self.data_dir / conversation_id / 'streams',
+                                f'{conversation_id}_frames')
@@ -0,0 +1,164 @@
+import asyncio
+import logging
+from collections import deque
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Deque, Dict, List, Optional, Set
+from uuid import uuid4
+
+from agent_dashboard.backend import settings
+
+log = logging.getLogger(__name__)
+
+
+class RequestCancelled(Exception):
+    """the question was withdrawn before it was answered, e.g. because its conversation lost every viewer"""
+
+
+@dataclass
+class _Pending:
+    conversation_id: str
+    future: asyncio.Future
+
+
+class PendingRequests:
+    """Questions sent to websocket clients that are waiting for their answer, correlated by `request_id`.
+
+    Every question is sent with a fresh request_id and answered by a client frame carrying the same one, which
+    `resolve` routes to the waiting `ask`. At most `max_per_conversation` questions of a conversation are out at
+    once; further ones queue for a slot. A timeout is a timer handle on the event loop rather than a task per
+    question, so thousands of outstanding questions cost little more than their futures."""
+
+    def __init__(self,
+                 max_per_conversation: int = settings.HUMAN_REQUESTS_PER_CONVERSATION):
+        self.max_per_conversation = max_per_conversation
+        self._requests: Dict[str, _Pending] = {}
+        self._by_conversation: Dict[str, Set[str]] = {}
+        # per conversation: questions holding a slot, and the asks queued for one
+        self._in_flight: Dict[str, int] = {}
+        self._waiting: Dict[str, Deque[asyncio.Future]] = {}
+
+    def __len__(self) -> int:
+        return len(self._requests)
+
+    def outstanding(self, conversation_id: str) -> int:
+        return len(self._by_conversation.get(conversation_id, ()))
+
+    def conversations(self) -> List[str]:
+        """the conversations with questions out"""
+        return list(self._by_conversation)
+
+    async def ask(self, conversation_id: str,
+                  send: Callable[[str], Awaitable[None]],
+                  timeout: float = settings.HUMAN_REQUEST_TIMEOUT) -> dict:
+        """call `send` with a new request_id and return the answer given to it.
+
+        Raises TimeoutError when no answer came within `timeout` seconds, counting the time spent waiting
+        for a slot, and RequestCancelled when the conversation's questions were cancelled meanwhile."""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        await self._acquire(conversation_id, deadline)
+        try:
+            request_id = str(uuid4())
+            future = loop.create_future()
+            self._requests[request_id] = _Pending(conversation_id, future)
+            self._by_conversation.setdefault(conversation_id,
+                                             set()).add(request_id)
+            timer = loop.call_at(
+                deadline, _fail, future,
+                TimeoutError(f'Timeout waiting for response to request {request_id}'))
+            try:
+                await send(request_id)
+                return await future
+            finally:
+                timer.cancel()
+                self._forget(request_id)
+        finally:
+            self._release(conversation_id)
+
+    def resolve(self, request_id: str, response: dict,
+                conversation_id: Optional[str] = None) -> bool:
+        """hand `response` to the question it answers; False when there is no such question (anymore).
+
+        With `conversation_id`, only a question of that conversation can be answered, so a client cannot
+        answer questions of conversations it is not connected to."""
+        pending = self._requests.get(request_id)
+        if pending is None or (conversation_id is not None and
+                               pending.conversation_id != conversation_id):
+            return False
+        if pending.future.done():
+            return False
+        pending.future.set_result(response)
+        return True
+
+    def cancel_conversation(self, conversation_id: str,
+                            reason: str = 'cancelled') -> int:
+        """fail every outstanding and queued question of a conversation with RequestCancelled; returns how many"""
+        error = RequestCancelled(f'{reason}: questions of {conversation_id} withdrawn')
+        cancelled = 0
+        for request_id in list(self._by_conversation.get(conversation_id, ())):
+            cancelled += _fail(self._requests[request_id].future, error)
+        for waiter in self._waiting.get(conversation_id, ()):
+            cancelled += _fail(waiter, error)
+        if cancelled:
+            log.info(f'cancelled {cancelled} questions of {conversation_id}: {reason}')
+        return cancelled
+
+    async def _acquire(self, conversation_id: str, deadline: float):
+        in_flight = self._in_flight.get(conversation_id, 0)
+        if in_flight < self.max_per_conversation:
+            self._in_flight[conversation_id] = in_flight + 1
+            return
+
+        loop = asyncio.get_running_loop()
+        waiter = loop.create_future()
+        waiting = self._waiting.setdefault(conversation_id, deque())
+        waiting.append(waiter)
+        timer = loop.call_at(
+            deadline, _fail, waiter,
+            TimeoutError(f'Timeout waiting for a free question slot of {conversation_id}'))
+        try:
+            # _release hands its slot over by resolving the waiter
+            await waiter
+        except BaseException:
+            if waiter.done() and not waiter.cancelled() and waiter.exception() is None:
+                # the slot was handed over just as we were cancelled
+                self._release(conversation_id)
+            elif waiter in waiting:
+                waiting.remove(waiter)
+                if not waiting:
+                    self._waiting.pop(conversation_id, None)
+            raise
+        finally:
+            timer.cancel()
+
+    def _release(self, conversation_id: str):
+        waiting = self._waiting.get(conversation_id)
+        while waiting:
+            waiter = waiting.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self._waiting.pop(conversation_id, None)
+
+        in_flight = self._in_flight.get(conversation_id, 0) - 1
+        if in_flight > 0:
+            self._in_flight[conversation_id] = in_flight
+        else:
+            self._in_flight.pop(conversation_id, None)
+
+    def _forget(self, request_id: str):
+        pending = self._requests.pop(request_id, None)
+        if pending is None:
+            return
+        request_ids = self._by_conversation.get(pending.conversation_id)
+        if request_ids is not None:
+            request_ids.discard(request_id)
+            if not request_ids:
+                del self._by_conversation[pending.conversation_id]
+
+
+def _fail(future: asyncio.Future, error: BaseException) -> bool:
+    if future.done():
+        return False
+    future.set_exception(error)
+    return True
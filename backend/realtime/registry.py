@@ -0,0 +1,145 @@
+import os
+import socket
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from agent_dashboard.backend import settings
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS workers (
+    worker_id TEXT PRIMARY KEY,
+    pid INTEGER NOT NULL,
+    heartbeat REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS conversations (
+    conversation_id TEXT PRIMARY KEY,
+    worker_id TEXT NOT NULL,
+    claimed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS conversations_worker ON conversations (worker_id);
+CREATE TABLE IF NOT EXISTS viewers (
+    conversation_id TEXT NOT NULL,
+    worker_id TEXT NOT NULL,
+    viewers INTEGER NOT NULL,
+    PRIMARY KEY (conversation_id, worker_id)
+);
+"""
+
+
+class ConversationRegistry:
+    """Which server worker owns which live conversation, shared by all workers through a SQLite file.
+
+    A conversation lives in the memory of the worker that created it. Workers heartbeat here; a
+    worker that stops heartbeating for `worker_timeout` seconds no longer owns anything. Workers also
+    count here the websockets following a conversation owned by another worker, so the owner knows
+    it still has viewers."""
+
+    def __init__(self,
+                 path: Path,
+                 worker_id: Optional[str] = None,
+                 worker_timeout: float = settings.CLUSTER_WORKER_TIMEOUT):
+        self.path = Path(path)
+        self.worker_id = worker_id or f'{socket.gethostname()}-{os.getpid()}'
+        self.worker_timeout = worker_timeout
+        self._lock = threading.Lock()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._connection = sqlite3.connect(self.path,
+                                           check_same_thread=False,
+                                           isolation_level=None,
+                                           timeout=30)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.executescript(_SCHEMA)
+
+    def heartbeat(self):
+        with self._lock:
+            self._connection.execute(
+                'INSERT OR REPLACE INTO workers (worker_id, pid, heartbeat) VALUES (?, ?, ?)',
+                (self.worker_id, os.getpid(), time.time()))
+
+    def leave(self):
+        with self._lock:
+            self._connection.execute(
+                'DELETE FROM conversations WHERE worker_id = ?',
+                (self.worker_id, ))
+            self._connection.execute('DELETE FROM viewers WHERE worker_id = ?',
+                                     (self.worker_id, ))
+            self._connection.execute('DELETE FROM workers WHERE worker_id = ?',
+                                     (self.worker_id, ))
+
+    def claim(self, conversation_id: str) -> bool:
+        """make this worker the owner of a conversation it now holds in memory; False if another live worker owns it"""
+        now = time.time()
+        with self._lock:
+            cursor = self._connection.execute(
+                'INSERT INTO conversations (conversation_id, worker_id, claimed_at) VALUES (?, ?, ?) '
+                'ON CONFLICT (conversation_id) DO UPDATE SET worker_id = excluded.worker_id, '
+                'claimed_at = excluded.claimed_at '
+                'WHERE conversations.worker_id = excluded.worker_id OR conversations.worker_id NOT IN '
+                '(SELECT worker_id FROM workers WHERE heartbeat > ?)',
+                (conversation_id, self.worker_id, now, now - self.worker_timeout))
+        return cursor.rowcount == 1
+
+    def release(self, conversation_id: str):
+        with self._lock:
+            self._connection.execute(
+                'DELETE FROM conversations WHERE conversation_id = ? AND worker_id = ?',
+                (conversation_id, self.worker_id))
+
+    def add_viewer(self, conversation_id: str):
+        """count a websocket on this worker following a conversation owned by another worker"""
+        with self._lock:
+            self._connection.execute(
+                'INSERT INTO viewers (conversation_id, worker_id, viewers) VALUES (?, ?, 1) '
+                'ON CONFLICT (conversation_id, worker_id) DO UPDATE SET viewers = viewers + 1',
+                (conversation_id, self.worker_id))
+
+    def remove_viewer(self, conversation_id: str):
+        with self._lock:
+            self._connection.execute(
+                'UPDATE viewers SET viewers = viewers - 1 WHERE conversation_id = ? AND worker_id = ?',
+                (conversation_id, self.worker_id))
+            self._connection.execute(
+                'DELETE FROM viewers WHERE conversation_id = ? AND worker_id = ? AND viewers <= 0',
+                (conversation_id, self.worker_id))
+
+    def has_remote_viewers(self, conversation_id: str) -> bool:
+        """whether websockets on other live workers follow the conversation"""
+        with self._lock:
+            row = self._connection.execute(
+                'SELECT 1 FROM viewers v JOIN workers w ON w.worker_id = v.worker_id '
+                'WHERE v.conversation_id = ? AND v.worker_id != ? AND v.viewers > 0 AND w.heartbeat > ? '
+                'LIMIT 1',
+                (conversation_id, self.worker_id,
+                 time.time() - self.worker_timeout)).fetchone()
+        return row is not None
+
+    def owner(self, conversation_id: str) -> Optional[str]:
+        """the live worker that owns the conversation, if any"""
+        with self._lock:
+            row = self._connection.execute(
+                'SELECT c.worker_id FROM conversations c JOIN workers w ON w.worker_id = c.worker_id '
+                'WHERE c.conversation_id = ? AND w.heartbeat > ?',
+                (conversation_id,
+                 time.time() - self.worker_timeout)).fetchone()
+        return row[0] if row else None
+
+    def workers(self) -> Dict[str, int]:
+        """live worker id -> number of conversations it owns"""
+        with self._lock:
+            rows = self._connection.execute(
+                'SELECT w.worker_id, COUNT(c.conversation_id) FROM workers w '
+                'LEFT JOIN conversations c ON c.worker_id = w.worker_id '
+                'WHERE w.heartbeat > ? GROUP BY w.worker_id',
+                (time.time() - self.worker_timeout, )).fetchall()
+        return dict(rows)
+
+    def owned(self) -> List[str]:
+        with self._lock:
+            rows = self._connection.execute(
+                'SELECT conversation_id FROM conversations WHERE worker_id = ?',
+                (self.worker_id, )).fetchall()
+        return [row[0] for row in rows]
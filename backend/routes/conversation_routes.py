@@ -3,17 +3,31 @@ import json
 import logging
 import os
 import random
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from enum import Enum
 from glob import glob
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Callable, Dict, List, Optional
 from uuid import UUID, uuid4
 
-from agent_dashboard.sdk import AgentTraceSDK, load_team_conversation_messages
+from agent_dashboard.backend import metrics, serialization, settings
+from agent_dashboard.backend.admission import RouteClass
+from agent_dashboard.backend.agent_templates import agent_templates, tool_registry
+from agent_dashboard.backend.realtime import (
+    ConversationHub,
+    ConversationInboxes,
+    ConversationRegistry,
+    PendingRequests,
+    RequestCancelled,
+)
+from agent_dashboard.backend.storage import SnapshotStore, run_in_storage_thread
 from fastapi import (
     APIRouter,
     BackgroundTasks,
+    Depends,
     FastAPI,
     HTTPException,
     WebSocket,
@@ -21,7 +35,6 @@ from fastapi import (
     WebSocketException,
 )
 from fastapi.responses import JSONResponse
-from src.agents.tools.base_tool import get_all_exported_tools, get_tool_by_name
 from src.conversations import ConversationMessage, ConversationWithAgents, LLMAgent
 from src.conversations.participants import HumanParticipant, Participant
 from pydantic import BaseModel
@@ -29,6 +42,24 @@ from pydantic import BaseModel
 log = logging.getLogger(__name__)
 router = APIRouter()
 
+# agent turns block on LLM round trips, so they run here instead of on the event loop.
+# Turns of one conversation run one after another; different conversations run in parallel.
+conversation_executor = ThreadPoolExecutor(
+    max_workers=settings.CONVERSATION_WORKERS,
+    thread_name_prefix='conversation')
+
+turn_seconds = metrics.histogram('conversation_turn_duration_seconds',
+                                 'time taken by one advance() of a conversation')
+human_response_seconds = metrics.histogram(
+    'human_response_wait_seconds',
+    'time send_and_wait_for_response waited for the human to answer',
+    ('outcome', ))
+conversations_evicted = metrics.counter(
+    'conversations_evicted_total', 'idle conversations evicted from memory')
+conversations_rehydrated = metrics.counter(
+    'conversations_rehydrated_total',
+    'evicted conversations recreated from their snapshot')
+
 
 @dataclass
 class NewMessageForHuman:
@@ -61,23 +92,93 @@ class RecipientNotFound:
 
 
 @router.websocket("/c2/{conversation_id}")
-async def websocket_endpoint(websocket: WebSocket, conversation_id: str):
-    """Connect to an existing conversation"""
+async def websocket_endpoint(websocket: WebSocket,
+                             conversation_id: str,
+                             last_seen: Optional[int] = None):
+    """Connect to an existing conversation
+
+    Every frame sent carries a `seq`. A client reconnecting with ?last_seen=<seq> is first sent the frames it missed."""
 
     log.info(conversation_id)
     log.info(WebSocketConversationManager.active_conversations)
 
-    if conversation_id not in WebSocketConversationManager.active_conversations:
+    if (conversation_id in WebSocketConversationManager.active_conversations
+            or await WebSocketConversationManager.rehydrate(conversation_id)):
+        remote = False
+        subscriber = await WebSocketConversationManager.connect(
+            websocket, conversation_id, last_seen=last_seen)
+        handle_incoming_data = WebSocketConversationManager.handle_incoming_data
+    elif await WebSocketConversationManager.owned_by_other_worker(
+            conversation_id):
+        # the conversation lives on another worker - follow its frames here and forward what the client sends
+        remote = True
+        subscriber = await WebSocketConversationManager.connect(
+            websocket, conversation_id, last_seen=last_seen, remote=True)
+        handle_incoming_data = WebSocketConversationManager.forward_incoming_data
+    else:
         await websocket.close(code=404)
         return
-    await WebSocketConversationManager.connect(websocket, conversation_id)
 
     try:
         while True:
-            data = await websocket.receive_json()
-            await WebSocketConversationManager.handle_incoming_data(data)
+            data = serialization.loads(await websocket.receive_text())
+            # the socket's own conversation, whatever the client claims, so it can only talk to (and answer) that one
+            data["conversation_id"] = conversation_id
+            await handle_incoming_data(data)
     except WebSocketDisconnect:
-        WebSocketConversationManager.disconnect(conversation_id)
+        pass
+    finally:
+        # however the socket ends - a bad frame raises too - it must not stay subscribed, or the conversation
+        # never counts as idle and its questions are never cancelled
+        await WebSocketConversationManager.disconnect(subscriber, remote=remote)
+
+
+# router event handlers can be run twice: FastAPI both copies them onto the app and runs
+# the router's own lifespan, so every start/stop here is a no-op when already done
+@router.on_event("startup")
+async def join_cluster():
+    if settings.WORKERS > 1 and WebSocketConversationManager.registry is None:
+        await WebSocketConversationManager.start_cluster()
+    await WebSocketConversationManager.start_sweeper()
+
+
+@router.on_event("startup")
+async def warm_tool_registry():
+    # with lazy imports the background preload warms it instead of holding up startup
+    if not tool_registry.warmed and not settings.LAZY_IMPORTS:
+        await asyncio.get_running_loop().run_in_executor(
+            None, tool_registry.warm)
+
+
+@router.on_event("shutdown")
+async def leave_cluster():
+    await WebSocketConversationManager.stop_sweeper()
+    await WebSocketConversationManager.stop_cluster()
+
+
+@router.get("/c2/stats")
+async def get_conversation_stats_endpoint():
+    """resident conversations and roughly how much memory they hold"""
+    return WebSocketConversationManager.stats()
+
+
+@router.get("/cluster")
+async def get_cluster_endpoint():
+    """the workers of this deployment and how many live conversations each owns"""
+    registry = WebSocketConversationManager.registry
+    if not registry:
+        worker_id = str(os.getpid())
+        return {
+            "worker_id": worker_id,
+            "workers": {
+                worker_id:
+                len(WebSocketConversationManager.active_conversations)
+            }
+        }
+    return {
+        "worker_id": registry.worker_id,
+        "workers": await run_in_storage_thread(registry.workers),
+    }
 
 
 class CreateNewAgentRequest(BaseModel):
@@ -94,22 +195,49 @@ class CreateConversationRequest(BaseModel):
     human_intervention_count: int = 4
 
 
-@router.post("/c2/create")
+# conversations stay in memory until evicted, so they are shed while too many are resident
+conversation_creation_admission = RouteClass(
+    'conversation_creation',
+    rate=settings.CONVERSATION_CREATION_RATE,
+    burst=settings.CONVERSATION_CREATION_BURST,
+    max_in_flight=settings.CONVERSATION_CREATION_MAX_IN_FLIGHT,
+    max_backlog=settings.CONVERSATION_CREATION_MAX_RESIDENT,
+    backlog=lambda: len(WebSocketConversationManager.active_conversations))
+
+
+@router.post("/c2/create", dependencies=[Depends(conversation_creation_admission)])
 async def create_conversation(
     create_conversation_request: CreateConversationRequest,
     create_new_agent_requests: List[CreateNewAgentRequest],
 ):
-    """Create a conversation"""
+    """Create a conversation
+
+    Refused with 409 when the conversation is live on another worker, since it can only run on one."""
 
-    conversation_id = []
+    messages = None
     if conversation_id := create_conversation_request.conversation_id:
-        messages = load_team_conversation_messages(
-            create_conversation_request.conversation_id)
+        if await WebSocketConversationManager.owned_by_other_worker(
+                conversation_id):
+            raise HTTPException(
+                status_code=409,
+                detail=f"Conversation {conversation_id} is live on another worker")
+        # only the latest window of the history is held in memory, older messages stay in the log
+        snapshots = WebSocketConversationManager.snapshots
+        snapshot = await run_in_storage_thread(snapshots.load,
+                                               conversation_id)
+        messages = await run_in_storage_thread(snapshots.recent_messages,
+                                               conversation_id, snapshot)
     conversation_id = WebSocketConversationManager.create_new_conversation(
         create_conversation_request=create_conversation_request,
         create_agent_requests=create_new_agent_requests,
         conversation_history=messages,
     )
+    if not await WebSocketConversationManager.activate(
+            conversation_id, create_conversation_request,
+            create_new_agent_requests):
+        raise HTTPException(
+            status_code=409,
+            detail=f"Conversation {conversation_id} is live on another worker")
     return JSONResponse(content={"conversation_id": conversation_id},
                         status_code=201)
 
@@ -133,24 +261,36 @@ class WebSocketConversation(ConversationWithAgents):
             message_history=message_history,
         )
 
-    async def _handle_new_message_for_human(
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._inbox: "asyncio.Queue[Callable[[], None]]" = asyncio.Queue()
+        self._runner: Optional[asyncio.Task] = None
+        self.last_active = time.monotonic()
+        # rough number of bytes held by the message history, counted as messages are appended
+        self.estimated_bytes = 0
+        self._counted_messages = 0
+        self._count_new_messages()
+
+    def _handle_new_message_for_human(
         self,
         incoming_message: ConversationMessage,
     ):
+        # called from advance() on a conversation thread - the websocket round trip has to happen on the event loop
         super()._handle_new_message_for_human(incoming_message)
+        return asyncio.run_coroutine_threadsafe(
+            self._ask_human(incoming_message), self._loop).result()
 
-        message = NewMessageForHuman(incoming_message)
-        response = await WebSocketConversationManager.send_and_wait_for_response(
-            conversation_id=self.conversation_id, message=message.to_dict())
-        model = HumanResponse(**response)
-        participant = self.get_participant_from_name(model.participant_name)
-        if not participant:
-            response_to_participant_not_found = (
-                await WebSocketConversationManager.send_and_wait_for_response(
-                    conversation_id=self.conversation_id,
-                    message=RecipientNotFound().to_dict(),
-                ))
-            return
+    async def _ask_human(self, incoming_message: ConversationMessage):
+        message = NewMessageForHuman(incoming_message).to_dict()
+        while True:
+            response = await WebSocketConversationManager.send_and_wait_for_response(
+                conversation_id=self.conversation_id, message=message)
+            model = HumanResponse(**response)
+            participant = self.get_participant_from_name(model.participant_name)
+            if participant:
+                break
+            # asked again, and answered the same way as the question itself
+            message = RecipientNotFound(
+                f"could not find recipient {model.participant_name}").to_dict()
         self.prepare_new_message(
             ConversationMessage(sender=HumanParticipant(),
                                 recipient=participant,
@@ -159,6 +299,23 @@ class WebSocketConversation(ConversationWithAgents):
     def is_started(self):
         return bool(self.message_history)
 
+    def is_busy(self) -> bool:
+        """whether a turn is running or queued"""
+        return self._runner is not None and not self._runner.done()
+
+    def _count_new_messages(self):
+        """add the messages appended to the history since the last call to estimated_bytes"""
+        history = self.message_history or []
+        if len(history) < self._counted_messages:
+            # the history was trimmed, count what is left from scratch
+            self.estimated_bytes = 0
+            self._counted_messages = 0
+        for message in history[self._counted_messages:]:
+            if not isinstance(message, dict):
+                message = message.to_dict()
+            self.estimated_bytes += len(json.dumps(message, default=str))
+        self._counted_messages = len(history)
+
     def continue_conversation(self):
         # if not self.unprocessed_message:
 
@@ -174,41 +331,77 @@ class WebSocketConversation(ConversationWithAgents):
         return workspace
 
     def start_as_human(self, first_message: str, recipient: Participant):
-        workspace = self.create_workspace()
 
-        first_message += f"Use the folder {workspace} as root when creating any files if no path is given."
-        self.prepare_new_message(
-            ConversationMessage(sender=HumanParticipant(),
-                                recipient=recipient,
-                                content=first_message))
-        self._run_conversation()
+        def prepare():
+            workspace = self.create_workspace()
+            self.prepare_new_message(
+                ConversationMessage(
+                    sender=HumanParticipant(),
+                    recipient=recipient,
+                    content=first_message +
+                    f"Use the folder {workspace} as root when creating any files if no path is given."
+                ))
 
-    def _start(self, first_message: ConversationMessage):
-        self.prepare_new_message(first_message)
-        self._run_conversation()
+        self.submit(prepare)
 
-    def _run_conversation(self):
+    def _start(self, first_message: ConversationMessage):
+        self.submit(lambda: self.prepare_new_message(first_message))
+
+    def submit(self, prepare: Callable[[], None]):
+        """queue `prepare`, which stages the next message, to run on this conversation's runner followed by the turns it sets off.
+
+        Returns immediately; the runner works through the queue in order without blocking the event loop."""
+        self._loop = asyncio.get_running_loop()
+        self.last_active = time.monotonic()
+        self._inbox.put_nowait(prepare)
+        if self._runner is None or self._runner.done():
+            self._runner = asyncio.create_task(self._run_inbox())
+
+    async def _run_inbox(self):
+        while not self._inbox.empty():
+            prepare = self._inbox.get_nowait()
+            try:
+                await self._loop.run_in_executor(conversation_executor,
+                                                 prepare)
+                await self._run_conversation()
+            except Exception:
+                log.exception(
+                    f"conversation {self.conversation_id} failed to process a message"
+                )
+
+    async def _run_conversation(self):
         while self.unprocessed_message:
             if self.manual_interrupt_flag:
                 self.manual_interrupt_flag = True
                 self.manual_interrupt_flag = False
-            self.advance()
+            await self._loop.run_in_executor(conversation_executor,
+                                             self._timed_advance)
+
+    def _timed_advance(self):
+        with turn_seconds.time():
+            try:
+                self.advance()
+            finally:
+                self._count_new_messages()
 
     async def handle_new_conversation_message(self, message: str,
                                               recipient: str):
         human = next(p for p in self.participants
                      if isinstance(p, HumanParticipant))
         recipient_agent = next(
-            p for p in self.participants
-            if isinstance(p, LLMAgent) and p.name == recipient)
+            (p for p in self.participants
+             if isinstance(p, LLMAgent) and p.name == recipient), None)
+        if recipient_agent is None:
+            # one bad message should not cost the viewer its connection
+            await WebSocketConversationManager.send_message(
+                self.conversation_id,
+                RecipientNotFound(f"could not find recipient {recipient}").to_dict())
+            return
 
-        self.prepare_new_message(
+        self.submit(lambda: self.prepare_new_message(
             ConversationMessage(sender=human,
                                 recipient=recipient_agent,
-                                content=message))
-
-        while self.unprocessed_message:
-            self.advance()
+                                content=message)))
 
     # def advance(self):
     #     message = self.unprocessed_message
@@ -240,18 +433,313 @@ class WebSocketConversationManager:
     # also overloaded with the methods to send data
 
     active_conversations: Dict[str, WebSocketConversation] = {}
-    active_connections: Dict[str, WebSocket] = {}
-    pending_requests: Dict[str, asyncio.Future] = {}
+    # every websocket watching a conversation - a conversation can have any number of viewers
+    hub = ConversationHub()
+    # questions to the human waiting for the client frame with their request_id
+    pending_requests = PendingRequests()
+
+    # what it takes to bring an evicted conversation back: its create requests and its latest messages,
+    # written when it is created and refreshed as it goes
+    snapshots = SnapshotStore()
+    # number of stored messages the snapshot of each resident conversation covers
+    snapshot_seqs: Dict[str, int] = {}
+    _sweeper_task: Optional[asyncio.Task] = None
+    # held across an eviction or a rehydration, so one never runs halfway through the other; a lock only
+    # lives while someone holds or waits for it
+    _lifecycle_locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+    evicted_total = 0
+    rehydrated_total = 0
+
+    # only with several workers: who owns which conversation, and the inboxes carrying client messages to the owner
+    registry: Optional[ConversationRegistry] = None
+    inboxes = ConversationInboxes()
+    _cluster_task: Optional[asyncio.Task] = None
+
+    @classmethod
+    async def start_cluster(cls):
+        cls.registry = ConversationRegistry(settings.DATA_DIR /
+                                            'registry.sqlite3')
+        await run_in_storage_thread(cls.registry.heartbeat)
+        cls._cluster_task = asyncio.create_task(cls._run_cluster())
+        log.info(f'joined cluster as worker {cls.registry.worker_id}')
+
+    @classmethod
+    async def stop_cluster(cls):
+        if cls._cluster_task:
+            cls._cluster_task.cancel()
+            cls._cluster_task = None
+        if cls.registry:
+            await run_in_storage_thread(cls.registry.leave)
+            cls.registry = None
+
+    @classmethod
+    async def _run_cluster(cls):
+        last_heartbeat = 0.0
+        while True:
+            loop_time = asyncio.get_running_loop().time()
+            try:
+                if loop_time - last_heartbeat >= settings.CLUSTER_HEARTBEAT_INTERVAL:
+                    await run_in_storage_thread(cls.registry.heartbeat)
+                    last_heartbeat = loop_time
+                    # viewers of a worker that died never said they left
+                    for conversation_id in cls.pending_requests.conversations():
+                        await cls.cancel_if_unwatched(conversation_id)
+                await cls.inboxes.poll(cls.handle_incoming_data)
+            except Exception:
+                log.exception('cluster maintenance failed')
+            await asyncio.sleep(settings.CLUSTER_POLL_INTERVAL)
+
+    @classmethod
+    async def activate(cls, conversation_id: str,
+                       create_conversation_request: "CreateConversationRequest",
+                       create_agent_requests: List["CreateNewAgentRequest"]) -> bool:
+        """bring a conversation that was just put into active_conversations online, and snapshot how to recreate it.
+
+        False, with the conversation dropped again, if another live worker holds it"""
+        if not await cls.claim(conversation_id):
+            cls.active_conversations.pop(conversation_id, None)
+            return False
+        await cls.hub.open_stream(conversation_id)
+
+        create_conversation_request = create_conversation_request.model_copy(
+            update={"conversation_id": conversation_id})
+        snapshot = await run_in_storage_thread(
+            cls.snapshots.checkpoint, conversation_id, {
+                "conversation":
+                create_conversation_request.model_dump(),
+                "agents":
+                [request.model_dump() for request in create_agent_requests],
+            })
+        cls.snapshot_seqs[conversation_id] = snapshot["seq"]
+        return True
+
+    @classmethod
+    async def checkpoint(cls, conversation_id: str):
+        """roll the conversation's snapshot forward over the messages stored since it was taken"""
+        snapshots = cls.snapshots
+
+        def roll():
+            snapshot = snapshots.load(conversation_id)
+            return snapshot and snapshots.checkpoint(conversation_id, snapshot)
+
+        snapshot = await run_in_storage_thread(roll)
+        if snapshot:
+            cls.snapshot_seqs[conversation_id] = snapshot["seq"]
+
+    @classmethod
+    async def checkpoint_stale(cls,
+                               every: int = settings.CONVERSATION_SNAPSHOT_EVERY):
+        """checkpoint the resident conversations that stored `every` messages or more since their last snapshot"""
+        for conversation_id in list(cls.active_conversations):
+            count = await run_in_storage_thread(
+                lambda: cls.snapshots.history(conversation_id).count)
+            if count - cls.snapshot_seqs.get(conversation_id, 0) >= every:
+                await cls.checkpoint(conversation_id)
+
+    @classmethod
+    def _lifecycle_lock(cls, conversation_id: str) -> asyncio.Lock:
+        lock = cls._lifecycle_locks.get(conversation_id)
+        if lock is None:
+            lock = cls._lifecycle_locks[conversation_id] = asyncio.Lock()
+        return lock
+
+    @classmethod
+    async def rehydrate(cls, conversation_id: str) -> bool:
+        """recreate an evicted conversation from its snapshot and stored messages; False if there is nothing to recreate"""
+        async with cls._lifecycle_lock(conversation_id):
+            # an eviction finishing, or another connect rehydrating, while this one waited
+            if conversation_id in cls.active_conversations:
+                return True
+            return await cls._rehydrate(conversation_id)
+
+    @classmethod
+    async def _rehydrate(cls, conversation_id: str) -> bool:
+        if await cls.owned_by_other_worker(conversation_id):
+            return False
+        snapshot = await run_in_storage_thread(cls.snapshots.load,
+                                               conversation_id)
+        if snapshot is None:
+            return False
+
+        messages = await run_in_storage_thread(cls.snapshots.recent_messages,
+                                               conversation_id, snapshot)
+        # another connect may have rehydrated it while we were reading
+        if conversation_id not in cls.active_conversations:
+            create_conversation_request = CreateConversationRequest(
+                **snapshot["conversation"])
+            create_agent_requests = [
+                CreateNewAgentRequest(**agent) for agent in snapshot["agents"]
+            ]
+            cls.create_new_conversation(
+                create_conversation_request=create_conversation_request,
+                create_agent_requests=create_agent_requests,
+                conversation_history=messages,
+            )
+            if not await cls.activate(conversation_id,
+                                      create_conversation_request,
+                                      create_agent_requests):
+                return False
+            cls.rehydrated_total += 1
+            conversations_rehydrated.inc()
+            log.info(f'rehydrated conversation {conversation_id}')
+        return True
+
+    @classmethod
+    def is_idle(cls, conversation_id: str) -> bool:
+        """whether nothing on this worker uses the conversation; see has_remote_viewers for the other workers"""
+        conversation = cls.active_conversations[conversation_id]
+        return not (cls.hub.has_subscribers(conversation_id)
+                    or conversation.is_busy())
+
+    @classmethod
+    async def has_remote_viewers(cls, conversation_id: str) -> bool:
+        """whether websockets on other workers follow the conversation and forward to its inbox"""
+        if not cls.registry:
+            return False
+        return await run_in_storage_thread(cls.registry.has_remote_viewers,
+                                           conversation_id)
+
+    @classmethod
+    async def evict(cls, conversation_id: str) -> bool:
+        """drop a conversation from memory if it is (still) idle; its snapshot and messages stay on disk for rehydrate"""
+        async with cls._lifecycle_lock(conversation_id):
+            # a viewer may have connected since the caller found it idle
+            if (conversation_id not in cls.active_conversations
+                    or not cls.is_idle(conversation_id)):
+                return False
+            # viewers on other workers would forward messages to an inbox nobody reads any more
+            if await cls.has_remote_viewers(conversation_id):
+                return False
+            del cls.active_conversations[conversation_id]
+            await cls.checkpoint(conversation_id)
+            cls.snapshot_seqs.pop(conversation_id, None)
+            await cls.hub.flush_and_close_stream(conversation_id)
+            await cls.inboxes.stop_consuming(conversation_id)
+            if cls.registry:
+                await run_in_storage_thread(cls.registry.release,
+                                            conversation_id)
+        cls.evicted_total += 1
+        conversations_evicted.inc()
+        log.info(f'evicted idle conversation {conversation_id}')
+        return True
 
     @classmethod
-    async def connect(cls, websocket: WebSocket, conversation_id: str):
+    async def sweep(cls,
+                    idle_timeout: float = settings.CONVERSATION_IDLE_TIMEOUT,
+                    max_resident: int = settings.CONVERSATION_MAX_RESIDENT):
+        """evict conversations idle past the timeout, then the least recently active idle ones while over the limit"""
+        now = time.monotonic()
+        idle = sorted(
+            (conversation.last_active, conversation_id)
+            for conversation_id, conversation in cls.active_conversations.items()
+            if cls.is_idle(conversation_id))
+
+        excess = len(cls.active_conversations) - max_resident
+        for last_active, conversation_id in idle:
+            if now - last_active < idle_timeout and excess <= 0:
+                break
+            if await cls.evict(conversation_id):
+                excess -= 1
+
+    @classmethod
+    async def start_sweeper(cls):
+        if cls._sweeper_task is None:
+            cls._sweeper_task = asyncio.create_task(cls._run_sweeper())
+
+    @classmethod
+    async def stop_sweeper(cls):
+        if cls._sweeper_task:
+            cls._sweeper_task.cancel()
+            cls._sweeper_task = None
+
+    @classmethod
+    async def _run_sweeper(cls):
+        while True:
+            await asyncio.sleep(settings.CONVERSATION_SWEEP_INTERVAL)
+            try:
+                await cls.checkpoint_stale()
+                await cls.sweep()
+            except Exception:
+                log.exception('sweeping idle conversations failed')
+
+    @classmethod
+    def estimated_bytes(cls) -> int:
+        return sum(conversation.estimated_bytes
+                   for conversation in list(cls.active_conversations.values()))
+
+    @classmethod
+    def stats(cls) -> Dict[str, int]:
+        return {
+            "resident_conversations": len(cls.active_conversations),
+            "estimated_bytes": cls.estimated_bytes(),
+            "evicted_total": cls.evicted_total,
+            "rehydrated_total": cls.rehydrated_total,
+        }
+
+    @classmethod
+    async def claim(cls, conversation_id: str) -> bool:
+        """record this worker as the owner of a conversation it now holds; False if another live worker owns it"""
+        if cls.registry:
+            if not await run_in_storage_thread(cls.registry.claim,
+                                               conversation_id):
+                return False
+            await cls.inboxes.consume(conversation_id)
+        return True
+
+    @classmethod
+    async def owned_by_other_worker(cls, conversation_id: str) -> bool:
+        if not cls.registry:
+            return False
+        owner = await run_in_storage_thread(cls.registry.owner,
+                                            conversation_id)
+        return owner is not None and owner != cls.registry.worker_id
+
+    @classmethod
+    async def forward_incoming_data(cls, data: dict):
+        await cls.inboxes.send(data["conversation_id"], data)
+
+    @classmethod
+    async def connect(cls,
+                      websocket: WebSocket,
+                      conversation_id: str,
+                      last_seen: Optional[int] = None,
+                      remote: bool = False):
         await websocket.accept()
 
-        cls.active_connections[conversation_id] = websocket
+        subscriber = await cls.hub.subscribe(conversation_id,
+                                             websocket,
+                                             last_seen=last_seen,
+                                             remote=remote)
+        if remote and cls.registry:
+            await run_in_storage_thread(cls.registry.add_viewer,
+                                        conversation_id)
+        return subscriber
+
+    @classmethod
+    async def disconnect(cls, subscriber, remote: bool = False):
+        conversation_id = subscriber.conversation_id
+        cls.hub.unsubscribe(subscriber)
+        if remote and cls.registry:
+            await run_in_storage_thread(cls.registry.remove_viewer,
+                                        conversation_id)
+            # the questions wait on the owner, which learns through its inbox that a viewer left
+            if not cls.hub.has_subscribers(conversation_id):
+                await cls.inboxes.send(conversation_id, {
+                    "conversation_id": conversation_id,
+                    "viewer_left": True
+                })
+        else:
+            await cls.cancel_if_unwatched(conversation_id)
 
     @classmethod
-    def disconnect(cls, conversation_id: str):
-        cls.active_connections.pop(conversation_id, None)
+    async def cancel_if_unwatched(cls, conversation_id: str):
+        """withdraw the conversation's questions once no viewer on any worker is left to answer them"""
+        if (not cls.pending_requests.outstanding(conversation_id)
+                or cls.hub.has_subscribers(conversation_id)
+                or await cls.has_remote_viewers(conversation_id)):
+            return
+        cls.pending_requests.cancel_conversation(
+            conversation_id, reason='last viewer disconnected')
 
     @classmethod
     def create_new_conversation(
@@ -266,16 +754,12 @@ class WebSocketConversationManager:
             uuid4())
 
         agents = []
-        for create_agent_request in create_agent_requests:
+        # tools are resolved once per set of agent definitions, not per conversation
+        for template in agent_templates.get(create_agent_requests):
             # only implemented creating LLMAgents for now
-
-            agent_type = create_agent_request.agent_type or "LLMAgent"
-            agent = LLMAgent(name=create_agent_request.name,
-                             prompt=create_agent_request.prompt)
-
-            for tool_name in create_agent_request.tools:
-                if tool := get_tool_by_name(tool_name):
-                    agent.register_tool(tool)
+            agent = LLMAgent(name=template.name, prompt=template.prompt)
+            for tool in template.tools:
+                agent.register_tool(tool)
             agents.append(agent)
         conversation = WebSocketConversation(
             name=create_conversation_request.name,
@@ -295,41 +779,45 @@ class WebSocketConversationManager:
 
     @classmethod
     async def send_message(cls, conversation_id: str, message: dict):
-        if conversation_id in cls.active_connections:
-            await cls.active_connections[conversation_id].send_json(message)
+        if conversation := cls.active_conversations.get(conversation_id):
+            conversation.last_active = time.monotonic()
+        cls.hub.publish(conversation_id, message)
 
     @classmethod
-    async def send_and_wait_for_response(cls,
-                                         conversation_id: str,
-                                         message: dict,
-                                         timeout: int = 30) -> dict:
-        if conversation_id not in cls.active_connections:
+    async def send_and_wait_for_response(
+            cls,
+            conversation_id: str,
+            message: dict,
+            timeout: float = settings.HUMAN_REQUEST_TIMEOUT) -> dict:
+        """send `message` to the conversation's viewers and wait for the frame answering it.
+
+        The message goes out with a `request_id` and the answer has to carry the same one. Raises TimeoutError
+        when nobody answers in time and RequestCancelled when the last viewer disconnects first."""
+        # with several workers the viewers may be connected to another worker, following the frame log
+        if not (cls.hub.has_subscribers(conversation_id)
+                or await cls.has_remote_viewers(conversation_id)):
             raise ValueError(
                 f"No active connection for conversation_id: {conversation_id}")
-        request_id = str(uuid4())
-        message["request_id"] = request_id
 
-        # Create a future to wait for the response
-
-        response_future = asyncio.get_running_loop().create_future()
-        cls.pending_requests[request_id] = response_future
+        async def send(request_id: str):
+            await cls.send_message(conversation_id, {
+                **message, "request_id": request_id
+            })
 
+        started = time.perf_counter()
+        outcome = "answered"
         try:
-            # Send the message
-
-            await cls.send_message(conversation_id, message)
-
-            # Wait for the response with a timeout
-
-            response = await asyncio.wait_for(response_future, timeout)
-            return response
-        except asyncio.TimeoutError:
-            raise TimeoutError(
-                f"Timeout waiting for response to request {request_id}")
+            return await cls.pending_requests.ask(conversation_id, send,
+                                                  timeout)
+        except TimeoutError:
+            outcome = "timeout"
+            raise
+        except RequestCancelled:
+            outcome = "cancelled"
+            raise
         finally:
-            # Clean up the pending request
-
-            cls.pending_requests.pop(request_id, None)
+            human_response_seconds.observe(time.perf_counter() - started,
+                                           outcome=outcome)
 
     @classmethod
     async def handle_incoming_data(cls, data: dict):
@@ -339,6 +827,19 @@ class WebSocketConversationManager:
         message: str = data.get("message", "")
         recipient_name: str = data.get("recipient", "")
 
+        # sent by disconnect on another worker when its last viewer of the conversation left
+        if data.get("viewer_left"):
+            await cls.cancel_if_unwatched(conversation_id)
+            return
+
+        # an answer to a question sent with send_and_wait_for_response
+        if request_id := data.get("request_id"):
+            if not cls.pending_requests.resolve(request_id, data,
+                                                conversation_id):
+                log.warning(
+                    f"no question {request_id} waiting in {conversation_id}, it timed out or was cancelled")
+            return
+
         if conversation_id not in cls.active_conversations:
             log.exception(
                 f"got invalid conversation id from websocket data {data}")
@@ -351,10 +852,32 @@ class WebSocketConversationManager:
             log.info(f"received initial data: {data}")
             recipient = conversation.get_participant_from_name(recipient_name)
             if not recipient:
-                raise WebSocketException(
-                    code=422, reason=f"could not find recipient {recipient}")
+                await cls.send_message(
+                    conversation_id,
+                    RecipientNotFound(
+                        f"could not find recipient {recipient_name}").to_dict())
+                return
             conversation.start_as_human(first_message=message,
                                         recipient=recipient)
         else:
             log.info(
                 f"received data after conversation has been started: {data}")
+            await conversation.handle_new_conversation_message(
+                message=message, recipient=recipient_name)
+
+
+metrics.gauge('conversations_resident',
+              'live conversations held in memory by this worker',
+              function=lambda: len(WebSocketConversationManager.active_conversations))
+metrics.gauge('conversations_estimated_bytes',
+              'rough bytes held by the message histories of the live conversations',
+              function=WebSocketConversationManager.estimated_bytes)
+metrics.gauge('websocket_connections',
+              'websockets subscribed to conversations',
+              function=lambda: WebSocketConversationManager.hub.connection_count())
+metrics.gauge('websocket_queued_frames',
+              'frames buffered for websockets that have not been sent yet',
+              function=lambda: WebSocketConversationManager.hub.queued_frames())
+metrics.gauge('pending_human_requests',
+              'questions to the human still waiting for an answer',
+              function=lambda: len(WebSocketConversationManager.pending_requests))
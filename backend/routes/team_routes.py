@@ -1,85 +1,271 @@
+import asyncio
 import json
 import logging
-import os
-from enum import Enum
-from glob import glob
-from pathlib import Path
-from typing import Dict, List, Optional
+import threading
+from typing import Dict, Iterator, List, Optional, Set, Tuple
 from uuid import UUID, uuid4
 
+from agent_dashboard.backend import metrics, serialization, settings
+from agent_dashboard.backend.admission import RouteClass
+from agent_dashboard.backend.lazy import lazy_import
+from agent_dashboard.backend.jobs import JobQueue, JobStore, TaskStatus
+from agent_dashboard.backend.serialization import RawJSONResponse
+from agent_dashboard.backend.storage import (
+    LRUCache,
+    SequenceGap,
+    creation_key,
+    iterate_in_storage_thread,
+    open_creation_cache,
+    open_message_log,
+    open_search_index,
+    open_team_catalog,
+    run_in_storage_thread,
+    storage_cache,
+)
 from agent_dashboard.backend.utils import generate_short_id
-from fastapi import APIRouter, BackgroundTasks, HTTPException
-from src.agents import team_creation
-from src.agents.utils.team_creator_utils import retry
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 
 log = logging.getLogger(__name__)
 
 router = APIRouter()
 
-team_data_dir = Path(
-    r'D:\projects\testbed\open-llm-swe\agent_dashboard\backend\data\teams')
+# only team creation needs these, and they pull in the LLM client libraries
+team_creation = lazy_import('src.agents.team_creation')
+team_creator_utils = lazy_import('src.agents.utils.team_creator_utils')
+
+team_data_dir = settings.DATA_DIR
 
 
 class CreateTeamRequest(BaseModel):
     task: str
 
 
-class TaskStatus(Enum):
-    PENDING = "pending"
-    PROCESSING = "processing"
-    COMPLETED = "completed"
-    FAILED = "failed"
+# created on startup, once there is an event loop to run jobs on
+job_queue: Optional[JobQueue] = None
+_search_catch_up: Optional[asyncio.Task] = None
+_search_indexer: Optional[asyncio.Task] = None
+# conversations stored to since the search index last caught up with them
+_unindexed: Set[str] = set()
+_unindexed_lock = threading.Lock()
+
+metrics.gauge('jobs_running',
+              'background jobs queued or running in this worker',
+              function=lambda: job_queue.running if job_queue else 0)
+metrics.gauge('jobs_queued',
+              'background jobs waiting for a free slot in this worker',
+              function=lambda: job_queue.queued if job_queue else 0)
+
+# every creation not answered from the cache is a job running the LLM pipeline, so they are shed while
+# too many of those are pending
+team_creation_admission = RouteClass(
+    'team_creation',
+    rate=settings.TEAM_CREATION_RATE,
+    burst=settings.TEAM_CREATION_BURST,
+    max_in_flight=settings.TEAM_CREATION_MAX_IN_FLIGHT,
+    max_backlog=settings.TEAM_CREATION_MAX_PENDING_JOBS,
+    backlog=lambda: job_queue.running if job_queue else 0)
+for _stat in ('hits', 'misses', 'evictions', 'invalidations'):
+    metrics.counter(f'storage_cache_{_stat}_total',
+                    f'{_stat} of the team and conversation cache',
+                    function=lambda stat=_stat: storage_cache.stats()[stat])
+metrics.gauge('storage_cache_bytes',
+              'size of the entries held by the team and conversation cache',
+              function=lambda: storage_cache.stats()["bytes"])
+
+
+# creations being started by this worker, by creation key - identical requests arriving meanwhile wait for its
+# (task id, status) to queue their own job after it
+_starting_creations: Dict[str, "asyncio.Future[Optional[Tuple[str, str]]]"] = {}
+
+team_creation_cache_hits = metrics.counter(
+    'team_creation_cache_hits_total',
+    'team creations answered from the cached answer to the same task')
+team_creation_cache_misses = metrics.counter(
+    'team_creation_cache_misses_total',
+    'team creations that ran the LLM pipeline')
+team_creations_coalesced = metrics.counter(
+    'team_creations_coalesced_total',
+    'team creations queued to reuse the answer of an identical one still in progress')
+
+# idempotency keys of messages stored through the batch route: (team_id, key) -> seq of the message
+_stored_keys = LRUCache(max_entries=settings.MESSAGE_BATCH_IDEMPOTENCY_KEYS,
+                        max_bytes=settings.MESSAGE_BATCH_IDEMPOTENCY_KEYS)
+# a batch's duplicate check and its append happen under its conversation's lock - one of a fixed set, shared by
+# the conversations hashing to it, so the locks do not grow with the number of teams
+_batch_locks = tuple(threading.Lock() for _ in range(64))
+
+
+def _batch_lock(conversation_id: str) -> threading.Lock:
+    return _batch_locks[hash(conversation_id) % len(_batch_locks)]
+
+
+NDJSON_CONTENT_TYPES = ('application/x-ndjson', 'application/ndjson',
+                        'application/jsonl')
+
+
+# FastAPI may run router event handlers twice (copied onto the app and again through the router's
+# lifespan), so they only act the first time
+@router.on_event("startup")
+async def start_job_queue():
+    global job_queue
+    if job_queue is not None:
+        return
+    job_queue = JobQueue(JobStore(team_data_dir / 'jobs.sqlite3'),
+                         handlers={"create_team": _create_team_task})
+    await job_queue.start()
+
+
+@router.on_event("shutdown")
+async def stop_job_queue():
+    global job_queue
+    if job_queue:
+        await job_queue.stop()
+        job_queue = None
+
+
+@router.on_event("startup")
+async def catch_up_search_index():
+    # conversations stored before the index existed, or by a worker that died before indexing them
+    global _search_catch_up, _search_indexer
+    if _search_catch_up is None or _search_catch_up.done():
+        _search_catch_up = asyncio.create_task(
+            run_in_storage_thread(_backfill_search_index))
+    if _search_indexer is None:
+        _search_indexer = asyncio.create_task(_run_search_indexer())
+
+
+@router.on_event("shutdown")
+async def stop_search_indexer():
+    global _search_indexer
+    if _search_indexer:
+        _search_indexer.cancel()
+        _search_indexer = None
+        await run_in_storage_thread(_index_pending)
+
+
+async def _run_search_indexer():
+    while True:
+        await asyncio.sleep(settings.SEARCH_INDEX_INTERVAL)
+        if _unindexed:
+            await run_in_storage_thread(_index_pending)
+
+
+def _create_team_task(task: str, key: Optional[str] = None) -> Dict:
+    """job handler - blocks for the whole LLM pipeline, so it only ever runs on the job pool.
+
+    With a creation `key`, the pipeline's answer is cached under it, and an answer already cached (typically by the
+    identical creation this job was queued after) is used instead of running the pipeline. Either way the team is
+    a new one, since its id is also the id of its conversation."""
+    cache = open_creation_cache(team_data_dir) if key else None
+    cached = cache.get(key) if cache else None
+    if cached is None:
+        create_team_with_retry = team_creator_utils.retry(team_creation.create_team,
+                                                          max_attempts=3,
+                                                          delay=1)
+        created, workflow = create_team_with_retry(task)
+        agents = [agent.to_dict() for agent in created.values()]
+        if cache:
+            cache.put(key, agents, workflow)
+    else:
+        agents, workflow = cached
 
+    team_id = str(generate_short_id())
+    _write_team_files(team_id, agents, workflow)
 
-class Task(BaseModel):
-    id: str
-    status: TaskStatus
-    result: Optional[Dict] = None
+    result = {"team_id": team_id, "message": "Team created successfully"}
+    if cached is not None:
+        result["cached"] = True
+    return result
 
 
-tasks: Dict[UUID, Task] = {}
+def _team_from_cache(key: str) -> Optional[str]:
+    """id of a new team built from the answer cached for this creation key, if there is one"""
+    cached = open_creation_cache(team_data_dir).get(key)
+    if cached is None:
+        return None
+    team_id = str(generate_short_id())
+    _write_team_files(team_id, *cached)
+    return team_id
 
 
-async def create_team_task(task_id: UUID, task: str):
-    try:
-        tasks[task_id].status = TaskStatus.PROCESSING
-        team_id = await _create_team_task(task)
-        tasks[task_id].status = TaskStatus.COMPLETED
-        tasks[task_id].result = {
-            "team_id": team_id,
-            "message": "Team created successfully"
-        }
-
-    except Exception as e:
-        tasks[task_id].status = TaskStatus.FAILED
-        tasks[task_id].result = {"error": str(e)}
-
-
-async def _create_team_task(task: str):
-    # await asyncio.sleep(10)
-    create_team_with_retry = retry(team_creation.create_team,
-                                   max_attempts=3,
-                                   delay=1)
-
-    agents, workflow = create_team_with_retry(task)
-    team_id = str(generate_short_id())
+async def _start_team_creation(task: str,
+                               key: str,
+                               after: Optional[str] = None) -> Tuple[str, str]:
+    """(task id, status) of a new job answering `task`: completed at once from a cached answer, or queued after
+    the job of an identical creation still in progress on any worker (`after`, if already known) so it can reuse
+    that one's answer, or else queued to run the pipeline"""
+    task_id = str(uuid4())
+    payload = {"task": task, "key": key}
+
+    if after is None:
+        if team_id := await run_in_storage_thread(_team_from_cache, key):
+            team_creation_cache_hits.inc()
+            await job_queue.add_completed(
+                task_id, "create_team", payload, {
+                    "team_id": team_id,
+                    "message": "Team created successfully",
+                    "cached": True
+                })
+            return task_id, TaskStatus.COMPLETED.value
+        after = await run_in_storage_thread(job_queue.store.find_unfinished,
+                                            "create_team", key)
+
+    if after:
+        team_creations_coalesced.inc()
+    else:
+        team_creation_cache_misses.inc()
+    await job_queue.submit(task_id, "create_team", payload, after=after)
+    return task_id, TaskStatus.PENDING.value
+
 
-    team_data_dir.mkdir(parents=True, exist_ok=True)
+def _write_team_files(team_id: str, agents: List[Dict], workflow: str):
+    team_catalog = open_team_catalog(team_data_dir)
 
-    agents_file = team_data_dir / f'{team_id}_agents.json'
-    agents_file.write_text(
-        json.dumps([agent.to_dict() for agent in agents.values()]))
+    agents_file = team_catalog.agents_path(team_id)
+    agents_file.write_text(json.dumps(agents))
 
-    workflow_file = team_data_dir / f'{team_id}_workflow.json'
+    workflow_file = team_catalog.workflow_path(team_id)
     workflow_file.write_text(workflow)
 
-    return team_id
+    # only catalogued once both files are in place, so a listed team is always readable
+    team_catalog.add(team_id)
+    storage_cache.invalidate(('team', team_id))
+
+
+def _list_team_ids(offset: int = 0,
+                   limit: Optional[int] = None,
+                   descending: bool = False) -> Dict:
+    team_catalog = open_team_catalog(team_data_dir)
+    return {
+        'data': team_catalog.list(offset=offset,
+                                  limit=limit,
+                                  descending=descending),
+        'total': team_catalog.count(),
+    }
+
+
+def _read_team_file(team_id: str) -> Optional[List[Dict]]:
+    team_catalog = open_team_catalog(team_data_dir)
+    if not team_catalog.contains(team_id):
+        return None
+
+    agents_file = team_catalog.agents_path(team_id)
+    stat = agents_file.stat()
+    validator = (stat.st_size, stat.st_mtime_ns)
+
+    data = storage_cache.get(('team', team_id), validator)
+    if data is None:
+        with open(agents_file, 'r') as file:
+            data = json.load(file)
+        storage_cache.put(('team', team_id), data, stat.st_size, validator)
+    return data
 
 
 @router.get("/tasks/{task_id}")
 async def get_task_status_endpoint(task_id: UUID):
-    task = tasks.get(task_id)
+    task = await job_queue.get(str(task_id))
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
     return {
@@ -90,82 +276,401 @@ async def get_task_status_endpoint(task_id: UUID):
 
 
 @router.get("/teams")
-async def get_teams_endpoint():
-    matching_files = team_data_dir.glob("*_agents.json")
-    # Search for the specific team file
-    matching_files = [f.name.strip('_agents.json') for f in matching_files]
-
-    return {'data': matching_files}
+async def get_teams_endpoint(
+        offset: int = Query(default=0, ge=0),
+        limit: Optional[int] = Query(default=None, ge=1, le=1000),
+        order: str = Query(default="asc", pattern="^(asc|desc)$")):
+    """team ids ordered by creation time, with the total number of teams"""
+    return await run_in_storage_thread(_list_team_ids,
+                                       offset=offset,
+                                       limit=limit,
+                                       descending=order == "desc")
 
 
 @router.get("/teams/{team_id}")
 async def get_team_endpoint(team_id: str):
-    pattern = os.path.join(team_data_dir, "*_agents.json")
-    matching_files = glob(pattern)
-    # Search for the specific team file
-    target_filename = f"{team_id}_agents.json"
-    matching_file = next(
-        (f for f in matching_files if os.path.basename(f) == target_filename),
-        None)
-
-    if matching_file:
-        # Read and return the JSON content
-        with open(matching_file, 'r') as file:
-            data = json.load(file)
-            return {'data': data}
-    else:
+    data = await run_in_storage_thread(_read_team_file, team_id)
+
+    if data is None:
         raise HTTPException(status_code=404, detail="Team id not found")
+    return {'data': data}
 
 
-@router.post("/teams/create")
-async def create_team_endpoint(request: CreateTeamRequest,
-                               background_tasks: BackgroundTasks):
-    """Connect to an existing conversation"""
-    task_id = uuid4()
-    tasks[task_id] = Task(id=str(task_id), status=TaskStatus.PENDING)
+@router.post("/teams/create", dependencies=[Depends(team_creation_admission)])
+async def create_team_endpoint(request: CreateTeamRequest):
+    """Queue a team creation job.
 
-    background_tasks.add_task(create_team_task, task_id, request.task)
+    Every creation gets a team of its own. A task already answered (compared after normalising case and spacing)
+    gets one built from the cached answer as an already completed job, and one identical to a creation still in
+    progress waits for that creation's answer instead of running the LLM pipeline again. Refused with 429 when
+    the client creates teams too fast, and 503 while too many creations are pending."""
+    key = creation_key(request.task)
 
-    return {"task_id": task_id, "status": "pending"}
+    if (starting := _starting_creations.get(key)) is not None:
+        leader = await asyncio.shield(starting)
+        after = leader[0] if leader and leader[1] == TaskStatus.PENDING.value else None
+        task_id, status = await _start_team_creation(request.task, key, after)
+        return {"task_id": task_id, "status": status}
+
+    starting = _starting_creations[key] = asyncio.get_running_loop().create_future()
+    started = None
+    try:
+        started = await _start_team_creation(request.task, key)
+    finally:
+        starting.set_result(started)
+        del _starting_creations[key]
+    task_id, status = started
+    return {"task_id": task_id, "status": status}
+
+
+def _conversation_message_log(conversation_id: str):
+    c_dir = team_data_dir / conversation_id / 'conversations'
+    return open_message_log(c_dir, f"{conversation_id}_messages")
 
 
 def load_team_conversation_messages(conversation_id: str) -> List[Dict]:
     """currently team_conversation is an alias for a conversation history that includes introspection data. The /get_conversation_message_routes should be decommisoned."""
-    c_dir = Path(
-        fr'D:\projects\testbed\open-llm-swe\agent_dashboard\backend\data\teams\{conversation_id}\conversations'
-    )
-    c_dir.mkdir(exist_ok=True, parents=True)
+    return [
+        serialization.loads(line)
+        for line in load_team_conversation_lines(conversation_id)
+    ]
+
+
+def load_team_conversation_lines(conversation_id: str) -> Tuple[bytes, ...]:
+    """the stored history as the encoded lines of the message log.
 
-    filename = c_dir / f"{conversation_id}_messages.json"
-    if os.path.exists(filename):
-        with open(filename, "r") as f:
-            return json.load(f)
-    return []
+    The lines are cached as they are, so a repeated load neither reads the log again nor encodes anything."""
+    message_log = _conversation_message_log(conversation_id)
+    # taken before reading, so an append racing with the read leaves the entry stale rather than wrong
+    validator = message_log.signature()
+
+    lines = storage_cache.get(('messages', conversation_id), validator)
+    if lines is None:
+        lines = tuple(message_log.iter_lines())
+        storage_cache.put(('messages', conversation_id), lines,
+                          sum(len(line) for line in lines), validator)
+    return lines
 
 
 def save_team_conversation_messages(conversation_id: str, message: dict):
-    c_dir = Path(
-        fr'D:\projects\testbed\open-llm-swe\agent_dashboard\backend\data\teams\{conversation_id}\conversations'
-    )
-    c_dir.mkdir(exist_ok=True, parents=True)
+    message_log = _conversation_message_log(conversation_id)
+    log.info(f'adding new message to {message_log.name}')
+    message_log.append(message)
+    storage_cache.invalidate(('messages', conversation_id))
+    _mark_unindexed(conversation_id)
+
+
+def _parse_batch(body: bytes, ndjson: bool) -> List[Dict]:
+    """the entries of a batch body, validated: a list of `{"message": {...}, "seq": int, "idempotency_key": str}`"""
+    try:
+        if ndjson:
+            entries = [
+                serialization.loads(line) for line in body.splitlines()
+                if line.strip()
+            ]
+        else:
+            entries = serialization.loads(body)
+    except serialization.DecodeError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid JSON: {e}")
+
+    if not isinstance(entries, list):
+        raise HTTPException(status_code=400,
+                            detail="Expected a JSON array of messages")
+    if len(entries) > settings.MESSAGE_BATCH_MAX_MESSAGES:
+        raise HTTPException(
+            status_code=413,
+            detail=f"At most {settings.MESSAGE_BATCH_MAX_MESSAGES} messages per batch")
+    for i, entry in enumerate(entries):
+        if not (isinstance(entry, dict)
+                and isinstance(entry.get("message"), dict)):
+            raise HTTPException(status_code=400,
+                                detail=f"Entry {i} has no message object")
+        if not isinstance(entry.get("idempotency_key", ""), str):
+            raise HTTPException(
+                status_code=400,
+                detail=f"Entry {i} has an idempotency_key that is not a string")
+
+    if entries and "seq" in entries[0]:
+        first = entries[0]["seq"]
+        if not isinstance(first, int) or first < 0:
+            raise HTTPException(status_code=400,
+                                detail="seq has to be a non-negative integer")
+        # numbered from the first entry on, so the batch maps onto one contiguous range of the log
+        for i, entry in enumerate(entries):
+            if entry.get("seq") != first + i:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Entry {i} should have seq {first + i}, the seqs of a batch are consecutive")
+    elif any("seq" in entry for entry in entries):
+        raise HTTPException(
+            status_code=400,
+            detail="Either every entry of a batch has a seq or none has")
+    return entries
+
+
+def save_team_conversation_batch(conversation_id: str, body: bytes,
+                                 ndjson: bool = False) -> Dict:
+    """store a batch of messages with a single append to the log, a single cache invalidation and a single index update.
+
+    With seqs, messages the log already holds are skipped, so resending a batch whose response was lost stores
+    nothing twice, and a batch starting past the end of the log is refused with the seq that was expected. Without
+    them, messages whose idempotency key was stored recently (within the last MESSAGE_BATCH_IDEMPOTENCY_KEYS of
+    this worker) are skipped; keys are not shared between workers, only seqs are checked against the log itself."""
+    entries = _parse_batch(body, ndjson)
+    message_log = _conversation_message_log(conversation_id)
+
+    with _batch_lock(conversation_id):
+        if entries and "seq" in entries[0]:
+            try:
+                stored = message_log.append_at(
+                    entries[0]["seq"], [entry["message"] for entry in entries])
+            except SequenceGap as e:
+                raise HTTPException(status_code=409,
+                                    detail={
+                                        "error": str(e),
+                                        "expected_seq": e.expected
+                                    })
+            new = entries[len(entries) - stored:]
+            first = entries[0]["seq"] + len(entries) - stored
+        else:
+            new = []
+            keys = set()
+            for entry in entries:
+                key = entry.get("idempotency_key")
+                if key is not None:
+                    if key in keys or _stored_keys.get(
+                        (conversation_id, key)) is not None:
+                        continue
+                    keys.add(key)
+                new.append(entry)
+            first = message_log.append_many(
+                [entry["message"] for entry in new])
+
+        for seq, entry in enumerate(new, start=first):
+            if (key := entry.get("idempotency_key")) is not None:
+                _stored_keys.put((conversation_id, key), seq, 1)
+
+    if new:
+        log.info(f'added {len(new)} messages to {message_log.name}')
+        storage_cache.invalidate(('messages', conversation_id))
+        _mark_unindexed(conversation_id)
+    return {
+        "status": "success",
+        "stored": len(new),
+        "duplicates": len(entries) - len(new),
+        "next_seq": message_log.count,
+    }
+
+
+def _mark_unindexed(conversation_id: str):
+    """leave indexing a store to the background indexer, off the store path; catch_up picks up everything new"""
+    with _unindexed_lock:
+        _unindexed.add(conversation_id)
 
-    messages = load_team_conversation_messages(conversation_id)
-    messages.append(message)
 
-    # overwrite file and write anew
-    filename = c_dir / f"{conversation_id}_messages.json"
-    log.info(f'adding new message to {filename}')
-    with open(filename, "w") as f:
-        json.dump(messages, f)
+def _index_pending():
+    """catch the search index up with every conversation stored to since the last call"""
+    with _unindexed_lock:
+        conversation_ids = list(_unindexed)
+        _unindexed.clear()
+    for conversation_id in conversation_ids:
+        _index_conversation(conversation_id)
+
+
+def _index_conversation(conversation_id: str) -> int:
+    try:
+        return open_search_index(team_data_dir).catch_up(
+            conversation_id, _conversation_message_log(conversation_id))
+    except Exception:
+        # the message itself is stored; the next write or restart indexes it
+        log.exception(f'could not index messages of {conversation_id}')
+        return 0
+
+
+def _index_stored_conversations() -> int:
+    indexed = 0
+    for conversations_dir in team_data_dir.glob('*/conversations'):
+        conversation_id = conversations_dir.parent.name
+        # one unreadable log must not stop the others from being indexed
+        indexed += _index_conversation(conversation_id)
+    return indexed
+
+
+def _backfill_search_index():
+    indexed = _index_stored_conversations()
+    log.info(f'search index caught up with {indexed} stored messages')
+
+
+def _search_conversations(query: str, **filters) -> Dict:
+    # so a search always sees what was stored before it - by this worker, and with several workers by the
+    # others too, whose stores only their own background indexer knows about
+    _index_pending()
+    team_id = filters.get("team_id")
+    if team_id:
+        # only a stored team - opening the log of any other name would create it
+        if (team_data_dir / team_id / 'conversations').is_dir():
+            _index_conversation(team_id)
+    elif settings.WORKERS > 1:
+        _index_stored_conversations()
+    return open_search_index(team_data_dir).search(query, **filters)
+
+
+def load_team_conversation_page(conversation_id: str,
+                                after: Optional[int] = None,
+                                before: Optional[int] = None,
+                                limit: int = 50) -> bytes:
+    """one page of messages, located through the log's offset index, encoded as the response document.
+
+    `after`/`before` are sequence numbers (exclusive). With only `before` the page ends just before it,
+    otherwise it starts just after `after`; with neither the page is the latest `limit` messages."""
+    message_log = _conversation_message_log(conversation_id)
+    total = message_log.count
+
+    if after is not None:
+        start = after + 1
+        stop = min(start + limit, total)
+        if before is not None:
+            stop = min(stop, before)
+    elif before is not None:
+        stop = min(before, total)
+        start = stop - limit
+    else:
+        stop = total
+        start = stop - limit
+    start = max(start, 0)
+    stop = max(stop, start)
+
+    page = {
+        "total": total,
+        # pass as ?before= for the page of older messages
+        "prev_cursor": str(start) if start > 0 else None,
+        # pass as ?after= for newer messages, also when polling at the end of the log
+        "next_cursor": str(stop - 1) if stop > 0 else None,
+    }
+    # stored lines are already JSON, so they go into the response without a decode/encode round trip
+    return serialization.splice(
+        page, "messages",
+        serialization.join_array(message_log.read_lines(start, stop)))
+
+
+def stream_team_conversation_messages(conversation_id: str,
+                                      format: str = "ndjson",
+                                      chunk_size: int = 64 * 1024
+                                      ) -> Iterator[bytes]:
+    """yield the stored history as NDJSON, or as the same `{"messages": [...]}` document the load route returns.
+
+    Lines are copied from the log as stored without being parsed, and are flushed in chunks of about
+    `chunk_size` bytes, so memory stays flat however long the conversation is."""
+    message_log = _conversation_message_log(conversation_id)
+    as_json = format == "json"
+
+    chunk = [b'{"messages": ['] if as_json else []
+    chunk_bytes = 0
+    first = True
+    for line in message_log.iter_lines():
+        if as_json:
+            line = line.rstrip(b'\n')
+            if not first:
+                chunk.append(b',')
+            first = False
+        chunk.append(line)
+        chunk_bytes += len(line)
+        if chunk_bytes >= chunk_size:
+            yield b''.join(chunk)
+            chunk = []
+            chunk_bytes = 0
+
+    if as_json:
+        chunk.append(b']}')
+    if chunk:
+        yield b''.join(chunk)
 
 
 @router.post("/teams/{team_id}/messages/store")
 async def save_team_conversation_message(team_id: str, message: dict):
-    save_team_conversation_messages(conversation_id=team_id, message=message)
+    await run_in_storage_thread(save_team_conversation_messages,
+                                conversation_id=team_id,
+                                message=message)
     return {"status": "success", "message": "Message stored successfully"}
 
 
+@router.post("/teams/{team_id}/messages/batch")
+async def save_team_conversation_message_batch(team_id: str,
+                                               request: Request):
+    """store many messages at once - a JSON array or, with an NDJSON content type, one entry per line.
+
+    Each entry is `{"message": {...}}`, optionally with a `seq` (the message's position in the history,
+    consecutive within a batch) or an `idempotency_key`. A `seq` makes retrying a batch safe wherever the retry
+    lands. Idempotency keys are only remembered by the server worker that stored them, so with several workers
+    a retry handled by another one stores its messages again; clients retrying across workers have to send seqs."""
+    content_type = request.headers.get("content-type", "")
+    return await run_in_storage_thread(
+        save_team_conversation_batch,
+        conversation_id=team_id,
+        body=await request.body(),
+        ndjson=content_type.startswith(NDJSON_CONTENT_TYPES))
+
+
 @router.get("/teams/{team_id}/messages/load")
-async def load_team_conversation_message(team_id: str):
-    messages = load_team_conversation_messages(conversation_id=team_id)
-    return {"messages": messages}
+async def load_team_conversation_message(
+        team_id: str,
+        # -1 is a valid `after`: the page starting at the first message
+        after: Optional[int] = Query(default=None, ge=-1),
+        before: Optional[int] = Query(default=None, ge=0),
+        limit: Optional[int] = Query(default=None, ge=1, le=1000)):
+    """the full history, or a single page of it when any of after/before/limit is given"""
+    if after is None and before is None and limit is None:
+        lines = await run_in_storage_thread(load_team_conversation_lines,
+                                            conversation_id=team_id)
+        return RawJSONResponse(b'{"messages":' +
+                               serialization.join_array(lines) + b'}')
+
+    page = await run_in_storage_thread(load_team_conversation_page,
+                                       conversation_id=team_id,
+                                       after=after,
+                                       before=before,
+                                       limit=limit or 50)
+    return RawJSONResponse(page)
+
+
+@router.get("/teams/{team_id}/messages/stream")
+async def stream_team_conversation_message(
+        team_id: str, format: str = Query(default="ndjson",
+                                          pattern="^(ndjson|json)$")):
+    """the full history streamed in chunks, for exports and replays"""
+    media_type = "application/json" if format == "json" else "application/x-ndjson"
+    return StreamingResponse(iterate_in_storage_thread(
+        stream_team_conversation_messages(conversation_id=team_id,
+                                          format=format)),
+                             media_type=media_type)
+
+
+@router.get("/search")
+async def search_endpoint(
+        q: str = Query(min_length=1),
+        team_id: Optional[str] = None,
+        sender: Optional[str] = None,
+        kind: Optional[str] = Query(default=None,
+                                    pattern="^(text|tool_use)$"),
+        since: Optional[float] = Query(default=None,
+                                       description="unix timestamp"),
+        until: Optional[float] = Query(default=None,
+                                       description="unix timestamp"),
+        offset: int = Query(default=0, ge=0),
+        limit: int = Query(default=20, ge=1, le=100)):
+    """ranked full-text search over stored team conversations. A hit's seq locates the message, e.g. with /messages/load?after={seq - 1}&limit=1"""
+    return await run_in_storage_thread(_search_conversations,
+                                       q,
+                                       team_id=team_id,
+                                       sender=sender,
+                                       kind=kind,
+                                       since=since,
+                                       until=until,
+                                       offset=offset,
+                                       limit=limit)
+
+
+@router.get("/storage/cache")
+async def get_storage_cache_stats_endpoint():
+    """hit/miss/eviction counters of the team and conversation cache"""
+    return storage_cache.stats()
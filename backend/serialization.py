@@ -0,0 +1,105 @@
+"""JSON encoding for the hot paths - stored messages, websocket frames and message route responses.
+
+Uses orjson or msgspec when one of them is installed and the stdlib json module otherwise; JSON_LIBRARY
+picks one explicitly. Whatever the library, the output is compact JSON on a single line, so an encoded
+message can be stored as one line of a message log and spliced into a response as it is."""
+import json
+import logging
+from typing import Any, Callable, Iterable, Optional
+
+from agent_dashboard.backend import settings
+from fastapi.responses import JSONResponse
+
+log = logging.getLogger(__name__)
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+
+def _stdlib_dumps(obj: Any, default: Optional[Callable] = None) -> bytes:
+    return json.dumps(obj,
+                      default=default,
+                      ensure_ascii=False,
+                      separators=(',', ':')).encode()
+
+
+def _orjson_dumps(obj: Any, default: Optional[Callable] = None) -> bytes:
+    return orjson.dumps(obj, default=default, option=orjson.OPT_NON_STR_KEYS)
+
+
+if msgspec:
+    _msgspec_encoder = msgspec.json.Encoder()
+    _msgspec_decoder = msgspec.json.Decoder()
+
+
+def _msgspec_dumps(obj: Any, default: Optional[Callable] = None) -> bytes:
+    if default is None:
+        return _msgspec_encoder.encode(obj)
+    return msgspec.json.encode(obj, enc_hook=default)
+
+
+def _choose(name: str):
+    if name in ('auto', 'orjson') and orjson:
+        return 'orjson', _orjson_dumps, orjson.loads
+    if name in ('auto', 'msgspec') and msgspec:
+        return 'msgspec', _msgspec_dumps, _msgspec_decoder.decode
+    if name not in ('auto', 'json'):
+        log.warning(f'{name} is not installed, serialising with the json module')
+    return 'json', _stdlib_dumps, json.loads
+
+
+library, _dumps, _loads = _choose(settings.JSON_LIBRARY)
+
+# what `loads` raises on malformed input, whichever library is in use
+DecodeError = (ValueError, msgspec.DecodeError) if msgspec else (ValueError, )
+
+
+def dumps(obj: Any, default: Optional[Callable] = None) -> bytes:
+    """encode to JSON bytes. `default` is called for objects the library cannot encode itself"""
+    return _dumps(obj, default)
+
+
+def dumps_str(obj: Any, default: Optional[Callable] = None) -> str:
+    """encode to a JSON string, for websocket text frames"""
+    return _dumps(obj, default).decode()
+
+
+def loads(data) -> Any:
+    return _loads(data)
+
+
+def join_array(items: Iterable[bytes]) -> bytes:
+    """a JSON array of already encoded documents, e.g. lines read from a message log"""
+    return b'[' + b','.join(item.rstrip(b'\n') for item in items) + b']'
+
+
+def splice(document: dict, key: str, raw: bytes) -> bytes:
+    """encode `document` with the already encoded JSON `raw` as the value of `key`, without decoding it"""
+    encoded = dumps({**document, key: None})
+    marker = dumps({key: None})[1:-1]
+    # quotes inside string values are escaped, so an unescaped `"key":null` can only be the field itself
+    head, _, tail = encoded.partition(marker)
+    return head + marker[:-len(b'null')] + raw + tail
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with the fastest available library.
+
+    Route handlers that return one directly also skip FastAPI's jsonable_encoder walk over the content."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content, default=str)
+
+
+class RawJSONResponse(JSONResponse):
+    """a response whose content is JSON that has already been encoded"""
+
+    def render(self, content: bytes) -> bytes:
+        return content
@@ -4,11 +4,10 @@ import os
 from pathlib import Path
 from typing import Dict, List
 
-from anthropic.types import Message
 from fastapi import FastAPI, HTTPException, Request, status
 from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 from pydantic import BaseModel
 
 from agent_dashboard.backend.routes import (
@@ -17,10 +16,12 @@ from agent_dashboard.backend.routes import (
     dashboard_conversation_routes,
     team_routes,
 )
+from agent_dashboard.backend import lazy, metrics, settings
+from agent_dashboard.backend.serialization import FastJSONResponse
 
 log = logging.getLogger(__name__)
 
-app = FastAPI()
+app = FastAPI(default_response_class=FastJSONResponse)
 
 
 origins = [
@@ -37,6 +38,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+if metrics.enabled:
+    app.add_middleware(metrics.MetricsMiddleware)
+
 app.include_router(dashboard_agent_routes.router)
 app.include_router(dashboard_conversation_routes.router)
 app.include_router(conversation_routes.router)
@@ -54,11 +58,24 @@ def register_exception(app: FastAPI):
         return JSONResponse(content=content, status_code=status.HTTP_422_UNPROCESSABLE_ENTITY)
 
 
+@app.on_event("startup")
+async def preload_deferred_modules():
+    if settings.PRELOAD_MODULES:
+        await lazy.start_preload()
+
+
 @app.get('/')
 def root():
     return {'message': "we're up!"}
 
 
+@app.get('/metrics', response_class=PlainTextResponse)
+def get_metrics():
+    """request latencies, hot-path timings and gauges in the Prometheus text format"""
+    return PlainTextResponse(metrics.render(),
+                             media_type='text/plain; version=0.0.4')
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=11251)
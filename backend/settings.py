@@ -0,0 +1,159 @@
+import os
+from pathlib import Path
+
+# deployment knobs, all overridable through the environment
+
+DATA_DIR = Path(
+    os.environ.get(
+        'AGENT_DASHBOARD_DATA_DIR',
+        r'D:\projects\testbed\open-llm-swe\agent_dashboard\backend\data\teams'))
+
+# message log - a segment is sealed and a new one started once it grows past this size
+MESSAGE_LOG_SEGMENT_MAX_BYTES = int(
+    os.environ.get('MESSAGE_LOG_SEGMENT_MAX_BYTES', 4 * 1024 * 1024))
+# fsync after this many appends or this many seconds, whichever comes first
+MESSAGE_LOG_FSYNC_EVERY = int(os.environ.get('MESSAGE_LOG_FSYNC_EVERY', 64))
+MESSAGE_LOG_FSYNC_INTERVAL = float(
+    os.environ.get('MESSAGE_LOG_FSYNC_INTERVAL', 1.0))
+# compression of sealed segments - "none", "gzip" or "zstd" (needs the zstandard package, falls back to gzip).
+# Segments written with any codec stay readable whatever this is set to
+MESSAGE_LOG_CODEC = os.environ.get('MESSAGE_LOG_CODEC', 'none')
+# logs keeping their segment, index and lock files open between writes; past this many the least recently
+# written close theirs (reopened on their next write), so the number of conversations is not bounded by the
+# open file limit
+MESSAGE_LOG_MAX_OPEN = int(os.environ.get('MESSAGE_LOG_MAX_OPEN', 32))
+# message logs kept around by open_message_log once nothing else holds them, so their counts are not
+# re-read from disk on every use; the others are dropped
+MESSAGE_LOG_MAX_CACHED = int(os.environ.get('MESSAGE_LOG_MAX_CACHED', 1024))
+# decompressed sealed segments kept in memory, so paging through a compressed history does not inflate it on every read
+MESSAGE_LOG_SEGMENT_CACHE_BYTES = int(
+    os.environ.get('MESSAGE_LOG_SEGMENT_CACHE_BYTES', 32 * 1024 * 1024))
+
+# batched message ingestion - most messages one request may carry, and how many idempotency keys of recently
+# stored messages each worker remembers to drop retried messages
+MESSAGE_BATCH_MAX_MESSAGES = int(
+    os.environ.get('MESSAGE_BATCH_MAX_MESSAGES', 10000))
+MESSAGE_BATCH_IDEMPOTENCY_KEYS = int(
+    os.environ.get('MESSAGE_BATCH_IDEMPOTENCY_KEYS', 100000))
+
+# JSON library for stored messages, websocket frames and message responses - "auto" picks orjson, then msgspec,
+# then the json module; or name one of "orjson", "msgspec", "json"
+JSON_LIBRARY = os.environ.get('JSON_LIBRARY', 'auto')
+
+# size of the thread pool that all blocking persistence calls are run on, off the event loop
+STORAGE_IO_THREADS = int(os.environ.get('STORAGE_IO_THREADS', 8))
+
+# in-memory LRU cache for team definitions and conversation histories
+STORAGE_CACHE_MAX_ENTRIES = int(os.environ.get('STORAGE_CACHE_MAX_ENTRIES', 256))
+STORAGE_CACHE_MAX_BYTES = int(
+    os.environ.get('STORAGE_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+
+# background jobs (team creation) - "thread" or "process" pool, and how many jobs may run at once
+JOB_EXECUTOR = os.environ.get('JOB_EXECUTOR', 'thread')
+JOB_MAX_CONCURRENCY = int(os.environ.get('JOB_MAX_CONCURRENCY', 4))
+# every worker heartbeats the jobs it holds; jobs whose heartbeat is older than the timeout belonged to a worker
+# that died, and are taken over by whichever worker notices first
+JOB_HEARTBEAT_INTERVAL = float(os.environ.get('JOB_HEARTBEAT_INTERVAL', 2.0))
+JOB_HEARTBEAT_TIMEOUT = float(os.environ.get('JOB_HEARTBEAT_TIMEOUT', 30.0))
+# a job handler already running cannot be interrupted - on shutdown it gets this many seconds to finish before
+# its job is left to be taken over
+JOB_STOP_TIMEOUT = float(os.environ.get('JOB_STOP_TIMEOUT', 30.0))
+
+# defer importing the agent and tool modules until first use, for faster cold starts; with PRELOAD_MODULES they are
+# imported on a background thread PRELOAD_DELAY seconds after startup, once the server already answers requests
+LAZY_IMPORTS = os.environ.get('LAZY_IMPORTS', '1') == '1'
+PRELOAD_MODULES = os.environ.get('PRELOAD_MODULES', '1') == '1'
+PRELOAD_DELAY = float(os.environ.get('PRELOAD_DELAY', 0.5))
+
+# compiled agent definitions (with their tools resolved) kept for creating conversations of the same team again
+AGENT_TEMPLATE_CACHE_SIZE = int(os.environ.get('AGENT_TEMPLATE_CACHE_SIZE', 256))
+
+# team creation cache - a task identical (after normalising) to one answered within the TTL gets that team instead of
+# a new run of the LLM pipeline; 0 turns it off. The model and prompt version are part of the key, so changing
+# either starts afresh
+TEAM_CREATION_CACHE_TTL = float(
+    os.environ.get('TEAM_CREATION_CACHE_TTL', 7 * 24 * 60 * 60))
+TEAM_CREATION_CACHE_MAX_ENTRIES = int(
+    os.environ.get('TEAM_CREATION_CACHE_MAX_ENTRIES', 10000))
+TEAM_CREATION_MODEL = os.environ.get('TEAM_CREATION_MODEL', '')
+TEAM_CREATION_PROMPT_VERSION = os.environ.get('TEAM_CREATION_PROMPT_VERSION',
+                                              '1')
+
+# stored messages are added to the search index in the background, this many seconds apart (and before every search)
+SEARCH_INDEX_INTERVAL = float(os.environ.get('SEARCH_INDEX_INTERVAL', 1.0))
+
+# admission control for the routes that start background work; "0" turns it off. Clients are told apart by
+# their address, or by the first value of ADMISSION_CLIENT_HEADER (e.g. X-Forwarded-For) behind a proxy, and
+# at most ADMISSION_MAX_CLIENTS of them are tracked per route class. Limits apply per server worker
+ADMISSION_ENABLED = os.environ.get('ADMISSION_ENABLED', '1') == '1'
+ADMISSION_CLIENT_HEADER = os.environ.get('ADMISSION_CLIENT_HEADER', '')
+ADMISSION_MAX_CLIENTS = int(os.environ.get('ADMISSION_MAX_CLIENTS', 10000))
+# seconds a client shed because the server is overloaded (503) is asked to wait before retrying
+ADMISSION_OVERLOAD_RETRY_AFTER = float(
+    os.environ.get('ADMISSION_OVERLOAD_RETRY_AFTER', 5))
+# POST /teams/create - a client may start RATE creations per second with bursts of BURST (beyond that 429);
+# creations are shed with 503 while MAX_IN_FLIGHT requests are being handled or MAX_PENDING_JOBS jobs are
+# queued or running
+TEAM_CREATION_RATE = float(os.environ.get('TEAM_CREATION_RATE', 0.2))
+TEAM_CREATION_BURST = int(os.environ.get('TEAM_CREATION_BURST', 5))
+TEAM_CREATION_MAX_IN_FLIGHT = int(
+    os.environ.get('TEAM_CREATION_MAX_IN_FLIGHT', 32))
+TEAM_CREATION_MAX_PENDING_JOBS = int(
+    os.environ.get('TEAM_CREATION_MAX_PENDING_JOBS', 16 * JOB_MAX_CONCURRENCY))
+# POST /c2/create - the same per client; also shed while CONVERSATION_CREATION_MAX_RESIDENT conversations are
+# held in memory (below, with the eviction settings)
+CONVERSATION_CREATION_RATE = float(
+    os.environ.get('CONVERSATION_CREATION_RATE', 5))
+CONVERSATION_CREATION_BURST = int(
+    os.environ.get('CONVERSATION_CREATION_BURST', 50))
+CONVERSATION_CREATION_MAX_IN_FLIGHT = int(
+    os.environ.get('CONVERSATION_CREATION_MAX_IN_FLIGHT', 64))
+
+# threads that agent turns of live conversations run on
+CONVERSATION_WORKERS = int(os.environ.get('CONVERSATION_WORKERS', 32))
+
+# websocket fan-out - frames buffered per subscriber, and what happens to a subscriber that falls behind:
+# "drop_oldest" discards its oldest buffered frames, "disconnect" closes its socket
+HUB_SUBSCRIBER_QUEUE_SIZE = int(os.environ.get('HUB_SUBSCRIBER_QUEUE_SIZE', 256))
+HUB_SLOW_CONSUMER_POLICY = os.environ.get('HUB_SLOW_CONSUMER_POLICY',
+                                          'drop_oldest')
+# recent frames kept in memory per conversation to replay to reconnecting websockets
+HUB_REPLAY_BUFFER_SIZE = int(os.environ.get('HUB_REPLAY_BUFFER_SIZE', 512))
+
+# questions to the human - how long one waits for its answer, and how many of a conversation's may be outstanding
+# at once (further ones wait for a slot, within the same timeout)
+HUMAN_REQUEST_TIMEOUT = float(os.environ.get('HUMAN_REQUEST_TIMEOUT', 30.0))
+HUMAN_REQUESTS_PER_CONVERSATION = int(
+    os.environ.get('HUMAN_REQUESTS_PER_CONVERSATION', 4))
+
+# number of server worker processes - uvicorn reads the same variable for its --workers default.
+# With more than one, conversations are owned by the worker that created them and traffic for them
+# is forwarded through the shared data directory
+WORKERS = int(os.environ.get('WEB_CONCURRENCY', 1))
+CLUSTER_HEARTBEAT_INTERVAL = float(
+    os.environ.get('CLUSTER_HEARTBEAT_INTERVAL', 2.0))
+# a worker that has not sent a heartbeat for this long is considered dead and loses its conversations
+CLUSTER_WORKER_TIMEOUT = float(os.environ.get('CLUSTER_WORKER_TIMEOUT', 10.0))
+# how often forwarded frames and inbound messages are polled for
+CLUSTER_POLL_INTERVAL = float(os.environ.get('CLUSTER_POLL_INTERVAL', 0.05))
+
+# live conversations with no viewers and no turn in progress are evicted from memory once idle for this long,
+# or sooner when more than CONVERSATION_MAX_RESIDENT are held; they are rehydrated on the next connect
+CONVERSATION_IDLE_TIMEOUT = float(
+    os.environ.get('CONVERSATION_IDLE_TIMEOUT', 30 * 60))
+CONVERSATION_MAX_RESIDENT = int(os.environ.get('CONVERSATION_MAX_RESIDENT', 1000))
+# idle conversations are only evicted by the periodic sweep, so creating conversations stops at this ceiling
+CONVERSATION_CREATION_MAX_RESIDENT = int(
+    os.environ.get('CONVERSATION_CREATION_MAX_RESIDENT',
+                   2 * CONVERSATION_MAX_RESIDENT))
+CONVERSATION_SWEEP_INTERVAL = float(
+    os.environ.get('CONVERSATION_SWEEP_INTERVAL', 30))
+# a conversation resumes with this many of its latest messages in memory; its snapshot is refreshed
+# once this many messages have been stored since the last one
+CONVERSATION_SNAPSHOT_WINDOW = int(
+    os.environ.get('CONVERSATION_SNAPSHOT_WINDOW', 200))
+CONVERSATION_SNAPSHOT_EVERY = int(
+    os.environ.get('CONVERSATION_SNAPSHOT_EVERY', 100))
+
+# request latency histograms, timing spans and gauges served on /metrics; "0" turns all of it off
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '1') == '1'
@@ -0,0 +1,18 @@
+from agent_dashboard.backend.storage.executor import (
+    iterate_in_storage_thread,
+    run_in_storage_thread,
+)
+from agent_dashboard.backend.storage.message_log import (
+    MessageLog,
+    SequenceGap,
+    open_message_log,
+)
+from agent_dashboard.backend.storage.team_catalog import TeamCatalog, open_team_catalog
+from agent_dashboard.backend.storage.cache import LRUCache, storage_cache
+from agent_dashboard.backend.storage.snapshots import SnapshotStore
+from agent_dashboard.backend.storage.search_index import SearchIndex, open_search_index
+from agent_dashboard.backend.storage.creation_cache import (
+    TeamCreationCache,
+    creation_key,
+    open_creation_cache,
+)
@@ -0,0 +1,99 @@
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Hashable, Optional
+
+from agent_dashboard.backend import settings
+
+
+@dataclass
+class _Entry:
+    value: Any
+    size: int
+    validator: Hashable
+
+
+class LRUCache:
+    """Least-recently-used cache bounded both by entry count and by the total of the sizes given to `put`.
+
+    Every entry carries a validator, typically the (mtime, size) of the file it was read from.
+    A lookup with a different validator counts as a miss and drops the entry, which is how
+    changes made to the files outside of this process are picked up."""
+
+    def __init__(self, max_entries: int, max_bytes: int):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+
+        self._entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key: Hashable, validator: Hashable = None) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry.validator != validator:
+                self._remove(key)
+                self.invalidations += 1
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry.value
+
+    def put(self, key: Hashable, value: Any, size: int,
+            validator: Hashable = None):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            if size > self.max_bytes:
+                # would evict everything else and still not fit
+                return
+
+            self._entries[key] = _Entry(value, size, validator)
+            self._bytes += size
+            while (len(self._entries) > self.max_entries
+                   or self._bytes > self.max_bytes):
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def invalidate(self, key: Hashable):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+                self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+    def _remove(self, key: Hashable):
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+
+
+storage_cache = LRUCache(max_entries=settings.STORAGE_CACHE_MAX_ENTRIES,
+                         max_bytes=settings.STORAGE_CACHE_MAX_BYTES)
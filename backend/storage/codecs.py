@@ -0,0 +1,108 @@
+import gzip
+import logging
+from typing import Dict, List, Optional
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+log = logging.getLogger(__name__)
+
+
+class SegmentCodec:
+    """Compression applied to sealed message log segments. The file suffix tells readers which codec wrote a segment."""
+
+    name = ''
+    suffix = ''
+    uses_dictionary = False
+
+    def compress(self, data: bytes, dictionary: Optional[bytes] = None) -> bytes:
+        raise NotImplementedError()
+
+    def decompress(self,
+                   data: bytes,
+                   dictionary: Optional[bytes] = None) -> bytes:
+        raise NotImplementedError()
+
+    def train_dictionary(self, samples: List[bytes]) -> Optional[bytes]:
+        return None
+
+
+class GzipCodec(SegmentCodec):
+    name = 'gzip'
+    suffix = '.gz'
+
+    def __init__(self, level: int = 6):
+        self.level = level
+
+    def compress(self, data: bytes, dictionary: Optional[bytes] = None) -> bytes:
+        return gzip.compress(data, compresslevel=self.level)
+
+    def decompress(self,
+                   data: bytes,
+                   dictionary: Optional[bytes] = None) -> bytes:
+        return gzip.decompress(data)
+
+
+class ZstdCodec(SegmentCodec):
+    """zstd, with a dictionary trained on the log's own messages.
+
+    Stored messages repeat the same keys and boilerplate text over and over, which a shared
+    dictionary captures once instead of every segment having to rediscover it."""
+
+    name = 'zstd'
+    suffix = '.zst'
+    uses_dictionary = True
+
+    def __init__(self, level: int = 10, dictionary_size: int = 112 * 1024):
+        self.level = level
+        self.dictionary_size = dictionary_size
+
+    def compress(self, data: bytes, dictionary: Optional[bytes] = None) -> bytes:
+        compressor = zstandard.ZstdCompressor(
+            level=self.level,
+            dict_data=zstandard.ZstdCompressionDict(dictionary)
+            if dictionary else None)
+        return compressor.compress(data)
+
+    def decompress(self,
+                   data: bytes,
+                   dictionary: Optional[bytes] = None) -> bytes:
+        if zstandard is None:
+            raise RuntimeError(
+                'reading zstd compressed message segments needs the zstandard package')
+        decompressor = zstandard.ZstdDecompressor(
+            dict_data=zstandard.ZstdCompressionDict(dictionary)
+            if dictionary else None)
+        return decompressor.decompress(data)
+
+    def train_dictionary(self, samples: List[bytes]) -> Optional[bytes]:
+        try:
+            return zstandard.train_dictionary(self.dictionary_size,
+                                              samples).as_bytes()
+        except zstandard.ZstdError as e:
+            # too few or too uniform samples - compress without one
+            log.info(f'could not train a zstd dictionary: {e}')
+            return None
+
+
+# every codec that may have written a segment, by file suffix, whether or not this deployment writes with it
+READABLE_CODECS: Dict[str, SegmentCodec] = {
+    GzipCodec.suffix: GzipCodec(),
+    ZstdCodec.suffix: ZstdCodec(),
+}
+
+
+def get_codec(name: str) -> Optional[SegmentCodec]:
+    """the codec to seal segments with; None keeps them as plain jsonl"""
+    if name in ('', 'none'):
+        return None
+    if name == 'gzip':
+        return GzipCodec()
+    if name == 'zstd':
+        if zstandard is None:
+            log.warning('zstandard is not installed, sealing segments with gzip instead')
+            return GzipCodec()
+        return ZstdCodec()
+    raise ValueError(f'unknown message log codec {name}')
@@ -0,0 +1,135 @@
+import hashlib
+import json
+import logging
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from agent_dashboard.backend import settings
+
+log = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS team_creations (
+    key TEXT PRIMARY KEY,
+    agents TEXT NOT NULL,
+    workflow TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    used_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS team_creations_used_at ON team_creations (used_at);
+"""
+
+
+def normalize_task(task: str) -> str:
+    """the task as far as team creation is concerned: case, unicode forms, spacing and closing punctuation do not matter"""
+    task = unicodedata.normalize('NFKC', task).casefold()
+    return re.sub(r'\s+', ' ', task).strip().rstrip('.!').strip()
+
+
+def creation_key(task: str,
+                 model: str = settings.TEAM_CREATION_MODEL,
+                 prompt_version: str = settings.TEAM_CREATION_PROMPT_VERSION) -> str:
+    """content address of a team creation: the normalised task and what the pipeline would answer it with"""
+    content = '\0'.join((normalize_task(task), model, prompt_version))
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+class TeamCreationCache:
+    """SQLite map from a creation key to what the LLM pipeline answered it with (the agent definitions and the
+    workflow), so an identical task gets a new team built from that answer without running the pipeline again.
+
+    Entries expire `ttl` seconds after the team was created, and beyond `max_entries` the least recently
+    used ones are dropped. Shared by all workers through the data directory."""
+
+    def __init__(self,
+                 path: Path,
+                 ttl: float = settings.TEAM_CREATION_CACHE_TTL,
+                 max_entries: int = settings.TEAM_CREATION_CACHE_MAX_ENTRIES):
+        self.path = Path(path)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._connection = sqlite3.connect(self.path,
+                                           check_same_thread=False,
+                                           isolation_level=None)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.executescript(_SCHEMA)
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0 and self.max_entries > 0
+
+    def get(self, key: str) -> Optional[Tuple[List[Dict], str]]:
+        """(agents, workflow) cached for `key`, unless there is none or it expired"""
+        if not self.enabled:
+            return None
+        now = time.time()
+        with self._lock:
+            row = self._connection.execute(
+                'SELECT agents, workflow, created_at FROM team_creations WHERE key = ?',
+                (key, )).fetchone()
+            if row is None:
+                return None
+            agents, workflow, created_at = row
+            if now - created_at > self.ttl:
+                self._connection.execute(
+                    'DELETE FROM team_creations WHERE key = ?', (key, ))
+                return None
+            self._connection.execute(
+                'UPDATE team_creations SET used_at = ? WHERE key = ?',
+                (now, key))
+        return json.loads(agents), workflow
+
+    def put(self, key: str, agents: List[Dict], workflow: str):
+        if not self.enabled:
+            return
+        now = time.time()
+        with self._lock:
+            self._connection.execute('BEGIN IMMEDIATE')
+            self._connection.execute(
+                'INSERT OR REPLACE INTO team_creations (key, agents, workflow, created_at, used_at) '
+                'VALUES (?, ?, ?, ?, ?)', (key, json.dumps(agents), workflow, now, now))
+            self._connection.execute(
+                'DELETE FROM team_creations WHERE created_at < ?',
+                (now - self.ttl, ))
+            self._connection.execute(
+                'DELETE FROM team_creations WHERE key IN '
+                '(SELECT key FROM team_creations ORDER BY used_at DESC LIMIT -1 OFFSET ?)',
+                (self.max_entries, ))
+            self._connection.execute('COMMIT')
+
+    def forget(self, key: str):
+        with self._lock:
+            self._connection.execute('DELETE FROM team_creations WHERE key = ?',
+                                     (key, ))
+
+    def count(self) -> int:
+        with self._lock:
+            return self._connection.execute(
+                'SELECT COUNT(*) FROM team_creations').fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+
+_open_caches: Dict[Path, TeamCreationCache] = {}
+_open_caches_lock = threading.Lock()
+
+
+def open_creation_cache(directory: Path) -> TeamCreationCache:
+    """return the shared team creation cache of the data directory"""
+    directory = Path(directory)
+    with _open_caches_lock:
+        cache = _open_caches.get(directory)
+        if cache is None:
+            cache = TeamCreationCache(directory / 'team_creations.sqlite3')
+            _open_caches[directory] = cache
+        return cache
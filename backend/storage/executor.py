@@ -0,0 +1,41 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Callable, Iterable, TypeVar
+
+from agent_dashboard.backend import metrics, settings
+
+T = TypeVar('T')
+
+# a dedicated, bounded pool so a burst of slow disk calls queues up here instead of
+# eating into the default executor or stalling the event loop
+_executor = ThreadPoolExecutor(max_workers=settings.STORAGE_IO_THREADS,
+                               thread_name_prefix='storage-io')
+
+
+async def run_in_storage_thread(func: Callable[..., T], *args,
+                                **kwargs) -> T:
+    loop = asyncio.get_running_loop()
+    call = functools.partial(func, *args, **kwargs)
+    if metrics.enabled:
+        call = functools.partial(_timed_call, call,
+                                 getattr(func, '__name__', 'call'))
+    return await loop.run_in_executor(_executor, call)
+
+
+def _timed_call(call: Callable[[], T], operation: str) -> T:
+    # timed on the storage thread, so the histogram shows the disk work and not the wait for a free thread
+    with metrics.storage_call_seconds.time(operation=operation):
+        return call()
+
+
+async def iterate_in_storage_thread(
+        iterable: Iterable[T]) -> AsyncIterator[T]:
+    """drive a blocking iterator from the storage pool, one item at a time"""
+    iterator = iter(iterable)
+    sentinel = object()
+    while True:
+        item = await run_in_storage_thread(next, iterator, sentinel)
+        if item is sentinel:
+            return
+        yield item
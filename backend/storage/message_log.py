@@ -0,0 +1,692 @@
+import atexit
+import io
+import json
+import logging
+import os
+import struct
+import sys
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import BinaryIO, Iterator, List, Optional, Tuple
+
+from agent_dashboard.backend import serialization, settings
+from agent_dashboard.backend.storage.cache import LRUCache
+from agent_dashboard.backend.storage.codecs import (
+    READABLE_CODECS,
+    SegmentCodec,
+    get_codec,
+)
+
+try:
+    import fcntl
+except ImportError:  # windows
+    fcntl = None
+    import msvcrt
+
+log = logging.getLogger(__name__)
+
+# one index record per message: (segment number, byte offset of the message's line in that segment)
+_INDEX_RECORD = struct.Struct('<IQ')
+
+# decompressed contents of sealed segments, shared by every log in the process
+_segment_cache = LRUCache(max_entries=64,
+                          max_bytes=settings.MESSAGE_LOG_SEGMENT_CACHE_BYTES)
+
+
+class SequenceGap(Exception):
+    """messages were sent numbered from past the end of the log"""
+
+    def __init__(self, name: str, expected: int, got: int):
+        super().__init__(
+            f'{name} holds {expected} messages, the next one has to be seq {expected}, not {got}')
+        self.expected = expected
+        self.got = got
+
+
+class MessageLog:
+    """Append-only log of messages, stored as one JSON document per line.
+
+    The log is split into numbered segment files `{name}.000000.jsonl`, `{name}.000001.jsonl`, ...
+    Only the last segment is ever written to; once it grows past `segment_max_bytes` it is sealed and a new one is started.
+    Appends are flushed to the OS immediately but only fsynced every `fsync_every` appends or `fsync_interval` seconds,
+    the latter also for a log that went idle, by a background thread.
+
+    A sidecar `{name}.idx` holds a fixed-width record per message, so message `n` is located by seeking to
+    `n * _INDEX_RECORD.size` in the index and then straight to its line, without reading anything before it.
+
+    A `shared` log may be written by several processes at once (multiple server workers): writers take a lock
+    file and pick up each other's appends and rotations before writing, and readers re-read the message count
+    from the index size.
+
+    With a `codec`, sealed segments are compressed (`{name}.000000.jsonl.gz`, `.jsonl.zst`) while the segment
+    being written stays plain. Index offsets always refer to the uncompressed lines, and a compressed segment is
+    inflated once into an in-memory cache on first read.
+    """
+
+    def __init__(
+        self,
+        directory: Path,
+        name: str,
+        segment_max_bytes: int = settings.MESSAGE_LOG_SEGMENT_MAX_BYTES,
+        fsync_every: int = settings.MESSAGE_LOG_FSYNC_EVERY,
+        fsync_interval: float = settings.MESSAGE_LOG_FSYNC_INTERVAL,
+        shared: bool = False,
+        codec: str = settings.MESSAGE_LOG_CODEC,
+    ):
+        self.directory = Path(directory)
+        self.name = name
+        self.shared = shared
+        self.codec: Optional[SegmentCodec] = get_codec(codec)
+        self.segment_max_bytes = segment_max_bytes
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+
+        self._lock = threading.RLock()
+        self._file: Optional[BinaryIO] = None
+        self._index_file: Optional[BinaryIO] = None
+        self._lock_file: Optional[BinaryIO] = None
+        self._segment = 0
+        self._count = 0
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with self._writer_lock(follow=False):
+            self.migrate_legacy()
+            self._load_index()
+
+    @property
+    def legacy_path(self) -> Path:
+        """the json array file that the log replaces"""
+        return self.directory / f'{self.name}.json'
+
+    @property
+    def index_path(self) -> Path:
+        return self.directory / f'{self.name}.idx'
+
+    @property
+    def dictionary_path(self) -> Path:
+        """compression dictionary shared by the sealed segments; empty when the codec decided against one"""
+        return self.directory / f'{self.name}.zdict'
+
+    @property
+    def count(self) -> int:
+        """number of messages in the log, which is also the sequence number the next message will get"""
+        self._refresh()
+        return self._count
+
+    def signature(self) -> Tuple:
+        """(size, mtime) of the index and the last segment; any append to the log, from this process or another, changes it"""
+        signature = []
+        segments = self.segments()
+        paths = [self.index_path]
+        if segments:
+            paths.append(self.segment_path(segments[-1]))
+        for path in paths:
+            try:
+                stat = path.stat()
+                signature.append((stat.st_size, stat.st_mtime_ns))
+            except FileNotFoundError:
+                signature.append(None)
+        return tuple(signature)
+
+    def segment_path(self, segment: int) -> Path:
+        return self.directory / f'{self.name}.{segment:06d}.jsonl'
+
+    def segments(self) -> List[int]:
+        numbers = set()
+        for path in self.directory.glob(f'{self.name}.*.jsonl*'):
+            number, _, suffix = path.name[len(self.name) + 1:].partition('.jsonl')
+            if number.isdigit() and (not suffix or suffix in READABLE_CODECS):
+                numbers.add(int(number))
+        return sorted(numbers)
+
+    def segment_files(self, segment: int) -> List[Path]:
+        """every file holding `segment`, plain or compressed"""
+        plain = self.segment_path(segment)
+        return [plain] + [
+            plain.with_name(plain.name + suffix) for suffix in READABLE_CODECS
+        ]
+
+    def append(self, message: dict) -> int:
+        """append a message and return its sequence number"""
+        return self.append_many([message])
+
+    def append_many(self, messages: List[dict]) -> int:
+        """append messages in a single write and return the sequence number of the first one"""
+        return self.append_encoded([_encode(message) for message in messages])
+
+    def append_encoded(self, lines: List[bytes]) -> int:
+        """append messages that are already serialised, each as one newline-terminated line"""
+        with self._writer_lock():
+            return self._write(lines)
+
+    def append_at(self, seq: int, messages: List[dict]) -> int:
+        """append messages numbered from `seq` on, skipping those the log already holds, and return how many were new.
+
+        Resending the same messages with the same `seq` therefore stores them once. Raises SequenceGap when
+        `seq` is past the end of the log, since the messages before it are missing."""
+        lines = [_encode(message) for message in messages]
+        with self._writer_lock():
+            if seq > self._count:
+                raise SequenceGap(self.name, expected=self._count, got=seq)
+            new = lines[self._count - seq:]
+            self._write(new)
+            return len(new)
+
+    def sync(self):
+        with self._lock:
+            if self._file and self._unsynced:
+                os.fsync(self._file.fileno())
+                os.fsync(self._index_file.fileno())
+            self._unsynced = 0
+            self._last_sync = time.monotonic()
+
+    def close(self):
+        """close the open files; the log stays usable and reopens them on its next write"""
+        with self._lock:
+            if self._file:
+                self.sync()
+                self._file.close()
+                self._file = None
+            if self._index_file:
+                self._index_file.close()
+                self._index_file = None
+            if self._lock_file:
+                self._lock_file.close()
+                self._lock_file = None
+        _forget_open_files(self)
+
+    def iter_lines(self, start: int = 0, stop: Optional[int] = None) -> Iterator[bytes]:
+        """yield the raw, newline-terminated lines of messages [start, stop) in order, reading one line at a time.
+
+        `stop` defaults to the message count when iteration begins, so messages appended while a
+        long read is in progress are not picked up halfway."""
+        self._refresh()
+        stop = self._count if stop is None else min(stop, self._count)
+        if start >= stop:
+            return
+
+        segment, offset = 0, 0
+        if start > 0:
+            with open(self.index_path, 'rb') as f:
+                f.seek(start * _INDEX_RECORD.size)
+                segment, offset = _INDEX_RECORD.unpack(
+                    f.read(_INDEX_RECORD.size))
+
+        remaining = stop - start
+        for number in self.segments():
+            if number < segment:
+                continue
+            try:
+                with self._open_segment(number) as f:
+                    f.seek(offset if number == segment else 0)
+                    for line in f:
+                        # a line without its newline is a write that is still in progress (or was torn by a crash)
+                        if not line.endswith(b'\n'):
+                            break
+                        yield line
+                        remaining -= 1
+                        if not remaining:
+                            return
+            except FileNotFoundError:
+                continue
+
+    def iter_messages(self) -> Iterator[dict]:
+        for line in self.iter_lines():
+            yield serialization.loads(line)
+
+    def read_all(self) -> List[dict]:
+        return list(self.iter_messages())
+
+    def read_lines(self, start: int, stop: int) -> List[bytes]:
+        """raw lines of the messages with sequence numbers in [start, stop)"""
+        self._refresh()
+        start = max(start, 0)
+        stop = min(stop, self._count)
+        if start >= stop:
+            return []
+
+        with open(self.index_path, 'rb') as f:
+            f.seek(start * _INDEX_RECORD.size)
+            records = list(
+                _INDEX_RECORD.iter_unpack(
+                    f.read((stop - start) * _INDEX_RECORD.size)))
+
+        lines = []
+        position = 0
+        while position < len(records):
+            segment, offset = records[position]
+            # consecutive records in the same segment are consecutive lines, so one seek serves all of them
+            run = 1
+            while (position + run < len(records)
+                   and records[position + run][0] == segment):
+                run += 1
+            with self._open_segment(segment) as f:
+                f.seek(offset)
+                lines.extend(f.readline() for _ in range(run))
+            position += run
+        return lines
+
+    def read(self, start: int, stop: int) -> List[dict]:
+        return [
+            serialization.loads(line) for line in self.read_lines(start, stop)
+        ]
+
+    def migrate_legacy(self) -> bool:
+        """one-shot conversion of a legacy `{name}.json` array into log segments.
+
+        The legacy file is only renamed away once every message is durably in the log,
+        so a migration interrupted halfway is simply redone on the next open."""
+        legacy = self.legacy_path
+        if not legacy.exists():
+            return False
+
+        with self._lock:
+            self.close()
+            for segment in self.segments():
+                for path in self.segment_files(segment):
+                    if path.exists():
+                        path.unlink()
+            for path in (self.index_path, self.dictionary_path):
+                if path.exists():
+                    path.unlink()
+
+            with open(legacy, 'r') as f:
+                messages = json.load(f)
+
+            self._segment = 0
+            for message in messages:
+                file = self._active_file()
+                file.write(_encode(message))
+                if file.tell() >= self.segment_max_bytes:
+                    self._rotate()
+            self._unsynced = len(messages)
+            self.close()
+
+            legacy.rename(legacy.with_name(legacy.name + '.migrated'))
+
+        log.info(f'migrated {len(messages)} messages from {legacy}')
+        return True
+
+    def _write(self, lines: List[bytes]) -> int:
+        """append under the writer lock; returns the sequence number of the first line"""
+        first = self._count
+        if lines:
+            file = self._active_file()
+            offset = file.tell()
+            records = []
+            for line in lines:
+                records.append(_INDEX_RECORD.pack(self._segment, offset))
+                offset += len(line)
+
+            # data goes out before its index records, so an index entry never points at a missing line
+            file.write(b''.join(lines))
+            file.flush()
+            self._index_file.write(b''.join(records))
+            self._index_file.flush()
+            self._count += len(lines)
+
+            self._unsynced += len(lines)
+            if (self._unsynced >= self.fsync_every
+                    or time.monotonic() - self._last_sync >= self.fsync_interval):
+                self.sync()
+
+            if file.tell() >= self.segment_max_bytes:
+                self._rotate()
+        return first
+
+    def _active_file(self) -> BinaryIO:
+        if self._file is None:
+            segments = self.segments()
+            self._segment = segments[-1] if segments else 0
+            path = self.segment_path(self._segment)
+            _truncate_torn_tail(path)
+            self._file = open(path, 'ab')
+            self._index_file = open(self.index_path, 'ab')
+        _track_open_files(self)
+        return self._file
+
+    def _load_index(self):
+        """bring the sidecar index in line with the segments after a crash or a migration.
+
+        Records pointing past the end of the data are dropped, then any lines the index does not
+        know about yet are scanned and indexed. Only the tail after the last good record is read."""
+        with self._lock:
+            records = b''
+            if self.index_path.exists():
+                records = self.index_path.read_bytes()
+            count = len(records) // _INDEX_RECORD.size
+
+            resume: Tuple[int, int] = (0, 0)
+            while count:
+                segment, offset = _INDEX_RECORD.unpack_from(
+                    records, (count - 1) * _INDEX_RECORD.size)
+                line_end = self._line_end(segment, offset)
+                if line_end is not None:
+                    resume = (segment, line_end)
+                    break
+                count -= 1
+
+            missing = []
+            for segment in self.segments():
+                if segment < resume[0]:
+                    continue
+                offset = resume[1] if segment == resume[0] else 0
+                with self._open_segment(segment) as f:
+                    f.seek(offset)
+                    for line in f:
+                        if not line.endswith(b'\n'):
+                            break
+                        missing.append(_INDEX_RECORD.pack(segment, offset))
+                        offset += len(line)
+
+            if count * _INDEX_RECORD.size != len(records) or missing:
+                with open(self.index_path, 'r+b' if records else 'wb') as f:
+                    f.truncate(count * _INDEX_RECORD.size)
+                    f.seek(0, os.SEEK_END)
+                    f.write(b''.join(missing))
+                if missing:
+                    log.info(f'indexed {len(missing)} messages in {self.name}')
+
+            self._count = count + len(missing)
+
+    @contextmanager
+    def _writer_lock(self, follow: bool = True):
+        """serialise writers - threads of this process always, and other processes too for a shared log"""
+        with self._lock:
+            if not self.shared:
+                yield
+                return
+
+            if self._lock_file is None:
+                self._lock_file = open(self.directory / f'{self.name}.lock',
+                                       'a+b')
+                _track_open_files(self)
+            _lock_file(self._lock_file)
+            try:
+                if follow:
+                    self._follow_other_writers()
+                yield
+            finally:
+                _unlock_file(self._lock_file)
+
+    def _follow_other_writers(self):
+        """catch up with appends and rotations other processes made since our last write"""
+        self._count = _index_count(self.index_path)
+        if self._file is None:
+            return
+        segments = self.segments()
+        if segments and segments[-1] != self._segment:
+            self.sync()
+            self._file.close()
+            self._index_file.close()
+            self._file = None
+            self._index_file = None
+        else:
+            self._file.seek(0, os.SEEK_END)
+
+    def _refresh(self):
+        if self.shared:
+            self._count = _index_count(self.index_path)
+
+    def _rotate(self):
+        self.sync()
+        if self._file:
+            self._file.close()
+        self._segment += 1
+        self._file = open(self.segment_path(self._segment), 'ab')
+        if self.codec:
+            self._seal(self._segment - 1)
+
+    def _seal(self, segment: int):
+        """replace a finished segment with its compressed form.
+
+        The compressed file is complete and fsynced before the plain one is removed, so a crash
+        in between leaves both behind and readers simply keep using the plain one."""
+        plain = self.segment_path(segment)
+        data = plain.read_bytes()
+        dictionary = self._dictionary(data) if self.codec.uses_dictionary else None
+
+        sealed = plain.with_name(plain.name + self.codec.suffix)
+        temporary = sealed.with_name(sealed.name + '.tmp')
+        with open(temporary, 'wb') as f:
+            f.write(self.codec.compress(data, dictionary))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporary, sealed)
+        plain.unlink()
+
+    def _dictionary(self, samples_from: Optional[bytes] = None) -> Optional[bytes]:
+        """the log's compression dictionary, trained on the lines of the first segment sealed when there is none yet"""
+        try:
+            return self.dictionary_path.read_bytes() or None
+        except FileNotFoundError:
+            if samples_from is None:
+                return None
+
+        dictionary = self.codec.train_dictionary(samples_from.splitlines(True))
+        temporary = self.dictionary_path.with_name(self.dictionary_path.name +
+                                                   '.tmp')
+        with open(temporary, 'wb') as f:
+            f.write(dictionary or b'')
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporary, self.dictionary_path)
+        return dictionary
+
+    def _open_segment(self, segment: int) -> BinaryIO:
+        """a readable file of the segment's plain lines, inflating it if it has been sealed"""
+        try:
+            return open(self.segment_path(segment), 'rb')
+        except FileNotFoundError:
+            pass
+
+        for path in self.segment_files(segment)[1:]:
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            validator = (stat.st_size, stat.st_mtime_ns)
+            data = _segment_cache.get(path, validator)
+            if data is None:
+                codec = READABLE_CODECS[path.suffix]
+                dictionary = self._dictionary() if codec.uses_dictionary else None
+                data = codec.decompress(path.read_bytes(), dictionary)
+                _segment_cache.put(path, data, len(data), validator)
+            return io.BytesIO(data)
+
+        raise FileNotFoundError(self.segment_path(segment))
+
+    def _line_end(self, segment: int, offset: int) -> Optional[int]:
+        """offset just past the complete line starting at `offset`, or None if there is no such line"""
+        try:
+            with self._open_segment(segment) as f:
+                f.seek(offset)
+                line = f.readline()
+        except FileNotFoundError:
+            return None
+        if not line.endswith(b'\n'):
+            return None
+        return offset + len(line)
+
+
+def _encode(message: dict) -> bytes:
+    # JSON escapes newlines inside strings, so one message is always exactly one line
+    return serialization.dumps(message) + b'\n'
+
+
+def _index_count(index_path: Path) -> int:
+    try:
+        return index_path.stat().st_size // _INDEX_RECORD.size
+    except FileNotFoundError:
+        return 0
+
+
+def _lock_file(file: BinaryIO):
+    if fcntl:
+        fcntl.flock(file.fileno(), fcntl.LOCK_EX)
+        return
+    file.seek(0)
+    while True:
+        try:
+            msvcrt.locking(file.fileno(), msvcrt.LK_LOCK, 1)
+            return
+        except OSError:
+            # LK_LOCK gives up after ~10 seconds; keep waiting
+            continue
+
+
+def _unlock_file(file: BinaryIO):
+    if fcntl:
+        fcntl.flock(file.fileno(), fcntl.LOCK_UN)
+        return
+    file.seek(0)
+    msvcrt.locking(file.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def _truncate_torn_tail(path: Path):
+    """drop a partially written last line left behind by a crash"""
+    if not path.exists():
+        return
+    with open(path, 'rb+') as f:
+        size = f.seek(0, os.SEEK_END)
+        if size == 0:
+            return
+        f.seek(size - 1)
+        if f.read(1) == b'\n':
+            return
+
+        position = size
+        while position > 0:
+            step = min(4096, position)
+            position -= step
+            f.seek(position)
+            chunk = f.read(step)
+            newline = chunk.rfind(b'\n')
+            if newline != -1:
+                f.truncate(position + newline + 1)
+                break
+        else:
+            f.truncate(0)
+    log.warning(f'truncated torn write at the end of {path}')
+
+
+# logs holding open files, least recently written first. Only these can have unsynced appends, since
+# closing a log syncs it
+_logs_with_files: "OrderedDict[MessageLog, None]" = OrderedDict()
+_logs_with_files_lock = threading.Lock()
+_syncer: Optional[threading.Thread] = None
+
+
+def _track_open_files(message_log: MessageLog,
+                      max_open: int = settings.MESSAGE_LOG_MAX_OPEN):
+    """mark `message_log` as the most recently written log with open files, closing the files of the least
+    recently written ones beyond `max_open`"""
+    global _syncer
+    with _logs_with_files_lock:
+        _logs_with_files[message_log] = None
+        _logs_with_files.move_to_end(message_log)
+        victims = [
+            _logs_with_files.popitem(last=False)[0]
+            for _ in range(len(_logs_with_files) - max_open)
+        ]
+        if _syncer is None:
+            _syncer = threading.Thread(target=_sync_idle_logs,
+                                       name='message-log-sync',
+                                       daemon=True)
+            _syncer.start()
+    for victim in victims:
+        # a log busy in another thread is skipped rather than waited for, since this thread may hold the
+        # lock of a log that one is about to track; being busy, it counts as recently written
+        if victim._lock.acquire(blocking=False):
+            try:
+                victim.close()
+            finally:
+                victim._lock.release()
+        else:
+            with _logs_with_files_lock:
+                _logs_with_files[victim] = None
+
+
+def _sync_idle_logs(interval: float = settings.MESSAGE_LOG_FSYNC_INTERVAL):
+    """fsync the logs whose appends stopped before `fsync_every` or `fsync_interval` made them sync"""
+    while True:
+        time.sleep(interval)
+        with _logs_with_files_lock:
+            message_logs = list(_logs_with_files)
+        now = time.monotonic()
+        for message_log in message_logs:
+            if (not message_log._unsynced
+                    or now - message_log._last_sync < message_log.fsync_interval):
+                continue
+            # a log being written to syncs itself
+            if message_log._lock.acquire(blocking=False):
+                try:
+                    message_log.sync()
+                except Exception:
+                    log.exception(f'syncing {message_log.name} failed')
+                finally:
+                    message_log._lock.release()
+
+
+def _forget_open_files(message_log: MessageLog):
+    with _logs_with_files_lock:
+        _logs_with_files.pop(message_log, None)
+
+
+# every log somebody still holds, so a log is never opened twice in this process, and the most recently
+# used ones beyond that
+_open_logs: "weakref.WeakValueDictionary[Tuple[Path, str], MessageLog]" = weakref.WeakValueDictionary()
+_recent_logs: "OrderedDict[Tuple[Path, str], MessageLog]" = OrderedDict()
+_open_logs_lock = threading.Lock()
+
+
+def open_message_log(directory: Path,
+                     name: str,
+                     shared: bool = settings.WORKERS > 1) -> MessageLog:
+    """return the MessageLog for `directory/name` that every writer in this process goes through.
+
+    With more than one server worker, logs default to `shared` so the workers can append to the same log."""
+    key = (Path(directory), name)
+    with _open_logs_lock:
+        message_log = _open_logs.get(key)
+        if message_log is None:
+            message_log = MessageLog(directory, name, shared=shared)
+            _open_logs[key] = message_log
+        _recent_logs[key] = message_log
+        _recent_logs.move_to_end(key)
+        while len(_recent_logs) > settings.MESSAGE_LOG_MAX_CACHED:
+            _recent_logs.popitem(last=False)
+        return message_log
+
+
+@atexit.register
+def close_all():
+    with _open_logs_lock:
+        message_logs = list(_open_logs.values())
+        _open_logs.clear()
+        _recent_logs.clear()
+    with _logs_with_files_lock:
+        message_logs += list(_logs_with_files)
+    for message_log in message_logs:
+        message_log.close()
+
+
+def migrate_directory(root: Path) -> int:
+    """migrate every legacy `*_messages.json` array found under `root`"""
+    migrated = 0
+    for legacy in Path(root).rglob('*_messages.json'):
+        MessageLog(legacy.parent, legacy.name[:-len('.json')]).close()
+        migrated += 1
+    return migrated
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    root = Path(sys.argv[1]) if len(sys.argv) > 1 else settings.DATA_DIR
+    print(f'migrated {migrate_directory(root)} message files under {root}')
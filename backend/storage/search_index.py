@@ -0,0 +1,271 @@
+import json
+import logging
+import re
+import sqlite3
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from agent_dashboard.backend import serialization
+from agent_dashboard.backend.storage.message_log import MessageLog
+
+log = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY,
+    team_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    sender TEXT,
+    kind TEXT NOT NULL,
+    created_at REAL,
+    body TEXT NOT NULL,
+    UNIQUE (team_id, seq)
+);
+CREATE INDEX IF NOT EXISTS messages_created_at ON messages (created_at);
+
+-- the full-text index reads message bodies out of the messages table instead of keeping its own copy
+CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5 (
+    body, content='messages', content_rowid='id', tokenize='unicode61'
+);
+CREATE TRIGGER IF NOT EXISTS messages_fts_insert AFTER INSERT ON messages
+BEGIN
+    INSERT INTO messages_fts (rowid, body) VALUES (new.id, new.body);
+END;
+CREATE TRIGGER IF NOT EXISTS messages_fts_delete AFTER DELETE ON messages
+BEGIN
+    INSERT INTO messages_fts (messages_fts, rowid, body) VALUES ('delete', old.id, old.body);
+END;
+
+-- how far into each team's message log the index has got
+CREATE TABLE IF NOT EXISTS indexed (
+    team_id TEXT PRIMARY KEY,
+    next_seq INTEGER NOT NULL
+);
+"""
+
+# bumped when the schema changes in a way that needs the index rebuilt; the startup backfill refills it.
+# 1: created_at is NULL for messages without a time of their own, instead of the time they were indexed
+_SCHEMA_VERSION = 1
+_DROP = """
+DROP TRIGGER IF EXISTS messages_fts_insert;
+DROP TRIGGER IF EXISTS messages_fts_delete;
+DROP TABLE IF EXISTS messages_fts;
+DROP TABLE IF EXISTS messages;
+DROP TABLE IF EXISTS indexed;
+"""
+
+_TERM = re.compile(r'\w+', re.UNICODE)
+
+
+class SearchIndex:
+    """SQLite FTS5 index over the messages stored in team conversation logs.
+
+    Each log is indexed incrementally: the index remembers the next sequence number it has not seen
+    per team, and `catch_up` indexes whatever the log gained since. Hits are ranked by bm25.
+
+    Messages that carry no time of their own have no `created_at` and never match `since`/`until`."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._connection = sqlite3.connect(self.path,
+                                           check_same_thread=False,
+                                           isolation_level=None,
+                                           timeout=30)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        # with WAL this still never corrupts the index; a crash may only lose the last commits, which the
+        # next catch_up redoes from the message logs
+        self._connection.execute('PRAGMA synchronous=NORMAL')
+        version = self._connection.execute('PRAGMA user_version').fetchone()[0]
+        if version < _SCHEMA_VERSION:
+            self._connection.executescript(_DROP)
+        self._connection.executescript(_SCHEMA)
+        self._connection.execute(f'PRAGMA user_version = {_SCHEMA_VERSION}')
+
+    def catch_up(self,
+                 team_id: str,
+                 message_log: MessageLog,
+                 batch: int = 1000) -> int:
+        """index the messages appended to `team_id`'s log since the last call; returns how many were added"""
+        added = 0
+        with self._lock:
+            row = self._connection.execute(
+                'SELECT next_seq FROM indexed WHERE team_id = ?',
+                (team_id, )).fetchone()
+            start = row[0] if row else 0
+            stop = message_log.count
+
+            while start < stop:
+                end = min(start + batch, stop)
+                rows = [(team_id, seq, *_document(serialization.loads(line)))
+                        for seq, line in enumerate(
+                            message_log.read_lines(start, end), start)]
+                self._insert(rows, end)
+                added += len(rows)
+                start = end
+        return added
+
+    def search(self,
+               query: str,
+               team_id: Optional[str] = None,
+               sender: Optional[str] = None,
+               kind: Optional[str] = None,
+               since: Optional[float] = None,
+               until: Optional[float] = None,
+               offset: int = 0,
+               limit: int = 20) -> Dict:
+        """ranked hits for `query`, best first, with the total number of hits.
+
+        Every word of the query has to appear in a message; the last one may be a prefix."""
+        match = _match_expression(query)
+        if match is None:
+            return {"hits": [], "total": 0}
+
+        conditions = ['messages_fts MATCH ?']
+        parameters: List = [match]
+        # the unary + keeps SQLite from driving the query off the messages indexes and running
+        # the full-text match once per row; the match goes first and filters apply to its hits
+        for condition, value in (('+m.team_id = ?', team_id),
+                                 ('+m.sender = ?', sender),
+                                 ('+m.kind = ?', kind),
+                                 ('+m.created_at >= ?', since),
+                                 ('+m.created_at < ?', until)):
+            if value is not None:
+                conditions.append(condition)
+                parameters.append(value)
+        where = ' AND '.join(conditions)
+
+        with self._lock:
+            total = self._connection.execute(
+                'SELECT COUNT(*) FROM messages_fts JOIN messages m ON m.id = messages_fts.rowid '
+                f'WHERE {where}', parameters).fetchone()[0]
+            rows = self._connection.execute(
+                'SELECT m.team_id, m.seq, m.sender, m.kind, m.created_at, '
+                "snippet(messages_fts, 0, '<mark>', '</mark>', '...', 16), bm25(messages_fts) AS rank "
+                'FROM messages_fts JOIN messages m ON m.id = messages_fts.rowid '
+                f'WHERE {where} ORDER BY rank LIMIT ? OFFSET ?',
+                parameters + [limit, offset]).fetchall()
+
+        return {
+            "hits": [{
+                "team_id": team_id,
+                "seq": seq,
+                "sender": sender,
+                "kind": kind,
+                "created_at": created_at,
+                "snippet": snippet,
+                "score": -rank,
+            } for team_id, seq, sender, kind, created_at, snippet, rank in rows
+                     ],
+            "total": total,
+        }
+
+    def forget(self, team_id: str):
+        """drop a team from the index, e.g. before reindexing it from scratch"""
+        with self._lock:
+            self._connection.execute('BEGIN IMMEDIATE')
+            self._connection.execute('DELETE FROM messages WHERE team_id = ?',
+                                     (team_id, ))
+            self._connection.execute('DELETE FROM indexed WHERE team_id = ?',
+                                     (team_id, ))
+            self._connection.execute('COMMIT')
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+    def _insert(self, rows: List[Tuple], next_seq: int):
+        # IMMEDIATE so that workers catching up on the same log at once take turns
+        self._connection.execute('BEGIN IMMEDIATE')
+        try:
+            self._connection.executemany(
+                'INSERT OR IGNORE INTO messages (team_id, seq, sender, kind, created_at, body) '
+                'VALUES (?, ?, ?, ?, ?, ?)', rows)
+            self._connection.execute(
+                'INSERT INTO indexed (team_id, next_seq) VALUES (?, ?) '
+                'ON CONFLICT (team_id) DO UPDATE SET next_seq = MAX(next_seq, excluded.next_seq)',
+                (rows[0][0], next_seq))
+            self._connection.execute('COMMIT')
+        except Exception:
+            self._connection.execute('ROLLBACK')
+            raise
+
+
+def _match_expression(query: str) -> Optional[str]:
+    """turn free text into an FTS5 query, quoting every term so user input can never be read as FTS syntax"""
+    terms = _TERM.findall(query)
+    if not terms:
+        return None
+    quoted = [f'"{term}"' for term in terms]
+    quoted[-1] += '*'
+    return ' '.join(quoted)
+
+
+def _document(message: dict) -> Tuple[Optional[str], str, Optional[float], str]:
+    """(sender, kind, created_at, body) of a stored message.
+
+    Stored messages come from several places and only loosely share a shape: the sender may be a name
+    or a participant dict, content a string or a list of Anthropic content blocks."""
+    sender = message.get('sender') or message.get('name') or message.get(
+        'role')
+    if isinstance(sender, dict):
+        sender = sender.get('name')
+
+    texts: List[str] = []
+    tool_use = 'tool_use' in str(message.get('type', ''))
+    for key in ('message', 'text'):
+        if isinstance(message.get(key), str):
+            texts.append(message[key])
+
+    content = message.get('content')
+    blocks = content if isinstance(content, list) else [content]
+    for block in blocks:
+        if isinstance(block, str):
+            texts.append(block)
+        elif isinstance(block, dict):
+            if block.get('type') in ('tool_use', 'tool_result'):
+                tool_use = True
+            if isinstance(block.get('text'), str):
+                texts.append(block['text'])
+            if block.get('name'):
+                texts.append(str(block['name']))
+            if block.get('input'):
+                texts.append(json.dumps(block['input']))
+            if isinstance(block.get('content'), str):
+                texts.append(block['content'])
+
+    return (str(sender) if sender else None, 'tool_use' if tool_use else
+            'text', _timestamp(message), '\n'.join(texts))
+
+
+def _timestamp(message: dict) -> Optional[float]:
+    for key in ('timestamp', 'created_at', 'time'):
+        value = message.get(key)
+        if isinstance(value, (int, float)):
+            return float(value)
+        if isinstance(value, str):
+            try:
+                return datetime.fromisoformat(value).timestamp()
+            except ValueError:
+                continue
+    # not when it was indexed: the backfill would stamp every older message with the time the server started
+    return None
+
+
+_open_indexes: Dict[Path, SearchIndex] = {}
+_open_indexes_lock = threading.Lock()
+
+
+def open_search_index(directory: Path) -> SearchIndex:
+    """return the shared search index of the team conversations stored under `directory`"""
+    directory = Path(directory)
+    with _open_indexes_lock:
+        search_index = _open_indexes.get(directory)
+        if search_index is None:
+            search_index = SearchIndex(directory / 'search.sqlite3')
+            _open_indexes[directory] = search_index
+        return search_index
@@ -0,0 +1,78 @@
+import json
+import os
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from agent_dashboard.backend import settings
+from agent_dashboard.backend.storage.message_log import MessageLog, open_message_log
+
+
+class SnapshotStore:
+    """The latest snapshot of each conversation, one small json file per conversation that is replaced atomically.
+
+    Besides what it takes to recreate the conversation, a snapshot carries a rolling window of its most recent
+    messages and `seq`, the number of stored messages it covers. Resuming reads the snapshot and only the tail
+    of the message log written after it, so it costs the same however long the conversation has run."""
+
+    def __init__(self,
+                 data_dir: Path = settings.DATA_DIR,
+                 window: int = settings.CONVERSATION_SNAPSHOT_WINDOW):
+        self.data_dir = Path(data_dir)
+        self.window = window
+
+    def path(self, conversation_id: str) -> Path:
+        return self.data_dir / conversation_id / 'conversations' / f'{conversation_id}_snapshot.json'
+
+    def history(self, conversation_id: str) -> MessageLog:
+        """the log of stored messages the snapshot's window is taken from"""
+        return open_message_log(
+            self.data_dir / conversation_id / 'conversations',
+            f'{conversation_id}_messages')
+
+    def save(self, conversation_id: str, snapshot: Dict):
+        path = self.path(conversation_id)
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        # written aside and swapped in, so a crash never leaves half a snapshot behind
+        temporary = path.with_name(path.name + '.tmp')
+        with open(temporary, 'w') as f:
+            json.dump(snapshot, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporary, path)
+
+    def load(self, conversation_id: str) -> Optional[Dict]:
+        try:
+            with open(self.path(conversation_id), 'r') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def recent_messages(self,
+                        conversation_id: str,
+                        snapshot: Optional[Dict] = None) -> List[dict]:
+        """the last `window` stored messages: the snapshot's window rolled forward over the log tail written since"""
+        return self._roll(conversation_id, snapshot)[0]
+
+    def checkpoint(self, conversation_id: str, snapshot: Dict) -> Dict:
+        """save `snapshot` with its message window brought up to date with the log"""
+        recent, seq = self._roll(conversation_id, snapshot)
+        snapshot = {**snapshot, "recent": recent, "seq": seq}
+        self.save(conversation_id, snapshot)
+        return snapshot
+
+    def _roll(self, conversation_id: str,
+              snapshot: Optional[Dict]) -> Tuple[List[dict], int]:
+        message_log = self.history(conversation_id)
+        count = message_log.count
+        recent: List[dict] = []
+        seq = 0
+        if snapshot:
+            recent = snapshot.get("recent", [])
+            seq = snapshot.get("seq", 0)
+
+        # a tail longer than the window replaces the snapshot's messages entirely, and only its end is read
+        start = max(seq, count - self.window)
+        if start > seq:
+            recent = []
+        return (recent + message_log.read(start, count))[-self.window:], count
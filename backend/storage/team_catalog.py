@@ -0,0 +1,148 @@
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+log = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS teams (
+    team_id TEXT PRIMARY KEY,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS teams_created_at ON teams (created_at, team_id);
+
+-- counters kept up to date by triggers, so the total is a single row read instead of a COUNT(*) scan
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO counters (name, value) VALUES ('teams', 0);
+CREATE TRIGGER IF NOT EXISTS teams_count_insert AFTER INSERT ON teams
+BEGIN
+    UPDATE counters SET value = value + 1 WHERE name = 'teams';
+END;
+CREATE TRIGGER IF NOT EXISTS teams_count_delete AFTER DELETE ON teams
+BEGIN
+    UPDATE counters SET value = value - 1 WHERE name = 'teams';
+END;
+
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+class TeamCatalog:
+    """SQLite index of the teams stored as `{team_id}_agents.json` files in `team_dir`.
+
+    Lookups go through the primary key and listings through the created_at index, so neither
+    touches the team directory. The first time a catalog is opened it is backfilled from the files already on disk."""
+
+    def __init__(self, path: Path, team_dir: Path):
+        self.path = Path(path)
+        self.team_dir = Path(team_dir)
+        self._lock = threading.Lock()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._connection = sqlite3.connect(self.path,
+                                           check_same_thread=False,
+                                           isolation_level=None)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.executescript(_SCHEMA)
+        self._backfill()
+
+    def agents_path(self, team_id: str) -> Path:
+        return self.team_dir / f'{team_id}_agents.json'
+
+    def workflow_path(self, team_id: str) -> Path:
+        return self.team_dir / f'{team_id}_workflow.json'
+
+    def add(self, team_id: str, created_at: Optional[float] = None):
+        with self._lock:
+            self._connection.execute(
+                'INSERT OR IGNORE INTO teams (team_id, created_at) VALUES (?, ?)',
+                (team_id, created_at or time.time()))
+
+    def remove(self, team_id: str):
+        with self._lock:
+            self._connection.execute('DELETE FROM teams WHERE team_id = ?',
+                                     (team_id, ))
+
+    def contains(self, team_id: str) -> bool:
+        """whether the team exists. A team whose files were copied in by hand is picked up here with a single stat."""
+        with self._lock:
+            row = self._connection.execute(
+                'SELECT 1 FROM teams WHERE team_id = ?',
+                (team_id, )).fetchone()
+        if row:
+            return True
+
+        agents_path = self.agents_path(team_id)
+        if agents_path.exists():
+            self.add(team_id, agents_path.stat().st_mtime)
+            return True
+        return False
+
+    def list(self,
+             offset: int = 0,
+             limit: Optional[int] = None,
+             descending: bool = False) -> List[str]:
+        order = 'DESC' if descending else 'ASC'
+        with self._lock:
+            rows = self._connection.execute(
+                f'SELECT team_id FROM teams ORDER BY created_at {order}, team_id {order} '
+                'LIMIT ? OFFSET ?',
+                (-1 if limit is None else limit, offset)).fetchall()
+        return [row[0] for row in rows]
+
+    def count(self) -> int:
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT value FROM counters WHERE name = 'teams'").fetchone()
+        return row[0]
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+    def _backfill(self):
+        with self._lock:
+            done = self._connection.execute(
+                "SELECT value FROM meta WHERE key = 'backfilled'").fetchone()
+            if done:
+                return
+
+            rows = []
+            for path in self.team_dir.glob('*_agents.json'):
+                rows.append((path.name[:-len('_agents.json')],
+                             path.stat().st_mtime))
+
+            self._connection.execute('BEGIN')
+            self._connection.executemany(
+                'INSERT OR IGNORE INTO teams (team_id, created_at) VALUES (?, ?)',
+                rows)
+            self._connection.execute(
+                "INSERT INTO meta (key, value) VALUES ('backfilled', ?)",
+                (str(time.time()), ))
+            self._connection.execute('COMMIT')
+
+        log.info(f'backfilled team catalog {self.path} with {len(rows)} teams')
+
+
+_open_catalogs: Dict[Path, TeamCatalog] = {}
+_open_catalogs_lock = threading.Lock()
+
+
+def open_team_catalog(team_dir: Path) -> TeamCatalog:
+    """return the shared catalog for the teams in `team_dir`"""
+    team_dir = Path(team_dir)
+    with _open_catalogs_lock:
+        catalog = _open_catalogs.get(team_dir)
+        if catalog is None:
+            catalog = TeamCatalog(team_dir / 'teams.sqlite3', team_dir)
+            _open_catalogs[team_dir] = catalog
+        return catalog
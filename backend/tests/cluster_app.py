@@ -0,0 +1,15 @@
+"""The conversation routes with the offline fakes, served by each worker process of test_cluster"""
+from fastapi import FastAPI
+
+from agent_dashboard.backend.benchmarks import fakes
+from agent_dashboard.backend.routes import conversation_routes
+
+fakes.install(turn_latency=0.01)
+
+app = FastAPI()
+app.include_router(conversation_routes.router)
+
+
+@app.get("/")
+def read_root():
+    return {"message": "we're up!"}
@@ -0,0 +1,11 @@
+"""Settings for the test run: a throwaway data directory, and no admission limits.
+
+Settings are read from the environment when the backend modules are first imported, so they are set here,
+before any test module imports them."""
+import os
+import tempfile
+
+os.environ['AGENT_DASHBOARD_DATA_DIR'] = tempfile.mkdtemp(
+    prefix='agent-dashboard-tests-')
+os.environ.setdefault('ADMISSION_ENABLED', '0')
+os.environ.setdefault('PRELOAD_MODULES', '0')
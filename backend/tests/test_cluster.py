@@ -0,0 +1,132 @@
+"""Two server workers sharing a data directory, each its own process as with `uvicorn --workers 2`.
+
+A conversation lives on the worker that created it; a viewer connected to the other worker follows its
+frames and forwards what it sends through the conversation's inbox."""
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+from uuid import uuid4
+
+import pytest
+
+websockets = pytest.importorskip('websockets')
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _request(url: str, body: dict = None) -> dict:
+    data = None if body is None else json.dumps(body).encode()
+    request = urllib.request.Request(
+        url, data=data, headers={'Content-Type': 'application/json'})
+    with urllib.request.urlopen(request) as response:
+        return json.loads(response.read())
+
+
+def _wait_until(condition, timeout: float = 15):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if condition():
+                return
+        except OSError:
+            pass
+        time.sleep(0.1)
+    raise TimeoutError('gave up waiting')
+
+
+@pytest.fixture
+def workers(tmp_path):
+    """the base urls of two workers; conversations idle for a second are evicted.
+
+    Each is started with one uvicorn worker on a port of its own, so a test can pick the worker it
+    talks to, while WEB_CONCURRENCY tells the backend it is one of two."""
+    env = dict(os.environ,
+               AGENT_DASHBOARD_DATA_DIR=str(tmp_path),
+               PYTHONPATH=os.pathsep.join(path for path in sys.path if path),
+               WEB_CONCURRENCY='2',
+               CONVERSATION_IDLE_TIMEOUT='1',
+               CONVERSATION_SWEEP_INTERVAL='0.2')
+    ports = [_free_port(), _free_port()]
+    processes = [
+        subprocess.Popen([
+            sys.executable, '-m', 'uvicorn',
+            'agent_dashboard.backend.tests.cluster_app:app', '--port',
+            str(port), '--workers', '1', '--log-level', 'warning'
+        ],
+                         env=env) for port in ports
+    ]
+    try:
+        urls = [f'http://127.0.0.1:{port}' for port in ports]
+        _wait_until(lambda: len(_request(f'{urls[0]}/cluster')["workers"]) == 2)
+        yield urls
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait(10)
+
+
+async def _reply(websocket, content: str) -> dict:
+    """the next frame of the agent answering `content`, skipping any other frames"""
+    while True:
+        frame = json.loads(await asyncio.wait_for(websocket.recv(), 10))
+        message = frame.get("conversation_message", {})
+        # the conversation appends its workspace hint to the message the agent answers
+        if message.get("content", "").startswith(f'reply to {content}'):
+            return message
+
+
+async def _send_through_other_worker(owner_url: str, other_url: str,
+                                     conversation_id: str, content: str):
+    """connect a viewer to each worker, send `content` through the one on the other worker and return
+    the reply both viewers saw"""
+    owner_ws = owner_url.replace('http', 'ws') + f'/c2/{conversation_id}'
+    other_ws = other_url.replace('http', 'ws') + f'/c2/{conversation_id}'
+    async with websockets.connect(owner_ws) as viewer:
+        async with websockets.connect(other_ws) as sender:
+            await sender.send(
+                json.dumps({
+                    "message": content,
+                    "recipient": "Assistant"
+                }))
+            return await _reply(viewer, content), await _reply(sender, content)
+
+
+def test_message_sent_through_another_worker_reaches_the_owner(workers):
+    owner, other = workers
+    conversation_id = str(uuid4())
+    _request(
+        f'{owner}/c2/create', {
+            "create_conversation_request": {
+                "name": conversation_id,
+                "conversation_id": conversation_id
+            },
+            "create_new_agent_requests": [{
+                "name": "Assistant",
+                "tools": []
+            }],
+        })
+
+    seen, forwarded = asyncio.run(
+        _send_through_other_worker(owner, other, conversation_id, 'hello'))
+    assert seen == forwarded
+    assert seen["sender"] == "Assistant"
+    assert _request(f'{other}/c2/stats')["resident_conversations"] == 0
+
+    # with both viewers gone the owner evicts it, and the next viewer brings it back
+    _wait_until(lambda: _request(f'{owner}/c2/stats')["evicted_total"] == 1)
+    seen, forwarded = asyncio.run(
+        _send_through_other_worker(owner, other, conversation_id, 'again'))
+    assert seen == forwarded
+    stats = _request(f'{owner}/c2/stats')
+    assert stats["rehydrated_total"] == 1
+    assert stats["resident_conversations"] == 1
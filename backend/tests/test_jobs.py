@@ -0,0 +1,196 @@
+import asyncio
+import threading
+import time
+from types import SimpleNamespace
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from agent_dashboard.backend.jobs import JobQueue, JobStore, TaskStatus
+from agent_dashboard.backend.routes import team_routes
+
+# job handlers have to be module-level functions, so they record their calls here
+calls = []
+calls_lock = threading.Lock()
+
+
+def echo(value, seconds: float = 0.0):
+    with calls_lock:
+        calls.append(value)
+    time.sleep(seconds)
+    return {"value": value}
+
+
+def fail(value):
+    raise RuntimeError(f'no {value}')
+
+
+active = 0
+most_active = 0
+
+
+def overlap(seconds: float):
+    """how many of these run at the same time ends up in most_active"""
+    global active, most_active
+    with calls_lock:
+        active += 1
+        most_active = max(most_active, active)
+    time.sleep(seconds)
+    with calls_lock:
+        active -= 1
+    return {}
+
+
+async def _wait_done(queue: JobQueue, job_id: str, timeout: float = 5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = await queue.get(job_id)
+        if job.status in (TaskStatus.COMPLETED, TaskStatus.FAILED):
+            return job
+        await asyncio.sleep(0.01)
+    raise TimeoutError(job_id)
+
+
+def _queue(tmp_path, worker_id: str = 'worker-a', **kwargs) -> JobQueue:
+    return JobQueue(JobStore(tmp_path / 'jobs.sqlite3', worker_id=worker_id),
+                    {"echo": echo, "fail": fail, "overlap": overlap},
+                    executor='thread',
+                    **kwargs)
+
+
+def test_job_result_and_failure_are_recorded(tmp_path):
+
+    async def scenario():
+        queue = _queue(tmp_path)
+        await queue.start()
+        try:
+            await queue.submit('ok', 'echo', {"value": 1})
+            await queue.submit('broken', 'fail', {"value": 2})
+            return (await _wait_done(queue, 'ok'),
+                    await _wait_done(queue, 'broken'))
+        finally:
+            await queue.stop()
+
+    ok, broken = asyncio.run(scenario())
+    assert ok.status == TaskStatus.COMPLETED and ok.result == {"value": 1}
+    assert broken.status == TaskStatus.FAILED
+    assert broken.result == {"error": "no 2"}
+
+
+def test_at_most_max_concurrency_jobs_run_at_once(tmp_path):
+
+    async def scenario():
+        queue = _queue(tmp_path, max_concurrency=2)
+        await queue.start()
+        try:
+            for i in range(6):
+                await queue.submit(f'job-{i}', 'overlap', {"seconds": 0.05})
+            for i in range(6):
+                await _wait_done(queue, f'job-{i}')
+        finally:
+            await queue.stop()
+
+    asyncio.run(scenario())
+    assert most_active == 2
+
+
+def test_job_queued_after_another_starts_once_it_finished(tmp_path):
+    calls.clear()
+
+    async def scenario():
+        queue = _queue(tmp_path, max_concurrency=2)
+        await queue.start()
+        try:
+            await queue.submit('first', 'echo', {"value": 'first', "seconds": 0.1})
+            await queue.submit('second', 'echo', {"value": 'second'}, after='first')
+            await _wait_done(queue, 'second')
+        finally:
+            await queue.stop()
+
+    asyncio.run(scenario())
+    assert calls == ['first', 'second']
+
+
+def test_jobs_of_a_dead_worker_are_taken_over_but_not_those_of_a_live_one(tmp_path):
+    calls.clear()
+    live = JobStore(tmp_path / 'jobs.sqlite3', worker_id='live')
+    dead = JobStore(tmp_path / 'jobs.sqlite3',
+                    worker_id='dead',
+                    heartbeat_timeout=0)
+    live.add('live-job', 'echo', {"value": 'live'})
+    dead.add('dead-job', 'echo', {"value": 'dead'})
+    # the dead worker never heartbeats again
+    dead._connection.execute('UPDATE jobs SET heartbeat = 0 WHERE worker_id = ?',
+                             ('dead', ))
+
+    async def scenario():
+        queue = _queue(tmp_path, worker_id='other')
+        await queue.start()
+        try:
+            return await _wait_done(queue, 'dead-job'), await queue.get('live-job')
+        finally:
+            await queue.stop()
+
+    dead_job, live_job = asyncio.run(scenario())
+    assert dead_job.status == TaskStatus.COMPLETED
+    assert live_job.status == TaskStatus.PENDING
+    assert calls == ['dead']
+
+
+def test_stop_lets_a_running_job_finish_instead_of_running_it_again(tmp_path):
+    calls.clear()
+
+    async def scenario():
+        queue = _queue(tmp_path)
+        await queue.start()
+        await queue.submit('slow', 'echo', {"value": 'slow', "seconds": 0.2})
+        await asyncio.sleep(0.05)
+        await queue.stop(timeout=5)
+
+        # a worker starting afterwards has nothing left to take over
+        other = _queue(tmp_path, worker_id='worker-b')
+        await other.start()
+        await other.stop()
+        return await other.get('slow')
+
+    job = asyncio.run(scenario())
+    assert job.status == TaskStatus.COMPLETED
+    assert calls == ['slow']
+
+
+def test_team_creation_route_runs_the_pipeline_as_a_job(monkeypatch):
+
+    class Agent:
+
+        def __init__(self, name):
+            self.name = name
+
+        def to_dict(self):
+            return {"name": self.name, "prompt": "", "tools": []}
+
+    def create_team(task):
+        return {"Planner": Agent("Planner")}, f"Planner for {task}"
+
+    monkeypatch.setattr(team_routes, 'team_creation',
+                        SimpleNamespace(create_team=create_team))
+    app = FastAPI()
+    app.include_router(team_routes.router)
+
+    with TestClient(app) as client:
+        response = client.post('/teams/create',
+                               json={"task": "write a test for the job queue"})
+        assert response.status_code == 200
+        task_id = response.json()["task_id"]
+
+        deadline = time.monotonic() + 5
+        while True:
+            task = client.get(f'/tasks/{task_id}').json()
+            if task["status"] not in ("pending", "processing"):
+                break
+            assert time.monotonic() < deadline
+            time.sleep(0.01)
+
+        assert task["status"] == "completed"
+        team = client.get(f'/teams/{task["result"]["team_id"]}')
+        assert team.status_code == 200
+        assert team.json()["data"][0]["name"] == "Planner"
@@ -0,0 +1,83 @@
+import json
+from uuid import uuid4
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from agent_dashboard.backend.routes import team_routes
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.include_router(team_routes.router)
+    with TestClient(app) as client:
+        yield client
+
+
+def _entries(start: int, count: int, **fields):
+    return [{"message": {"content": f"message {i}"}, "seq": i, **fields}
+            for i in range(start, start + count)]
+
+
+def _history(client, team_id: str):
+    return [
+        message["content"]
+        for message in client.get(f'/teams/{team_id}/messages/load').json()["messages"]
+    ]
+
+
+def test_resending_a_batch_with_seqs_stores_nothing_twice(client):
+    team_id = str(uuid4())
+    first = client.post(f'/teams/{team_id}/messages/batch', json=_entries(0, 3))
+    assert first.json() == {"status": "success", "stored": 3, "duplicates": 0,
+                            "next_seq": 3}
+
+    # the response was lost, the client resends the batch together with the next message
+    retry = client.post(f'/teams/{team_id}/messages/batch', json=_entries(0, 4))
+    assert retry.json()["stored"] == 1
+    assert retry.json()["duplicates"] == 3
+    assert retry.json()["next_seq"] == 4
+    assert _history(client, team_id) == [f"message {i}" for i in range(4)]
+
+
+def test_batch_starting_past_the_end_is_refused_with_the_expected_seq(client):
+    team_id = str(uuid4())
+    client.post(f'/teams/{team_id}/messages/batch', json=_entries(0, 2))
+
+    gap = client.post(f'/teams/{team_id}/messages/batch', json=_entries(5, 1))
+    assert gap.status_code == 409
+    assert gap.json()["detail"]["expected_seq"] == 2
+    assert _history(client, team_id) == ["message 0", "message 1"]
+
+
+def test_seqs_of_a_batch_have_to_be_consecutive(client):
+    entries = _entries(0, 3)
+    entries[2]["seq"] = 5
+    response = client.post(f'/teams/{uuid4()}/messages/batch', json=entries)
+    assert response.status_code == 400
+
+
+def test_messages_with_a_stored_idempotency_key_are_skipped(client):
+    team_id = str(uuid4())
+    batch = [{"message": {"content": "once"}, "idempotency_key": "a"},
+             {"message": {"content": "once"}, "idempotency_key": "a"},
+             {"message": {"content": "plain"}}]
+    first = client.post(f'/teams/{team_id}/messages/batch', json=batch)
+    assert first.json()["stored"] == 2
+    assert first.json()["duplicates"] == 1
+
+    retry = client.post(f'/teams/{team_id}/messages/batch', json=batch[:1])
+    assert retry.json()["stored"] == 0
+    assert _history(client, team_id) == ["once", "plain"]
+
+
+def test_ndjson_batch(client):
+    team_id = str(uuid4())
+    body = '\n'.join(json.dumps(entry) for entry in _entries(0, 3)) + '\n'
+    response = client.post(f'/teams/{team_id}/messages/batch',
+                           content=body,
+                           headers={"content-type": "application/x-ndjson"})
+    assert response.json()["next_seq"] == 3
+    assert _history(client, team_id) == [f"message {i}" for i in range(3)]
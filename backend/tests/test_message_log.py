@@ -0,0 +1,117 @@
+import json
+import time
+
+import pytest
+
+from agent_dashboard.backend.storage import MessageLog, SequenceGap, open_message_log
+from agent_dashboard.backend.storage import message_log as message_log_module
+
+
+def _messages(count: int, start: int = 0):
+    return [{"role": "assistant", "content": f"message {i}"}
+            for i in range(start, start + count)]
+
+
+def test_appended_messages_read_back_in_order(tmp_path):
+    log = MessageLog(tmp_path, 'team_messages')
+    assert log.append({"content": "first"}) == 0
+    assert log.append_many(_messages(3)) == 1
+
+    assert log.count == 4
+    assert log.read(0, 1) == [{"content": "first"}]
+    assert log.read(1, 4) == _messages(3)
+    assert log.read_all() == [{"content": "first"}] + _messages(3)
+
+
+def test_messages_survive_reopening_and_segment_rotation(tmp_path):
+    log = MessageLog(tmp_path, 'team_messages', segment_max_bytes=200)
+    log.append_many(_messages(20))
+    log.close()
+
+    reopened = MessageLog(tmp_path, 'team_messages', segment_max_bytes=200)
+    assert len(reopened.segments()) > 1
+    assert reopened.count == 20
+    assert reopened.read(7, 12) == _messages(5, start=7)
+    assert reopened.append({"content": "next"}) == 20
+
+
+def test_torn_write_at_the_end_is_dropped(tmp_path):
+    log = MessageLog(tmp_path, 'team_messages')
+    log.append_many(_messages(3))
+    log.close()
+    with open(log.segment_path(0), 'ab') as f:
+        f.write(b'{"content": "half a mess')
+
+    reopened = MessageLog(tmp_path, 'team_messages')
+    assert reopened.count == 3
+    reopened.append({"content": "whole"})
+    assert reopened.read_all() == _messages(3) + [{"content": "whole"}]
+
+
+def test_append_at_skips_messages_the_log_already_holds(tmp_path):
+    log = MessageLog(tmp_path, 'team_messages')
+    assert log.append_at(0, _messages(3)) == 3
+    # a resent batch overlapping the end of the log only adds what is new
+    assert log.append_at(1, _messages(4, start=1)) == 2
+    assert log.read_all() == _messages(5)
+
+    with pytest.raises(SequenceGap) as gap:
+        log.append_at(7, _messages(1))
+    assert gap.value.expected == 5
+
+
+def test_legacy_json_array_is_migrated_once(tmp_path):
+    legacy = tmp_path / 'team_messages.json'
+    legacy.write_text(json.dumps(_messages(5)))
+
+    log = MessageLog(tmp_path, 'team_messages')
+    assert log.read_all() == _messages(5)
+    assert not legacy.exists()
+    assert (tmp_path / 'team_messages.json.migrated').exists()
+
+    log.append({"content": "after"})
+    log.close()
+    assert MessageLog(tmp_path, 'team_messages').count == 6
+
+
+def test_shared_logs_see_each_others_appends(tmp_path):
+    first = MessageLog(tmp_path, 'team_messages', shared=True)
+    second = MessageLog(tmp_path, 'team_messages', shared=True)
+    first.append({"content": "from first"})
+    assert second.append({"content": "from second"}) == 1
+    assert first.count == 2
+    assert first.read_all() == [{"content": "from first"},
+                                {"content": "from second"}]
+
+
+def test_open_files_are_bounded_and_closed_logs_reopen(tmp_path, monkeypatch):
+    logs = [
+        open_message_log(tmp_path / str(i), 'team_messages') for i in range(6)
+    ]
+    monkeypatch.setattr(message_log_module._track_open_files, '__defaults__',
+                        (3, ))
+    for i, log in enumerate(logs):
+        log.append({"content": i})
+
+    assert sum(log._file is not None for log in logs) <= 3
+    for i, log in enumerate(logs):
+        log.append({"content": i})
+        assert log.read_all() == [{"content": i}, {"content": i}]
+
+
+def test_open_message_log_returns_the_same_log_while_it_is_held(tmp_path):
+    log = open_message_log(tmp_path, 'team_messages')
+    assert open_message_log(tmp_path, 'team_messages') is log
+
+
+def test_idle_log_is_synced_without_another_append(tmp_path, monkeypatch):
+    log = open_message_log(tmp_path, 'team_messages')
+    log.fsync_every = 1000
+    log.fsync_interval = 0.05
+    log.append({"content": "idle"})
+    assert log._unsynced == 1
+
+    deadline = time.monotonic() + 5
+    while log._unsynced and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert log._unsynced == 0
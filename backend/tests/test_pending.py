@@ -0,0 +1,160 @@
+import asyncio
+from uuid import uuid4
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from agent_dashboard.backend.benchmarks import fakes
+from agent_dashboard.backend.realtime.pending import PendingRequests, RequestCancelled
+from agent_dashboard.backend.routes import conversation_routes
+
+Manager = conversation_routes.WebSocketConversationManager
+
+
+def _ask(pending: PendingRequests, conversation_id: str, timeout: float = 5):
+    """start a question and return its task and a future for the request_id it was sent with"""
+    sent = asyncio.get_running_loop().create_future()
+
+    async def send(request_id: str):
+        sent.set_result(request_id)
+
+    return asyncio.ensure_future(pending.ask(conversation_id, send, timeout)), sent
+
+
+def test_answers_are_routed_by_request_id():
+
+    async def scenario():
+        pending = PendingRequests()
+        first, first_id = _ask(pending, 'conversation')
+        second, second_id = _ask(pending, 'conversation')
+        assert pending.resolve(await second_id, {"answer": 2})
+        assert pending.resolve(await first_id, {"answer": 1})
+        return await first, await second, len(pending)
+
+    assert asyncio.run(scenario()) == ({"answer": 1}, {"answer": 2}, 0)
+
+
+def test_only_a_question_of_the_answering_conversation_is_resolved():
+
+    async def scenario():
+        pending = PendingRequests()
+        question, request_id = _ask(pending, 'conversation')
+        request_id = await request_id
+        assert not pending.resolve(request_id, {}, conversation_id='other')
+        assert not pending.resolve(str(uuid4()), {})
+        assert pending.resolve(request_id, {"answer": 1},
+                               conversation_id='conversation')
+        # answered once, a second answer finds nothing waiting
+        assert not pending.resolve(request_id, {"answer": 2})
+        return await question
+
+    assert asyncio.run(scenario()) == {"answer": 1}
+
+
+def test_unanswered_question_times_out():
+
+    async def scenario():
+        pending = PendingRequests()
+        question, _ = _ask(pending, 'conversation', timeout=0.05)
+        with pytest.raises(TimeoutError):
+            await question
+        return len(pending), pending.outstanding('conversation')
+
+    assert asyncio.run(scenario()) == (0, 0)
+
+
+def test_cancelling_a_conversation_fails_its_questions_and_queued_asks():
+
+    async def scenario():
+        pending = PendingRequests(max_per_conversation=1)
+        asked, _ = _ask(pending, 'conversation')
+        queued, _ = _ask(pending, 'conversation')
+        other, other_id = _ask(pending, 'other')
+        await asyncio.sleep(0)
+
+        assert pending.cancel_conversation('conversation') == 2
+        for question in (asked, queued):
+            with pytest.raises(RequestCancelled):
+                await question
+        pending.resolve(await other_id, {"answer": 1})
+        return await other
+
+    assert asyncio.run(scenario()) == {"answer": 1}
+
+
+def test_queued_ask_gets_the_slot_of_an_answered_one():
+
+    async def scenario():
+        pending = PendingRequests(max_per_conversation=1)
+        first, first_id = _ask(pending, 'conversation')
+        second, second_id = _ask(pending, 'conversation')
+        await asyncio.sleep(0)
+        assert not second_id.done()
+
+        pending.resolve(await first_id, {"answer": 1})
+        pending.resolve(await second_id, {"answer": 2})
+        return await first, await second
+
+    assert asyncio.run(scenario()) == ({"answer": 1}, {"answer": 2})
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(conversation_routes, 'WebSocketConversation',
+                        fakes.FakeAgentConversation)
+    monkeypatch.setattr(conversation_routes, 'LLMAgent', fakes.FakeLLMAgent)
+    app = FastAPI()
+    app.include_router(conversation_routes.router)
+    with TestClient(app) as client:
+        yield client
+
+
+def _create_conversation(client) -> str:
+    conversation_id = str(uuid4())
+    response = client.post('/c2/create',
+                           json={
+                               "create_conversation_request": {
+                                   "name": conversation_id,
+                                   "conversation_id": conversation_id
+                               },
+                               "create_new_agent_requests": [{
+                                   "name": "Assistant",
+                                   "tools": []
+                               }],
+                           })
+    assert response.status_code == 201
+    return conversation_id
+
+
+def _receive_question(websocket) -> dict:
+    while True:
+        frame = websocket.receive_json()
+        if "request_id" in frame:
+            return frame
+
+
+def test_viewer_answers_a_question_through_the_websocket(client):
+    conversation_id = _create_conversation(client)
+    with client.websocket_connect(f'/c2/{conversation_id}') as websocket:
+        answer = client.portal.start_task_soon(
+            Manager.send_and_wait_for_response, conversation_id,
+            {"question": "which one?"})
+        question = _receive_question(websocket)
+        assert question["question"] == "which one?"
+        websocket.send_json({"request_id": question["request_id"],
+                             "message": "this one"})
+        assert answer.result(timeout=5)["message"] == "this one"
+
+
+def test_last_viewer_disconnecting_cancels_the_question(client):
+    conversation_id = _create_conversation(client)
+    with client.websocket_connect(f'/c2/{conversation_id}') as websocket:
+        answer = client.portal.start_task_soon(
+            Manager.send_and_wait_for_response, conversation_id,
+            {"question": "which one?"})
+        _receive_question(websocket)
+
+    with pytest.raises(RequestCancelled):
+        answer.result(timeout=5)
+    assert Manager.pending_requests.outstanding(conversation_id) == 0
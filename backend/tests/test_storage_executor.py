@@ -0,0 +1,86 @@
+import asyncio
+import threading
+import time
+
+import httpx
+from fastapi import FastAPI
+
+from agent_dashboard.backend import settings
+from agent_dashboard.backend.routes import team_routes
+from agent_dashboard.backend.storage import run_in_storage_thread
+
+
+async def _max_loop_lag(work, interval: float = 0.005) -> float:
+    """run `work()` while a ticker measures how late the event loop wakes it up"""
+    loop = asyncio.get_running_loop()
+    lags = []
+    done = asyncio.Event()
+
+    async def tick():
+        while not done.is_set():
+            started = loop.time()
+            await asyncio.sleep(interval)
+            lags.append(loop.time() - started - interval)
+
+    ticker = asyncio.create_task(tick())
+    try:
+        await work()
+    finally:
+        done.set()
+        await ticker
+    return max(lags)
+
+
+def test_blocking_storage_calls_do_not_stall_the_event_loop():
+
+    async def work():
+        await asyncio.gather(*(run_in_storage_thread(time.sleep, 0.2)
+                               for _ in range(4)))
+
+    assert asyncio.run(_max_loop_lag(work)) < 0.1
+
+
+def test_storage_pool_is_bounded():
+    running = 0
+    most = 0
+    lock = threading.Lock()
+
+    def call():
+        nonlocal running, most
+        with lock:
+            running += 1
+            most = max(most, running)
+        time.sleep(0.02)
+        with lock:
+            running -= 1
+
+    async def burst():
+        await asyncio.gather(*(run_in_storage_thread(call)
+                               for _ in range(settings.STORAGE_IO_THREADS * 3)))
+
+    asyncio.run(burst())
+    assert most == settings.STORAGE_IO_THREADS
+
+
+def test_slow_message_store_keeps_the_loop_responsive(monkeypatch):
+    stored = []
+
+    def slow_save(conversation_id: str, message: dict):
+        time.sleep(0.3)
+        stored.append((conversation_id, message))
+
+    monkeypatch.setattr(team_routes, 'save_team_conversation_messages',
+                        slow_save)
+    app = FastAPI()
+    app.include_router(team_routes.router)
+
+    async def work():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app),
+                                     base_url='http://test') as client:
+            responses = await asyncio.gather(*(client.post(
+                '/teams/loop-lag/messages/store', json={"content": str(i)})
+                                               for i in range(3)))
+        assert all(response.status_code == 200 for response in responses)
+
+    assert asyncio.run(_max_loop_lag(work)) < 0.1
+    assert len(stored) == 3
@@ -12,6 +12,8 @@ export const ConversationUI = ({ team_id }) => {
     const [error, setError] = useState(null);
     const [conversationStarted, setConversationStarted] = useState(false);
     const [wsConnection, setWsConnection] = useState(null);
+    // request_id of the question the conversation is waiting on; the next message sent answers it
+    const [pendingRequestId, setPendingRequestId] = useState(null);
 
     const messagesEndRef = useRef(null);
 
@@ -68,10 +70,22 @@ export const ConversationUI = ({ team_id }) => {
     useEffect(() => {
         if (lastMessage !== null) {
             const data = JSON.parse(lastMessage.data);
-            if (data.request_id) {
-                // Handle response from send_and_wait_for_response
-                console.log("Received response for request:", data.request_id);
-                // You can add additional handling here if needed
+            if (data.class_name === 'RecipientNotFound') {
+                // a message or an answer named a recipient the conversation does not have; with a request_id
+                // the question is asked again and the next message answers it
+                setError(data.message || 'Could not find that recipient');
+                if (data.request_id) {
+                    setPendingRequestId(data.request_id);
+                }
+            } else if (data.request_id) {
+                // a question from send_and_wait_for_response - the reply has to carry the same request_id
+                const question = data.conversation_message;
+                const sender = question.sender?.name ?? question.sender;
+                setMessages((prevMessages) => [...prevMessages, { ...question, sender }]);
+                if (sender) {
+                    setRecipient(sender);
+                }
+                setPendingRequestId(data.request_id);
             } else {
                 // Regular message from backend
                 setMessages((prevMessages) => [...prevMessages, data]);
@@ -111,6 +125,12 @@ export const ConversationUI = ({ team_id }) => {
                 sender: 'Human',
                 content: [{ type: 'text', text: inputMessage }]
             };
+            if (pendingRequestId) {
+                // answers the question the conversation is waiting on
+                messageData.request_id = pendingRequestId;
+                messageData.participant_name = recipient;
+                setPendingRequestId(null);
+            }
             wsConnection.sendMessage(JSON.stringify(messageData));
             setMessages((prevMessages) => [...prevMessages, messageData]);
             setInputMessage('');
@@ -118,6 +138,9 @@ export const ConversationUI = ({ team_id }) => {
     };
 
     const MessageContent = ({ content }) => {
+        if (typeof content === 'string') {
+            return <p>{content}</p>;
+        }
         if (Array.isArray(content)) {
             return content.map((item, index) => {
                 if (typeof item === 'string') {
@@ -207,7 +230,7 @@ export const ConversationUI = ({ team_id }) => {
                                 value={inputMessage}
                                 onChange={(e) => setInputMessage(e.target.value)}
                                 className="flex-grow p-2 border rounded-l bg-gray-700 text-gray-100 border-gray-600 focus:outline-none focus:ring-2 focus:ring-blue-500"
-                                placeholder="Type your message..."
+                                placeholder={pendingRequestId ? "Answer the question above..." : "Type your message..."}
                             />
                             <button
                                 type="submit"
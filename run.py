@@ -1,14 +1,21 @@
+import argparse
+import asyncio
 import logging
+import os
 import signal
 import socket
 import subprocess
 import sys
 import threading
 import time
+import urllib.error
+import urllib.request
+from dataclasses import dataclass, field
 from pathlib import Path
 from signal import SIGTERM  # or SIGKILL
+from typing import List, Optional
 
-from psutil import process_iter
+import psutil
 
 # Global flag to signal all threads to stop
 stop_flag = threading.Event()
@@ -18,36 +25,69 @@ logging.basicConfig(
     format='%(name)s-%(levelname)s|%(lineno)d:  %(message)s', level=logging.DEBUG)
 log = logging.getLogger(__name__)
 
+BACKEND_PORT = 11251
+FRONTEND_PORT = 11252
 
-def kill_process_using_port(port_number: int):
-    for proc in process_iter():
-        for conns in proc.connections(kind='inet'):
-            if conns.laddr.port == port_number:
-                try:
-                    proc.send_signal(SIGTERM)  # or SIGKILL
-                except Exception:
-                    pass
+
+def _port_open(port: int) -> bool:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.settimeout(0.5)
+        return sock.connect_ex(('localhost', port)) == 0
 
 
-def close_ports(port_list):
+def close_ports(port_list, timeout: float = 3):
+    """stop whatever is listening on the ports, waiting only as long as the processes take to exit"""
     log.info(f'Closing ports {port_list}')
-    for port in port_list:
-        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        sock.settimeout(2)  # Set a timeout for the connection attempt
+    open_ports = [port for port in port_list if _port_open(port)]
+    for port in set(port_list) - set(open_ports):
+        log.debug(f"Port {port} is not open.")
+    if not open_ports:
+        return
 
+    # one pass over the system's sockets instead of asking every process for its connections
+    try:
+        pids = {
+            conn.pid
+            for conn in psutil.net_connections(kind='inet')
+            if conn.pid and conn.laddr and conn.laddr.port in open_ports
+            and conn.status == psutil.CONN_LISTEN
+        }
+    except psutil.AccessDenied:
+        # macOS only lists other processes' sockets to root
+        pids = {
+            proc.pid
+            for proc in psutil.process_iter()
+            if any(conn.laddr.port in open_ports
+                   for conn in _connections(proc))
+        }
+
+    processes = []
+    for pid in pids:
         try:
-            sock.connect(('localhost', port))
-            sock.shutdown(socket.SHUT_RDWR)
-            kill_process_using_port(port)
-            time.sleep(1)
-            log.debug(f"Port {port} is open. Sent shutdown signal.")
+            process = psutil.Process(pid)
+            process.send_signal(SIGTERM)  # or SIGKILL
+            processes.append(process)
+        except psutil.Error:
+            pass
+    # done as soon as the ports are free, rather than after a fixed sleep
+    deadline = time.monotonic() + timeout
+    while any(_port_open(port) for port in open_ports):
+        if time.monotonic() > deadline:
+            for process in processes:
+                try:
+                    process.kill()
+                except psutil.Error:
+                    pass
+            break
+        time.sleep(0.05)
+    log.debug(f"Ports {open_ports} were open. Stopped {len(processes)} processes.")
 
-        except ConnectionRefusedError:
-            log.debug(f"Port {port} is not open.")
-        except socket.timeout:
-            log.debug(f"Probe to {port} timed out.")
-        finally:
-            sock.close()
+
+def _connections(proc: psutil.Process):
+    try:
+        return proc.connections(kind='inet')
+    except psutil.Error:
+        return []
 
 
 def run_command(command, cwd):
@@ -81,24 +121,196 @@ def run_command(command, cwd):
             process.kill()
 
 
+@dataclass
+class Child:
+    """a supervised command, restarted with exponential backoff whenever it exits"""
+    name: str
+    command: str
+    cwd: Path
+    # polled after every start until it answers 200; the child counts as ready from then on
+    health_url: Optional[str] = None
+    # not started before this child is ready
+    after: Optional[str] = None
+
+    process: Optional[asyncio.subprocess.Process] = None
+    restarts: int = 0
+    ready: asyncio.Event = field(default_factory=asyncio.Event)
+
+
+class Supervisor:
+    """Runs the children as asyncio subprocesses and streams their output.
+
+    Every pipe has its own reader, so a quiet stdout never holds up stderr and a chatty child cannot fill a
+    pipe and block. Readiness is polled through a child's health URL rather than assumed after a sleep,
+    and the time it took is logged."""
+
+    def __init__(self,
+                 children: List[Child],
+                 min_backoff: float = 0.5,
+                 max_backoff: float = 30,
+                 stable_after: float = 30,
+                 ready_timeout: float = 120):
+        self.children = {child.name: child for child in children}
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        # a child that stayed up this long starts over from min_backoff after a crash
+        self.stable_after = stable_after
+        self.ready_timeout = ready_timeout
+        self.started = time.monotonic()
+
+    async def run(self):
+        tasks = [
+            asyncio.create_task(self._supervise(child))
+            for child in self.children.values()
+        ]
+        # the signal handler sets stop_flag from the main thread
+        await asyncio.to_thread(stop_flag.wait)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _supervise(self, child: Child):
+        backoff = 0.0
+        while True:
+            if child.after:
+                await self.children[child.after].ready.wait()
+
+            started = time.monotonic()
+            log.info(f'[{child.name}] starting {child.command}')
+            child.process = await asyncio.create_subprocess_shell(
+                child.command,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+                cwd=child.cwd,
+                limit=1024 * 1024,
+                # its own process group, so stopping it also stops what the shell started
+                start_new_session=os.name == 'posix')
+            readers = [
+                asyncio.create_task(self._stream(child, child.process.stdout, False)),
+                asyncio.create_task(self._stream(child, child.process.stderr, True)),
+            ]
+            probe = asyncio.create_task(self._wait_until_ready(child, started))
+            try:
+                code = await child.process.wait()
+            except asyncio.CancelledError:
+                await self._stop(child)
+                raise
+            finally:
+                probe.cancel()
+                child.ready.clear()
+                # the rest of its output - unless something it left running still holds the pipes
+                await asyncio.wait(readers, timeout=1)
+                for reader in readers:
+                    reader.cancel()
+
+            uptime = time.monotonic() - started
+            if uptime >= self.stable_after:
+                backoff = 0
+            backoff = min(self.max_backoff, max(self.min_backoff, backoff * 2))
+            child.restarts += 1
+            log.warning(f'[{child.name}] exited with {code} after {uptime:.1f}s, '
+                        f'restart {child.restarts} in {backoff:.1f}s')
+            await asyncio.sleep(backoff)
+
+    async def _wait_until_ready(self, child: Child, started: float):
+        if child.health_url:
+            while not await asyncio.to_thread(_healthy, child.health_url):
+                if time.monotonic() - started > self.ready_timeout:
+                    log.error(f'[{child.name}] not ready after {self.ready_timeout:.0f}s, restarting')
+                    _signal(child.process, SIGTERM)
+                    return
+                await asyncio.sleep(0.1)
+            now = time.monotonic()
+            log.info(f'[{child.name}] ready in {now - started:.2f}s '
+                     f'({now - self.started:.2f}s since the supervisor started)')
+        child.ready.set()
+
+    async def _stream(self, child: Child, reader: asyncio.StreamReader,
+                      is_error: bool):
+        while True:
+            try:
+                line = await reader.readline()
+            except ValueError:
+                # longer than the reader's limit - pass it on in pieces
+                line = await reader.read(1024 * 1024)
+            if not line:
+                return
+            text = line.decode(errors='replace').rstrip()
+            print(f"[{child.name}] ERROR: {text}" if is_error else f"[{child.name}] {text}",
+                  flush=True)
+
+    async def _stop(self, child: Child, timeout: float = 5):
+        if child.process.returncode is not None:
+            return
+        _signal(child.process, SIGTERM)
+        try:
+            await asyncio.wait_for(child.process.wait(), timeout)
+        except asyncio.TimeoutError:
+            _signal(child.process, signal.SIGKILL if os.name == 'posix' else SIGTERM)
+            await child.process.wait()
+
+
+def _signal(process: asyncio.subprocess.Process, signum: int):
+    try:
+        if os.name == 'posix':
+            os.killpg(process.pid, signum)
+        else:
+            process.terminate()
+    except ProcessLookupError:
+        pass
+
+
+def _healthy(url: str) -> bool:
+    try:
+        with urllib.request.urlopen(url, timeout=0.5) as response:
+            return response.status == 200
+    except (urllib.error.URLError, OSError):
+        return False
+
+
 def signal_handler(signum, frame):
     print("Received termination signal. Stopping all processes...")
     stop_flag.set()
 
 
-def main():
+def supervise(package_root: Path):
+    asyncio.run(Supervisor([
+        Child('backend',
+              "poetry run python -m server",
+              package_root / 'backend',
+              health_url=f'http://localhost:{BACKEND_PORT}/'),
+        Child('frontend',
+              "npm run dev",
+              package_root / 'frontend',
+              after='backend'),
+    ]).run())
+
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        '--supervise',
+        action='store_true',
+        help='stream output without blocking, restart crashed processes and start the frontend once the backend is up')
+    args = parser.parse_args(argv)
+
     package_root = Path(__file__).parent
-    close_ports([11251, 11252])
+    close_ports([BACKEND_PORT, FRONTEND_PORT])
+
+    # Set up signal handlers
+    signal.signal(signal.SIGINT, signal_handler)
+    signal.signal(signal.SIGTERM, signal_handler)
+
+    if args.supervise:
+        supervise(package_root)
+        print("All processes stopped.")
+        return
 
     commands = [
         ("poetry run python -m server", package_root / 'backend'),
         ("npm run dev", package_root / 'frontend'),
     ]
 
-    # Set up signal handlers
-    signal.signal(signal.SIGINT, signal_handler)
-    signal.signal(signal.SIGTERM, signal_handler)
-
     threads = []
     for command, cwd in commands:
         thread = threading.Thread(target=run_command, args=(command, cwd))